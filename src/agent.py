@@ -1,18 +1,36 @@
-from langchain_ollama import OllamaLLM
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain.prompts import PromptTemplate
 from langchain.tools import BaseTool
-from typing import List, Any
-from voice import process_voice_input, speak
+from langchain.tools.render import render_text_description
+from typing import List, Any, Optional, Dict, Tuple
+from voice import process_voice_input, process_command_audio, speak, speech_queue, stt_models, wake_word_detector, interrupt_speech, get_audio_capture, PRIORITY_ALERT
 from system_monitor import monitoring_tools, ProactiveMonitor
 from desktop_automation import desktop_tools
+import desktop_automation
 from security_mediator import security_mediator
-from feedback_logger import log_feedback
+from feedback_logger import log_feedback, add_feedback_listener
+from llm_streaming import FinalAnswerSpeaker, LLMTimingHandler, ToolRecorder
+from prompts import react_prompt, plan_prompt
+from intent_router import IntentRouter, normalize_command
+from response_cache import ResponseCache
+from scheduler import AgentRequest, RequestScheduler
+from memory import memory_system
+from compaction import MemoryCompactor
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
 import hotkey_listener
+import asyncio
+import json
+import re
+import threading
 import time
 
-# Set up Ollama LLM integration
-llm = OllamaLLM(model="phi3:3.8b")
+# Keep the model loaded between commands so the KV cache of the shared prompt
+# prefix survives. Options must stay the same on every call: changing them
+# makes Ollama reload the model and throw the cache away.
+OLLAMA_KEEP_ALIVE = "30m"
+OLLAMA_NUM_CTX = 4096
+
+# Reports prompt-evaluation vs generation time for every LLM call
+llm_timing = LLMTimingHandler(log=True)
 
 # Placeholder tool for basic tool calling
 class PlaceholderTool(BaseTool):
@@ -36,111 +54,520 @@ class SecureTool(BaseTool):
         return security_mediator.execute_tool(self.original_tool._run, self.name, *args, **kwargs)
 
     async def _arun(self, *args, **kwargs) -> str:
-        return await security_mediator.execute_tool(self.original_tool._arun, self.name, *args, **kwargs)
+        # The tools' own _arun just call the blocking _run, so run that on the mediator's thread pool
+        return await security_mediator.aexecute_tool(self.original_tool._run, self.name, *args, **kwargs)
+
+# Fast path for common tool commands that don't need the LLM
+USE_INTENT_ROUTER = True
 
-# Wrap all tools with security
-secure_tools = [SecureTool(tool) for tool in [PlaceholderTool()] + monitoring_tools + desktop_tools]
-tools = secure_tools
+# The LLM, the secured tools, the router and the executor are built by
+# build_agent() on first use, so importing this module stays cheap
+llm = None
+tools: List[BaseTool] = []
+tools_by_name: Dict[str, BaseTool] = {}
+intent_router = None
+agent_executor = None
+_build_lock = threading.Lock()
 
-# Define the agent prompt
-prompt = PromptTemplate.from_template("""
-You are Jarvis, an AI assistant. Follow the agentic loop: Perceive, Plan, Act, Learn.
+def build_agent() -> None:
+    """Construct the LLM, tools, intent router and ReAct executor if not done yet."""
+    global llm, tools, tools_by_name, intent_router, agent_executor
+    if agent_executor is not None:
+        return
+    with _build_lock:
+        if agent_executor is not None:
+            return
+        start = time.perf_counter()
+        from langchain_ollama import OllamaLLM
+        from langchain.agents import AgentExecutor, create_react_agent
 
-You have access to the following tools:
-{tools}
+        # Set up Ollama LLM integration
+        llm = OllamaLLM(model="phi3:3.8b", keep_alive=OLLAMA_KEEP_ALIVE, num_ctx=OLLAMA_NUM_CTX, callbacks=[llm_timing])
 
-Use the following format:
-Question: the input question you must answer
-Thought: you should always think about what to do
-Action: the action to take, should be one of [{tool_names}]
-Action Input: the input to the action
-Observation: the result of the action
-... (this Thought/Action/Action Input/Observation can repeat N times)
-Thought: I now know the final answer
-Final Answer: the final answer to the original input question
+        # Wrap all tools with security
+        tools = [SecureTool(tool) for tool in [PlaceholderTool()] + monitoring_tools + desktop_tools]
+        tools_by_name = {tool.name: tool for tool in tools}
+        intent_router = IntentRouter(tools_by_name)
 
-Current task: {input}
+        # Create the agent
+        agent = create_react_agent(llm, tools, react_prompt)
+        agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True, return_intermediate_steps=True)
+        print(f"Agent ready in {time.perf_counter() - start:.2f}s")
 
-{agent_scratchpad}
-""")
+# Semantic cache of agent answers, using the memory system's embedding model
+USE_RESPONSE_CACHE = True
+response_cache = ResponseCache(memory_system.embed_text)
 
-# Create the agent
-agent = create_react_agent(llm, tools, prompt)
-agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True, handle_parsing_errors=True)
+# Answers that used these tools are never cached: monitoring results go stale
+# within seconds and desktop actions must actually run every time
+UNCACHEABLE_TOOLS = {tool.name for tool in monitoring_tools + desktop_tools}
+
+def invalidate_cached_answer(entry: Dict[str, Any]) -> None:
+    """Feedback listener: a correction means the cached answer for that instruction was wrong."""
+    response_cache.invalidate(entry["original_instruction"])
 
 # Proactive monitoring
 def proactive_callback(message):
-    speak(message)
+    if message.startswith("High memory usage"):
+        stt_models.release_if_memory_pressure()
+    # Repeated alerts of the same kind are merged while they wait behind answers
+    speak(message, priority=PRIORITY_ALERT, key=message.split(":")[0])
+
+def on_alert(message):
+    """Monitor callback: hand the alert to the event loop if it is running."""
+    if not runtime.post("alert", message):
+        proactive_callback(message)
+
+monitor = ProactiveMonitor(callback=on_alert)
+
+# Summarizes interactions older than a week, every few hours
+compactor = MemoryCompactor(memory_system)
+
+# Early dispatch from partial transcripts
+class ContextPrefetcher:
+    """Starts memory retrieval from streaming partial transcripts.
+
+    While the user is still speaking, each new partial hypothesis can kick
+    off a background memory lookup. When the final transcript arrives, the
+    prefetched context is reused if it was computed for a close enough
+    hypothesis, otherwise it is fetched again. Each request gets its own
+    prefetcher, closed once the context has been retrieved.
+    """
+
+    def __init__(self, min_similarity: float = 0.8):
+        self.min_similarity = min_similarity
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prefetch")
+        self._future = None
+        self._query = None
+
+    def on_partial(self, text: str) -> None:
+        """Called from the recording thread; must never block."""
+        if self._future is not None and not self._future.done():
+            return  # Skip hypotheses that arrive while a lookup is running
+        if text == self._query:
+            return
+        self._query = text
+        self._future = self._executor.submit(memory_system.get_context_for_query, text)
+
+    def context_for(self, final_text: str) -> str:
+        """Return memory context for the final transcript, reusing the prefetch when it matches."""
+        if self._future is not None and self._query:
+            similarity = SequenceMatcher(None, self._query.lower(), final_text.lower().strip(" .?!")).ratio()
+            if similarity >= self.min_similarity:
+                try:
+                    return self._future.result()
+                except Exception as e:
+                    print(f"Context prefetch failed: {e}")
+        return memory_system.get_context_for_query(final_text)
 
-monitor = ProactiveMonitor(callback=proactive_callback)
+    def close(self) -> None:
+        """Drop any lookup that has not started; one already running finishes on its own."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def build_task(command: str, context: str) -> str:
+    """Assemble the agent input from the command and any retrieved memory context."""
+    if context:
+        return f"{context}\n{command}"
+    return command
 
 # Define the agentic loop
-def perceive() -> str:
-    """Perceive: Process voice input and verify speaker."""
-    audio = process_voice_input()
-    if audio is not None:
-        # Placeholder for STT: return dummy transcription
-        return "voice command"
-    else:
+def perceive(start: Optional[int] = None, prefetcher: Optional[ContextPrefetcher] = None, cancel_event: Optional[threading.Event] = None) -> str:
+    """Perceive: Process voice input and verify speaker.
+
+    Without `start`, waits for the wake word first; otherwise the command is
+    recorded from that capture position (the wake word or hotkey was already
+    handled by the caller). Partial transcripts go to `prefetcher`, and
+    setting `cancel_event` stops recording and transcription.
+    """
+    on_partial = prefetcher.on_partial if prefetcher else None
+    if start is None:
+        return process_voice_input(on_partial=on_partial, cancel_event=cancel_event)
+    return process_command_audio(start, on_partial=on_partial, cancel_event=cancel_event)
+
+# Planner modes:
+#   "auto"   - single-intent commands go straight to the ReAct executor; multi-step
+#              commands get one structured planning call whose steps are run directly
+#   "off"    - never plan, always use the ReAct executor
+#   "legacy" - free-text plan followed by the ReAct executor (the original behaviour)
+PLANNER_MODE = "auto"
+
+# Conjunctions that suggest more than one step. A bare comma does not: it
+# mostly follows a vocative or interjection ("okay, take a screenshot").
+MULTI_STEP_PATTERN = re.compile(r"\b(and|then|also|plus|after that)\b", re.IGNORECASE)
+
+def is_simple_request(command: str) -> bool:
+    """Return True if the command looks like a single intent that needs no planning."""
+    # normalize_command drops semicolons, which separate steps like "then"
+    return not MULTI_STEP_PATTERN.search(normalize_command(command.replace(";", " then ")))
+
+def parse_plan(plan_output: str) -> Optional[List[Dict[str, str]]]:
+    """Parse the planner's JSON steps. Returns None if they are unusable."""
+    start, end = plan_output.find("["), plan_output.rfind("]")
+    if start == -1 or end < start:
         return None
+    try:
+        steps = json.loads(plan_output[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(steps, list) or not steps:
+        return None
+    parsed = []
+    for step in steps:
+        if not isinstance(step, dict) or step.get("tool") not in tools_by_name:
+            return None
+        parsed.append({"tool": step["tool"], "input": str(step.get("input", ""))})
+    return parsed
+
+def plan(perceived_input: str) -> Optional[List[Dict[str, str]]]:
+    """Plan: Ask the LLM once for a structured list of tool calls."""
+    build_agent()
+    plan_output = llm.invoke(plan_prompt.format(tools=render_text_description(tools), input=perceived_input))
+    return parse_plan(plan_output)
+
+async def aplan(perceived_input: str) -> Optional[List[Dict[str, str]]]:
+    await asyncio.to_thread(build_agent)
+    plan_output = await llm.ainvoke(plan_prompt.format(tools=render_text_description(tools), input=perceived_input))
+    return parse_plan(plan_output)
 
-def plan(perceived_input: str) -> str:
+def legacy_plan(perceived_input: str) -> str:
     """Plan: Use LLM to decompose goal into steps."""
+    build_agent()
     plan_prompt = f"Decompose the following goal into steps: {perceived_input}"
     return llm.invoke(plan_prompt)
 
-def act(plan_output: str) -> str:
+def execute_plan(steps: List[Dict[str, str]], callbacks: Optional[list] = None) -> str:
+    """Act: Run planned tool calls directly, without another LLM round trip."""
+    results = [tools_by_name[step["tool"]].run(step["input"], callbacks=callbacks) for step in steps]
+    return "\n".join(str(result) for result in results)
+
+# Read-only tools whose calls within one plan may run at the same time.
+# Desktop actions keep their order: "move the mouse, then click".
+CONCURRENT_TOOLS = {tool.name for tool in monitoring_tools}
+
+async def aexecute_plan(steps: List[Dict[str, str]], callbacks: Optional[list] = None) -> str:
+    """Act: Run planned tool calls, with consecutive read-only calls in parallel."""
+    results = []
+    batch = []
+    for step in steps + [None]:
+        if step is not None and step["tool"] in CONCURRENT_TOOLS:
+            batch.append(step)
+            continue
+        if batch:
+            results += await asyncio.gather(*(tools_by_name[s["tool"]].arun(s["input"], callbacks=callbacks) for s in batch))
+            batch = []
+        if step is not None:
+            results.append(await tools_by_name[step["tool"]].arun(step["input"], callbacks=callbacks))
+    return "\n".join(str(result) for result in results)
+
+def invoke_agent(task: str, callbacks: Optional[list] = None) -> Dict[str, Any]:
+    """Run the ReAct executor and return its full result, including intermediate steps."""
+    build_agent()
+    return agent_executor.invoke({"input": task}, config={"callbacks": callbacks or []})
+
+def act(plan_output: str, callbacks: Optional[list] = None) -> str:
     """Act: Execute tools based on plan."""
     # For now, use the agent executor with the plan as input
-    result = agent_executor.invoke({"input": plan_output})
+    return invoke_agent(plan_output, callbacks)["output"]
+
+def cached_answer(command: str) -> Optional[str]:
+    if USE_RESPONSE_CACHE:
+        cached = response_cache.get(command)
+        if cached is not None:
+            print("Response cache hit")
+            return cached
+    return None
+
+def cache_answer(command: str, result: Dict[str, Any]) -> None:
+    """Cache the executor result unless it used volatile tools."""
+    used_tools = {action.tool for action, _ in result.get("intermediate_steps", [])}
+    if USE_RESPONSE_CACHE and not used_tools & UNCACHEABLE_TOOLS:
+        response_cache.put(command, result["output"])
+
+def act_cached(command: str, context: str = "", callbacks: Optional[list] = None) -> str:
+    """Act through the response cache, caching answers that used no volatile tools."""
+    cached = cached_answer(command)
+    if cached is not None:
+        return cached
+    result = invoke_agent(build_task(command, context), callbacks)
+    cache_answer(command, result)
     return result["output"]
 
-def learn(action_result: str) -> None:
-    """Learn: Incorporate feedback and memory (placeholder)."""
-    # Placeholder for future memory implementation
+async def aact_cached(command: str, context: str = "", callbacks: Optional[list] = None) -> str:
+    # Embedding the query is CPU-bound, so the cache is consulted off the event loop
+    cached = await asyncio.to_thread(cached_answer, command)
+    if cached is not None:
+        return cached
+    result = await agent_executor.ainvoke({"input": build_task(command, context)}, config={"callbacks": callbacks or []})
+    await asyncio.to_thread(cache_answer, command, result)
+    return result["output"]
+
+def handle_command(command: str, context: str = "", callbacks: Optional[list] = None) -> str:
+    """Plan and act on a transcribed command according to PLANNER_MODE."""
+    build_agent()
+    if PLANNER_MODE == "legacy":
+        return act(legacy_plan(build_task(command, context)), callbacks)
+    if USE_INTENT_ROUTER:
+        match = intent_router.route(command)
+        if match:
+            print(f"Fast path: {match.tool}({match.tool_input!r})")
+            return tools_by_name[match.tool].run(match.tool_input, callbacks=callbacks)
+    if PLANNER_MODE == "auto" and not is_simple_request(command):
+        steps = plan(command)
+        if steps:
+            return execute_plan(steps, callbacks)
+    return act_cached(command, context, callbacks)
+
+async def ahandle_command(command: str, context: str = "", callbacks: Optional[list] = None) -> str:
+    """Async handle_command: LLM calls are awaited and plan steps run concurrently."""
+    await asyncio.to_thread(build_agent)
+    if PLANNER_MODE == "legacy":
+        return await asyncio.to_thread(handle_command, command, context, callbacks)
+    if USE_INTENT_ROUTER:
+        match = intent_router.route(command)
+        if match:
+            print(f"Fast path: {match.tool}({match.tool_input!r})")
+            return await tools_by_name[match.tool].arun(match.tool_input, callbacks=callbacks)
+    if PLANNER_MODE == "auto" and not is_simple_request(command):
+        steps = await aplan(command)
+        if steps:
+            return await aexecute_plan(steps, callbacks)
+    return await aact_cached(command, context, callbacks)
+
+def learn(action_result: str, user_input: Optional[str] = None, source_tool: Optional[str] = None) -> None:
+    """Learn: Remember the interaction. The memory is written in the background."""
     print(f"Learning from result: {action_result}")
+    if user_input:
+        memory_system.store_interaction(user_input, action_result, source_tool)
 
 # Main agent loop
-def run_agentic_loop() -> str:
-    perceived = perceive()
+def run_agentic_loop(start: Optional[int] = None) -> str:
+    prefetcher = ContextPrefetcher()
+    try:
+        perceived = perceive(start, prefetcher)
+        context = prefetcher.context_for(perceived) if perceived is not None else ""
+    finally:
+        prefetcher.close()
+    # Speaks the final answer sentence by sentence while it is generated
+    answer_speaker = FinalAnswerSpeaker(speak)
     if perceived is None:
         result = "Access denied"
     else:
-        planned = plan(perceived)
-        acted = act(planned)
-        learn(acted)
+        tool_recorder = ToolRecorder()
+        acted = handle_command(perceived, context, callbacks=[answer_speaker, tool_recorder])
+        learn(acted, perceived, tool_recorder.source_tool)
         result = acted
-    speak(result)
+    if not answer_speaker.spoken:
+        speak(result)
     # Listen for user corrections
     capture_feedback(perceived, result)
     return result
 
-def capture_feedback(original_instruction: str, agent_response: str) -> None:
+async def arun_agentic_loop(start: Optional[int] = None, request: Optional[AgentRequest] = None, previous: Optional[Tuple[str, str]] = None) -> str:
+    """Async run_agentic_loop; audio capture runs in a worker thread.
+
+    Stage timings are recorded on `request`, and its cancel event stops the
+    capture and transcription threads when the request is preempted.
+    Corrections are not waited for after answering, which would hold the
+    request open; instead a command saying "that was wrong" is logged as
+    feedback on `previous`, the (command, answer) of the last request.
+    """
+    request = request or AgentRequest(0, "direct", start, time.monotonic())
+    prefetcher = ContextPrefetcher()
+    try:
+        with request.stage("perceive"):
+            perceived = await asyncio.to_thread(perceive, start, prefetcher, request.cancel_event)
+        if perceived is not None and previous is not None and is_correction(perceived):
+            with request.stage("feedback"):
+                return await asyncio.to_thread(handle_correction, perceived, *previous)
+        request.command = perceived
+        if perceived is not None:
+            with request.stage("context"):
+                context = await asyncio.to_thread(prefetcher.context_for, perceived)
+    finally:
+        prefetcher.close()
+    answer_speaker = FinalAnswerSpeaker(speak)
+    if perceived is None:
+        result = "Access denied"
+    else:
+        tool_recorder = ToolRecorder()
+        with request.stage("act"):
+            result = await ahandle_command(perceived, context, callbacks=[answer_speaker, tool_recorder])
+        learn(result, perceived, tool_recorder.source_tool)
+    if not answer_speaker.spoken:
+        speak(result)
+    print("Request timing: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in request.stages.items()))
+    return result
+
+# "Jarvis, that was wrong. The correct answer is ..." (the wake word may already be cut off)
+CORRECTION_PATTERN = re.compile(r"^\W*(?:jarvis\W+)?that was wrong\b", re.IGNORECASE)
+CORRECTION_ANSWER = "the correct answer is"
+
+# Corrections only apply to an answer given at most this many seconds ago
+CORRECTION_WINDOW = 120
+
+def is_correction(transcription: str) -> bool:
+    return bool(CORRECTION_PATTERN.match(transcription))
+
+def handle_correction(transcription: str, original_instruction: str, agent_response: str) -> str:
+    """Log the correction in `transcription` as feedback on the previous answer."""
+    correction_start = transcription.lower().find(CORRECTION_ANSWER)
+    correction = transcription[correction_start + len(CORRECTION_ANSWER):].strip(" .!?,") if correction_start != -1 else ""
+    if not correction:
+        speak("Correction not understood. Please try again.")
+        return "Correction not understood"
+    log_feedback(original_instruction, agent_response, correction)
+    speak("Thank you for the correction. I'll learn from this.")
+    return "Correction logged"
+
+def capture_feedback(original_instruction: str, agent_response: str, cancel_event: Optional[threading.Event] = None) -> None:
     """
     Listen for user corrections after responding.
+    Stops early once `cancel_event` is set.
     """
     print("Listening for corrections... (say 'Jarvis, that was wrong' followed by correction)")
-    time.sleep(3)  # Wait 3 seconds for user to respond
-    correction_audio = process_voice_input()
-    if correction_audio is not None:
-        # Placeholder: In real implementation, transcribe correction_audio
-        # For now, assume transcription is "Jarvis, that was wrong. The correct answer is..."
-        transcription = "Jarvis, that was wrong. The correct answer is sunny weather."  # Dummy
-        if "that was wrong" in transcription.lower():
-            # Extract correction
-            correction_start = transcription.lower().find("the correct answer is")
-            if correction_start != -1:
-                correction = transcription[correction_start + len("the correct answer is"):].strip()
-                log_feedback(original_instruction, agent_response, correction)
-                speak("Thank you for the correction. I'll learn from this.")
-            else:
-                speak("Correction not understood. Please try again.")
+    # Wait 3 seconds for user to respond
+    if cancel_event is not None:
+        if cancel_event.wait(3):
+            return
+    else:
+        time.sleep(3)
+    transcription = process_voice_input(cancel_event=cancel_event)
+    if transcription is not None and is_correction(transcription):
+        handle_correction(transcription, original_instruction, agent_response)
+
+class AgentRuntime:
+    """One asyncio event loop fed by every input source.
+
+    The hotkey listener and the proactive monitor post events from their
+    own threads with `post()`; the wake-word listener runs as a task on the
+    loop. Agent requests go through a RequestScheduler, so only one runs at
+    a time and a newer trigger cancels the running one. Alerts are handled
+    as they arrive. The wake-word listener is paused while a request is
+    handled, since the request records from the microphone itself.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.scheduler = RequestScheduler(self.handle_request)
+        self._idle = None
+        self._stopped = None
+        self._pause_listening = threading.Event()
+        self._last_exchange = None  # (command, answer, finished at) of the last request
+
+    def post(self, kind: str, payload: Any = None) -> bool:
+        """Thread-safe and non-blocking: hand an input to the event loop.
+
+        "alert" carries a monitor message; any other kind ("hotkey", "wake")
+        is an agent trigger carrying the capture position to record from.
+        Returns False if the loop is not running.
+        """
+        if kind != "alert":
+            return self.scheduler.submit(kind, payload)
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return False
+        loop.call_soon_threadsafe(loop.run_in_executor, None, proactive_callback, payload)
+        return True
+
+    async def handle_request(self, request: AgentRequest) -> str:
+        self._idle.clear()
+        self._pause_listening.set()
+        previous = None
+        if self._last_exchange and time.monotonic() - self._last_exchange[2] <= CORRECTION_WINDOW:
+            previous = self._last_exchange[:2]
+        try:
+            result = await arun_agentic_loop(request.payload, request, previous)
+            print(f"Agent result: {result}")
+            # A correction or a denied request is not itself something to correct
+            self._last_exchange = (request.command, result, time.monotonic()) if request.command else None
+            return result
+        except asyncio.CancelledError:
+            print(f"Request {request.id} cancelled")
+            interrupt_speech()
+            raise
+        finally:
+            self._pause_listening.clear()
+            self._idle.set()
+
+    async def listen_for_wake_word(self) -> None:
+        while not self._stopped.is_set():
+            await self._idle.wait()
+            position = await asyncio.to_thread(wake_word_detector.listen, cancel_event=self._pause_listening)
+            if position is not None:
+                print("Wake word detected!")
+                interrupt_speech()
+                self.scheduler.submit("wake", position)
+
+    async def run(self, wake_word: bool = True) -> None:
+        """Serve inputs until stop() is called."""
+        self.loop = asyncio.get_running_loop()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._stopped = asyncio.Event()
+        self._pause_listening.clear()
+        tasks = [asyncio.create_task(self.scheduler.run())]
+        # Open the microphone here rather than in the first hotkey callback
+        await asyncio.to_thread(get_audio_capture)
+        if wake_word:
+            tasks.append(asyncio.create_task(self.listen_for_wake_word()))
+        try:
+            await self._stopped.wait()
+        finally:
+            self._pause_listening.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.loop = None
+
+    def stop(self) -> None:
+        """Thread-safe: stop the event loop."""
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._stopped.set)
+
+runtime = AgentRuntime()
+
+def on_hotkey(position: int) -> None:
+    # Runs in the keyboard listener thread, so it only posts the trigger
+    if not runtime.post("hotkey", position):
+        print("Agent runtime is not running; hotkey ignored.")
+
+hotkey_listener.set_trigger(on_hotkey)
+
+# Start listening before the agent, the embedding model and Whisper are
+# ready; they are loaded in the background while waiting for the wake word
+FAST_START = True
+
+def warm_up(background: bool = FAST_START) -> None:
+    """Load the speech models, the memory system and the agent, and let corrections reach the response cache."""
+    add_feedback_listener(invalidate_cached_answer)
+    if background:
+        stt_models.preload()
+        memory_system.preload()
+        threading.Thread(target=build_agent, name="agent-build", daemon=True).start()
+    else:
+        stt_models.preload(background=False)
+        memory_system.preload().join()
+        build_agent()
 
 if __name__ == "__main__":
+    warm_up()
+    # Listeners are only started here, never as a side effect of importing
+    desktop_automation.start()
+    hotkey_listener.start()
     # Start proactive monitoring
     monitor.start()
-    # Run the agent loop with voice input
-    result = run_agentic_loop()
-    print(f"Result: {result}")
+    compactor.start()
+    # Serve wake word, hotkey and monitor inputs on one event loop
+    try:
+        asyncio.run(runtime.run())
+    except KeyboardInterrupt:
+        pass
+    hotkey_listener.stop()
+    desktop_automation.stop()
     # Stop monitoring
-    monitor.stop()
\ No newline at end of file
+    monitor.stop()
+    compactor.stop()
+    # Let queued speech finish and queued memories be written before exiting
+    speech_queue.drain()
+    memory_system.close()
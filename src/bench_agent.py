@@ -0,0 +1,77 @@
+"""Latency harness for the agent's planning pipeline.
+
+Runs voice-style commands through agent.handle_command against a local
+fake Ollama server and reports LLM calls and wall time per request for
+each planner mode:
+
+    python bench_agent.py
+"""
+import json
+import os
+import re
+import time
+from fake_ollama import FakeOllamaServer
+
+COMMANDS = [
+    "what's my memory usage",
+    "show network statistics",
+    "check my memory usage and network statistics",
+    "show network stats, then memory usage",
+]
+
+TOOL_KEYWORDS = [("memory", "memory_usage"), ("network", "network_stats")]
+
+def _tools_for(text):
+    text = text.lower()
+    found = [(text.find(word), tool) for word, tool in TOOL_KEYWORDS if word in text]
+    return [tool for _, tool in sorted(found)]
+
+def fake_phi3(prompt):
+    """Scripted replies that imitate phi3 for each kind of prompt the agent sends."""
+    if "Break the request into tool calls" in prompt:
+        request = prompt.rsplit("Request:", 1)[1]
+        return json.dumps([{"tool": tool, "input": ""} for tool in _tools_for(request)])
+    if prompt.startswith("Decompose the following goal into steps:"):
+        goal = prompt.split(":", 1)[1].strip()
+        return f"1. Look up {goal}.\n2. Report the result to the user."
+    # ReAct step: call the next tool that has not been observed yet, then answer
+    task = prompt.rsplit("Current task:", 1)[1]
+    done = re.findall(r"Action: (\w+)", task)
+    remaining = [tool for tool in _tools_for(task.split("Thought:", 1)[0]) if tool not in done]
+    if remaining:
+        return f"Thought: I should use {remaining[0]}.\nAction: {remaining[0]}\nAction Input: now"
+    return "Thought: I now know the final answer\nFinal Answer: Here are the statistics you asked for."
+
+def run(modes=("legacy", "off", "auto")):
+    server = FakeOllamaServer(responder=fake_phi3, token_delay=0.01, request_delay=0.05, prompt_token_delay=0.0005)
+    os.environ["OLLAMA_HOST"] = server.start()
+    import agent  # Imported after OLLAMA_HOST is set so the LLM talks to the fake server
+    agent.build_agent()
+    agent.agent_executor.verbose = False
+    agent.llm_timing.log = False
+    try:
+        for mode in modes:
+            agent.PLANNER_MODE = mode
+            total_calls = 0
+            total_time = 0.0
+            agent.llm_timing.calls.clear()
+            print(f"Planner mode: {mode}")
+            for command in COMMANDS:
+                calls_before = server.generate_calls
+                start = time.perf_counter()
+                agent.handle_command(command)
+                elapsed = time.perf_counter() - start
+                calls = server.generate_calls - calls_before
+                total_calls += calls
+                total_time += elapsed
+                print(f"  {command!r}: {calls} LLM calls, {elapsed:.2f}s")
+            print(f"  mean: {total_calls / len(COMMANDS):.2f} LLM calls, {total_time / len(COMMANDS):.2f}s per request")
+            timing = agent.llm_timing.get_stats()
+            print(f"  prompt eval: {timing['prompt_eval_count']} tokens in {timing['prompt_eval_ms']:.0f} ms, generation: {timing['eval_count']} tokens in {timing['eval_ms']:.0f} ms")
+        metrics = agent.intent_router.get_metrics()
+        print(f"Intent router: {metrics['routed']}/{metrics['requests']} routed (hit rate {metrics['hit_rate']:.0%}), by tool {metrics['by_tool']}")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    run()
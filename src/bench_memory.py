@@ -0,0 +1,423 @@
+"""Benchmarks for the memory system.
+
+    python bench_memory.py write [--sizes 1000,10000,100000] [--legacy]
+    python bench_memory.py ingest [--count 2000] [--model]
+    python bench_memory.py cache [--count 2000] [--model]
+    python bench_memory.py retrieval [--count 100000] [--queries 200]
+    python bench_memory.py compact [--count 20000] [--queries 200]
+    python bench_memory.py backend [--count 100000] [--queries 200]
+    python bench_memory.py filter [--count 20000] [--queries 200]
+    python bench_memory.py embed [--count 2000] [--engines torch,int8,onnx] [--threads N] [--model-name NAME]
+
+`write` fills a throwaway collection up to each size and times
+`store_memory` there. Embeddings come from a cheap hashing embedder so
+that only the write path is measured; --legacy also times the old
+count-the-collection ID allocation for comparison.
+
+`ingest` compares the throughput of one store_memory call per memory, the
+write-behind ingestor and a bulk store_memories call. With --model the
+real embedding model is used, which is where batching pays off most.
+
+`cache` times embed_text over a query stream where most queries repeat,
+then again with a fresh MemorySystem that only has the disk tier of the
+embedding cache, and prints the cache stats.
+
+`retrieval` stores `--count` synthetic interactions spread over six months,
+among them facts that were stated twice with different values. Each query
+asks for one fact; a hit is the newer statement in the top results. Recall
+and latency are reported for vector-only, lexical-only and hybrid scoring.
+
+`compact` stores the same kind of corpus, runs the compaction job once and
+reports the collection size, the size on disk and the query latency and
+recall before and after.
+
+`backend` compares the Chroma and NumPy stores on random unit vectors:
+bulk and single inserts, query latency, the recall@10 of the int8 store
+against exact search, and cold start (a new interpreter that imports
+memory, opens the store and answers one query).
+
+`filter` runs filtered similarity queries (last hour, one type, one
+session in the last week) with the filter passed to the store, and
+compares them with over-fetching 100 unfiltered results and filtering in
+Python: latency, and how many of the true top 5 the over-fetch finds.
+
+`embed` encodes synthetic interactions with each embedding engine and
+reports load time, embeddings per second, the mean cosine to the FP32
+vectors and recall@10 of nearest-neighbour search against FP32.
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from memory import EMBEDDING_MODEL_NAME, MemorySystem
+from embeddings import EmbeddingEngine
+from vector_store import matches
+from retrieval import HybridRetriever
+from compaction import compact
+
+EMBEDDING_DIM = 384
+# Chroma's maximum batch size is a little over 5000
+FILL_BATCH = 5000
+
+class HashingMemorySystem(MemorySystem):
+    """MemorySystem with a deterministic bag-of-words embedder instead of the model."""
+
+    def _encode(self, texts):
+        vectors = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % EMBEDDING_DIM] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.where(norms, norms, 1)).tolist()
+
+def synthetic_texts(start: int, count: int):
+    topics = ["cpu", "memory", "disk", "network", "python", "weather", "music", "email", "calendar", "screenshot"]
+    return [f"User: question {i} about {topics[i % len(topics)]}\nAgent: answer {i} about {topics[(i * 7) % len(topics)]}" for i in range(start, start + count)]
+
+def fill(memory: MemorySystem, current: int, target: int) -> None:
+    """Bulk-add synthetic memories directly to the collection up to `target`."""
+    rng = np.random.default_rng(current)
+    while current < target:
+        count = min(FILL_BATCH, target - current)
+        embeddings = rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+        memory.collection.add(
+            documents=synthetic_texts(current, count),
+            embeddings=embeddings,
+            metadatas=[{"type": "interaction"}] * count,
+            ids=[f"fill-{i}" for i in range(current, current + count)]
+        )
+        current += count
+
+def legacy_store_memory(memory: MemorySystem, text: str, metadata=None) -> None:
+    """The original write path: count every stored memory to pick the next ID."""
+    embedding = memory.embed_text(text)
+    id = str(len(memory.collection.get()['ids']) + 1)
+    memory.collection.add(documents=[text], embeddings=[embedding], metadatas=[metadata] if metadata else None, ids=[id])
+
+def time_writes(store, memory: MemorySystem, writes: int):
+    latencies = []
+    for text in synthetic_texts(memory.collection.count(), writes):
+        start = time.perf_counter()
+        store(memory, text, {"type": "interaction"})
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+def bench_write(sizes, writes: int = 50, legacy: bool = False) -> None:
+    directory = tempfile.mkdtemp(prefix="bench_memory_")
+    try:
+        memory = HashingMemorySystem(directory)
+        current = 0
+        for size in sizes:
+            fill(memory, current, size)
+            current = memory.collection.count()
+            new = time_writes(MemorySystem.store_memory, memory, writes)
+            line = f"{current:>7} memories: store_memory mean {new.mean():.2f} ms, p95 {np.percentile(new, 95):.2f} ms"
+            if legacy:
+                old = time_writes(legacy_store_memory, memory, min(writes, 5))
+                line += f" | legacy mean {old.mean():.2f} ms"
+            print(line)
+            current = memory.collection.count()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def bench_ingest(count: int, use_model: bool = False) -> None:
+    texts = synthetic_texts(0, count)
+    metadatas = [{"type": "interaction"}] * count
+
+    def one_by_one(memory):
+        for text, metadata in zip(texts, metadatas):
+            memory.store_memory(text, metadata)
+
+    def write_behind(memory):
+        for text, metadata in zip(texts, metadatas):
+            memory.store_memory_later(text, metadata)
+        memory.flush()
+
+    def bulk(memory):
+        memory.store_memories(texts, metadatas)
+
+    for label, ingest in [("store_memory", one_by_one), ("ingestor", write_behind), ("store_memories", bulk)]:
+        directory = tempfile.mkdtemp(prefix="bench_memory_")
+        try:
+            memory = MemorySystem(directory) if use_model else HashingMemorySystem(directory)
+            memory.embed_texts(["warm up"])
+            start = time.perf_counter()
+            ingest(memory)
+            elapsed = time.perf_counter() - start
+            memory.ingestor.stop()
+            assert memory.collection.count() == count
+            print(f"  {label:<15} {count / elapsed:8.0f} memories/s ({elapsed:.2f}s for {count})")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+def bench_cache(count: int, use_model: bool = False) -> None:
+    rng = np.random.default_rng(0)
+    # A skewed stream: a few common commands and a long tail of one-off queries
+    queries = [f"query {int(rng.zipf(1.3)) % 500}" for _ in range(count)]
+    directory = tempfile.mkdtemp(prefix="bench_memory_")
+    try:
+        for label in ["cold process", "restarted"]:
+            memory = MemorySystem(directory) if use_model else HashingMemorySystem(directory)
+            start = time.perf_counter()
+            for query in queries:
+                memory.embed_text(query)
+            elapsed = time.perf_counter() - start
+            stats = memory.get_embedding_stats()
+            memory.close()
+            print(f"  {label:<13} {elapsed / count * 1000:7.3f} ms/query, hit rate {stats['hit_rate']:.1%} "
+                  f"({stats['hits']} memory, {stats['disk_hits']} disk, {stats['misses']} encoded)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+ATTRIBUTES = ["wifi password", "server port", "meeting room", "favourite editor", "api key", "deadline"]
+PLACES = ["office", "home", "lab", "staging", "cloud", "laptop", "team", "client"]
+
+def retrieval_corpus(count: int, facts: int, now: float):
+    """Background interactions plus `facts` facts stated twice. Returns (texts, metadatas, queries, expected)."""
+    rng = np.random.default_rng(0)
+    texts, timestamps = [], []
+    for i in range(count - 2 * facts):
+        attribute, place = ATTRIBUTES[i % len(ATTRIBUTES)], PLACES[rng.integers(len(PLACES))]
+        texts.append(f"User: what is the {attribute} for the {place}\nAgent: the {attribute} is value{rng.integers(10**6)}")
+        timestamps.append(now - rng.uniform(0, 180) * 86400)
+    queries, expected = [], []
+    for j in range(facts):
+        attribute = ATTRIBUTES[j % len(ATTRIBUTES)]
+        old, new = rng.uniform(60, 180), rng.uniform(0, 60)
+        for age, value in [(old, "old"), (new, "new")]:
+            texts.append(f"User: what is the {attribute} for project zephyr{j}\nAgent: the {attribute} is {value}{j}")
+            timestamps.append(now - age * 86400)
+        queries.append(f"what's the {attribute} of zephyr{j}")
+        expected.append(texts[-1])
+    order = rng.permutation(len(texts))
+    return [texts[i] for i in order], [{"type": "interaction", "timestamp": timestamps[i]} for i in order], queries, expected
+
+def bench_retrieval(count: int, queries: int = 200) -> None:
+    now = time.time()
+    texts, metadatas, query_texts, expected = retrieval_corpus(count, queries, now)
+    directory = tempfile.mkdtemp(prefix="bench_memory_")
+    try:
+        memory = HashingMemorySystem(directory, disk_cache=False)
+        start = time.perf_counter()
+        memory.store_memories(texts, metadatas)
+        print(f"  stored {count} memories in {time.perf_counter() - start:.1f}s")
+        start = time.perf_counter()
+        memory.retriever.load()
+        print(f"  built the lexical index in {time.perf_counter() - start:.1f}s")
+        modes = [("vector", (1.0, 0.0, 0.0)), ("lexical", (0.0, 1.0, 0.0)), ("hybrid", None)]
+        for label, weights in modes:
+            retriever = memory.retriever
+            if weights:
+                retriever = HybridRetriever(memory, *weights)
+                retriever.index = memory.retriever.index
+                retriever.load()
+            latencies, hits_1, hits_3 = [], 0, 0
+            for query, answer in zip(query_texts, expected):
+                start = time.perf_counter()
+                results = [result["document"] for result in retriever.search(query, n_results=3)]
+                latencies.append(time.perf_counter() - start)
+                hits_1 += results[:1] == [answer]
+                hits_3 += answer in results
+            latencies = np.array(latencies) * 1000
+            print(f"  {label:<8} recall@1 {hits_1 / queries:6.1%}  recall@3 {hits_3 / queries:6.1%}  "
+                  f"mean {latencies.mean():6.1f} ms  p95 {np.percentile(latencies, 95):6.1f} ms")
+        memory.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def directory_size(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+
+def time_queries(memory: MemorySystem, queries, expected):
+    latencies, hits = [], 0
+    for query, answer in zip(queries, expected):
+        start = time.perf_counter()
+        results = memory.retriever.search(query, n_results=3)
+        latencies.append(time.perf_counter() - start)
+        hits += any(f"new{answer.rsplit('new', 1)[1]}" in result["document"] for result in results)
+    return np.array(latencies) * 1000, hits / len(queries)
+
+def bench_compact(count: int, queries: int = 200) -> None:
+    texts, metadatas, query_texts, expected = retrieval_corpus(count, queries, time.time())
+    directory = tempfile.mkdtemp(prefix="bench_memory_")
+    try:
+        memory = HashingMemorySystem(directory, disk_cache=False)
+        memory.store_memories(texts, metadatas)
+
+        memory.retriever.load()
+
+        def report(label):
+            latencies, recall = time_queries(memory, query_texts, expected)
+            print(f"  {label:<7} {memory.collection.count():>7} memories, {directory_size(directory) / 2**20:7.1f} MiB on disk, "
+                  f"query mean {latencies.mean():5.1f} ms p95 {np.percentile(latencies, 95):5.1f} ms, fact recall@3 {recall:.1%}")
+
+        report("before")
+        result = compact(memory)
+        print(f"  compacted {result['scanned']} old interactions in {result['seconds']:.1f}s: "
+              f"{result['removed']} removed ({result['duplicates']} duplicates), {result['summaries']} summaries")
+        report("after")
+        memory.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+COLD_START = """
+import sys, time
+start = time.perf_counter()
+from memory import EMBEDDING_MODEL_NAME, MemorySystem
+from embeddings import EmbeddingEngine
+from vector_store import matches
+memory = MemorySystem(sys.argv[1], disk_cache=False, backend=sys.argv[2])
+memory.collection.query(query_embeddings=[[1.0] * {dim}], n_results=5)
+print(time.perf_counter() - start)
+"""
+
+def bench_backend(count: int, queries: int = 200) -> None:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    probes = vectors[rng.integers(count, size=queries)] + 0.1 * rng.standard_normal((queries, EMBEDDING_DIM)).astype(np.float32)
+    exact = None
+    for backend in ["numpy", "numpy-int8", "chroma"]:
+        directory = tempfile.mkdtemp(prefix="bench_memory_")
+        try:
+            memory = MemorySystem(directory, disk_cache=False, backend=backend)
+            collection = memory.collection
+            texts = synthetic_texts(0, count)
+            start = time.perf_counter()
+            for begin in range(0, count, FILL_BATCH):
+                end = begin + FILL_BATCH
+                collection.add(ids=[str(i) for i in range(begin, min(end, count))], embeddings=vectors[begin:end],
+                               documents=texts[begin:end], metadatas=[{"type": "interaction"}] * len(texts[begin:end]))
+            bulk = count / (time.perf_counter() - start)
+            single = []
+            for i, vector in enumerate(probes[:50]):
+                start = time.perf_counter()
+                collection.add(ids=[f"single-{i}"], embeddings=[vector.tolist()], documents=["single"], metadatas=[{"type": "note"}])
+                single.append(time.perf_counter() - start)
+            collection.delete(ids=[f"single-{i}" for i in range(len(single))])
+            latencies, results = [], []
+            for probe in probes:
+                start = time.perf_counter()
+                results.append(collection.query(query_embeddings=[probe.tolist()], n_results=10)["ids"][0])
+                latencies.append(time.perf_counter() - start)
+            memory.close()
+            if backend == "numpy":
+                exact = results
+            recall = f"recall@10 {np.mean([len(set(a) & set(b)) / 10 for a, b in zip(results, exact)]):6.1%}" if exact and backend != "numpy" else ""
+            cold = subprocess.run([sys.executable, "-c", COLD_START.replace("{dim}", str(EMBEDDING_DIM)), directory, backend],
+                                  capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+            latencies = np.array(latencies) * 1000
+            print(f"  {backend:<10} cold start {float(cold.stdout):5.2f}s  bulk {bulk:7.0f}/s  single add {np.mean(single) * 1000:6.2f} ms  "
+                  f"query mean {latencies.mean():6.2f} ms p95 {np.percentile(latencies, 95):6.2f} ms  "
+                  f"{directory_size(directory) / 2**20:6.1f} MiB  {recall}")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+OVERFETCH = 100
+
+def bench_filter(count: int, queries: int = 200) -> None:
+    rng = np.random.default_rng(0)
+    now = time.time()
+    vectors = rng.standard_normal((count, EMBEDDING_DIM)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    types = rng.choice(["interaction", "preference", "note"], size=count, p=[0.8, 0.1, 0.1])
+    metadatas = [{"type": str(types[i]), "session": f"s{rng.integers(50)}", "timestamp": now - float(rng.uniform(0, 90 * 86400))}
+                 for i in range(count)]
+    probes = rng.standard_normal((queries, EMBEDDING_DIM)).astype(np.float32)
+    filters = [
+        ("last hour", {"timestamp": {"$gte": now - 3600}}),
+        ("type", {"type": "preference"}),
+        ("session+week", {"$and": [{"session": "s7"}, {"timestamp": {"$gte": now - 7 * 86400}}]})
+    ]
+    for backend in ["numpy", "chroma"]:
+        directory = tempfile.mkdtemp(prefix="bench_memory_")
+        try:
+            memory = MemorySystem(directory, disk_cache=False, backend=backend)
+            collection = memory.collection
+            for begin in range(0, count, FILL_BATCH):
+                end = min(begin + FILL_BATCH, count)
+                collection.add(ids=[str(i) for i in range(begin, end)], embeddings=vectors[begin:end],
+                               documents=synthetic_texts(begin, end - begin), metadatas=metadatas[begin:end])
+            for label, where in filters:
+                matching = sum(matches(metadata, where) for metadata in metadatas)
+                pushed, fetched, found = [], [], 0
+                for probe in probes.tolist():
+                    start = time.perf_counter()
+                    expected = collection.query(query_embeddings=[probe], n_results=5, where=where)["ids"][0]
+                    pushed.append(time.perf_counter() - start)
+                    start = time.perf_counter()
+                    result = collection.query(query_embeddings=[probe], n_results=OVERFETCH)
+                    kept = [id for id, metadata in zip(result["ids"][0], result["metadatas"][0]) if matches(metadata, where)][:5]
+                    fetched.append(time.perf_counter() - start)
+                    found += len(set(kept) & set(expected)) / max(len(expected), 1)
+                print(f"  {backend:<6} {label:<13} {matching / count:6.2%} match  pushed down {np.mean(pushed) * 1000:6.2f} ms  "
+                      f"over-fetch {np.mean(fetched) * 1000:6.2f} ms, finds {found / queries:6.1%} of the top 5")
+            memory.close()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+def bench_embed(count: int, engines, threads=None, model_name: str = EMBEDDING_MODEL_NAME) -> None:
+    texts = synthetic_texts(0, count)
+    reference = None
+    for engine_name in ["torch"] + [name for name in engines if name != "torch"]:
+        engine = EmbeddingEngine(model_name, engine_name, threads)
+        try:
+            start = time.perf_counter()
+            engine.encode(["warm up"])
+            loaded = time.perf_counter() - start
+        except Exception as e:
+            print(f"  {engine_name:<6} skipped: {e}")
+            continue
+        start = time.perf_counter()
+        vectors = engine.encode(texts)
+        rate = count / (time.perf_counter() - start)
+        line = f"  {engine_name:<6} load {loaded:5.2f}s  {rate:8.1f} embeddings/s"
+        if reference is None:
+            reference = vectors
+        else:
+            cosine = (vectors * reference).sum(axis=1) / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1))
+            probes = range(0, count, max(1, count // 100))
+            recall = np.mean([len(set(np.argsort(-(reference @ reference[i]))[:10]) & set(np.argsort(-(vectors @ vectors[i]))[:10])) / 10
+                              for i in probes])
+            line += f"  cosine to fp32 {cosine.mean():.4f}  recall@10 {recall:6.1%}"
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmark", choices=["write", "ingest", "cache", "retrieval", "compact", "backend", "filter", "embed"])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--writes", type=int, default=50)
+    parser.add_argument("--legacy", action="store_true")
+    parser.add_argument("--count", type=int, help="default 2000; 100000 for retrieval and backend, 20000 for compact and filter")
+    parser.add_argument("--model", action="store_true", help="embed with the real model")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--engines", default="torch,int8,onnx")
+    parser.add_argument("--threads", type=int)
+    parser.add_argument("--model-name", default=EMBEDDING_MODEL_NAME)
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",")]
+    if args.benchmark == "write":
+        bench_write(sizes, args.writes, args.legacy)
+    elif args.benchmark == "ingest":
+        bench_ingest(args.count or 2000, args.model)
+    elif args.benchmark == "cache":
+        bench_cache(args.count or 2000, args.model)
+    elif args.benchmark == "retrieval":
+        bench_retrieval(args.count or 100000, args.queries)
+    elif args.benchmark == "compact":
+        bench_compact(args.count or 20000, args.queries)
+    elif args.benchmark == "backend":
+        bench_backend(args.count or 100000, args.queries)
+    elif args.benchmark == "filter":
+        bench_filter(args.count or 20000, args.queries)
+    elif args.benchmark == "embed":
+        bench_embed(args.count or 2000, args.engines.split(","), args.threads, args.model_name)
+
+if __name__ == "__main__":
+    main()
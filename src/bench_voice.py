@@ -0,0 +1,212 @@
+"""Latency benchmarks for the voice front end.
+
+Run with one or more recorded 16 kHz mono WAV fixtures:
+
+    python bench_voice.py wake path/to/jarvis_*.wav
+    python bench_voice.py endpoint path/to/command_*.wav
+    python bench_voice.py vad
+
+Without paths, WAV files under fixtures/<wake_word|commands>/ are used, and
+if there are none, fixtures are generated in a temporary directory:
+command fixtures are synthetic voiced speech (a harmonic tone with syllable
+rhythm, which webrtcvad treats as speech) between stretches of silence, and
+wake word fixtures are spoken by the pyttsx3 engine. Without a TTS engine
+the wake word benchmark falls back to synthetic speech, which still times
+the decoder but cannot be recognized.
+"""
+import glob
+import os
+import sys
+import tempfile
+import time
+import wave
+import numpy as np
+import webrtcvad
+from voice import RATE, VAD_AGGRESSIVENESS, WAKE_WORD, apply_vad, CHUNK, COMMAND_MAX_DURATION, SpeechEndpointer, WavFileSource, WakeWordDetector, stt_models
+
+FIXTURE_DIR = 'fixtures'
+WAKE_PHRASES = [f"{WAKE_WORD}, what's my CPU usage?", f"Hey {WAKE_WORD}, take a screenshot.", f"{WAKE_WORD}, open notepad."]
+# (leading silence, speech, trailing silence) in seconds
+COMMAND_LAYOUTS = [(0.3, 1.0, 4.0), (0.5, 1.8, 3.0), (0.2, 2.5, 2.5), (0.4, 3.5, 1.5)]
+
+def _write_wav(path, samples, rate=RATE):
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(samples.astype(np.int16).tobytes())
+
+def synthetic_speech(seconds, rng, f0=120.0, rate=RATE):
+    """Voiced, speech-like float audio: a gliding harmonic tone with a syllable-rate envelope."""
+    t = np.arange(int(rate * seconds)) / rate
+    pitch = f0 * (1 + 0.05 * np.sin(2 * np.pi * 3 * t))
+    phase = 2 * np.pi * np.cumsum(pitch) / rate
+    tone = sum(np.sin(k * phase) / k for k in range(1, 20))
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 4 * t + rng.uniform(0, np.pi)) ** 2
+    return tone * envelope
+
+def _to_int16(audio, peak=0.5):
+    return (audio / (np.abs(audio).max() or 1.0) * peak * 32767).astype(np.int16)
+
+def synthesize_commands(directory, seed=0):
+    """Write one command WAV per COMMAND_LAYOUTS entry and return their paths."""
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i, (lead, speech, tail) in enumerate(COMMAND_LAYOUTS):
+        noise = lambda seconds: rng.standard_normal(int(RATE * seconds)) * 0.003
+        audio = np.concatenate([noise(lead), synthetic_speech(speech, rng, f0=rng.uniform(100, 200)), noise(tail)])
+        path = os.path.join(directory, f"command_{i}_{lead + speech:.1f}s.wav")
+        _write_wav(path, _to_int16(audio))
+        paths.append(path)
+    return paths
+
+def synthesize_wake_words(directory):
+    """Speak WAKE_PHRASES with pyttsx3 into 16 kHz WAVs; without a TTS engine, write synthetic speech."""
+    paths = []
+    try:
+        import librosa
+        import pyttsx3
+        engine = pyttsx3.init()
+        raw_paths = [os.path.join(directory, f"tts_{i}.wav") for i in range(len(WAKE_PHRASES))]
+        for phrase, raw_path in zip(WAKE_PHRASES, raw_paths):
+            engine.save_to_file(phrase, raw_path)
+        engine.runAndWait()
+        for i, raw_path in enumerate(raw_paths):
+            audio, _ = librosa.load(raw_path, sr=RATE)
+            path = os.path.join(directory, f"wake_{i}.wav")
+            # Half a second of silence on each side, as in a live recording
+            _write_wav(path, _to_int16(np.pad(audio, RATE // 2)))
+            paths.append(path)
+        return paths
+    except Exception as e:
+        print(f"Text to speech unavailable ({e}); using synthetic speech, so no detection is expected.")
+    rng = np.random.default_rng(1)
+    for i in range(len(WAKE_PHRASES)):
+        audio = np.concatenate([np.zeros(RATE // 2), synthetic_speech(2.0, rng), np.zeros(RATE // 2)])
+        path = os.path.join(directory, f"wake_{i}.wav")
+        _write_wav(path, _to_int16(audio))
+        paths.append(path)
+    return paths
+
+def _fixtures(paths, subdir, synthesize=None, directory=None):
+    if paths:
+        return paths
+    paths = sorted(glob.glob(f"{FIXTURE_DIR}/{subdir}/*.wav"))
+    if paths or synthesize is None:
+        return paths
+    print(f"No fixtures in {FIXTURE_DIR}/{subdir}/; generating them.")
+    return synthesize(directory)
+
+def _report(label, values):
+    values = np.array(values) * 1000
+    print(f"  {label}: mean {values.mean():.2f} ms, p95 {np.percentile(values, 95):.2f} ms, max {values.max():.2f} ms")
+
+def bench_wake_word(paths):
+    """Compare partial-result wake detection against waiting for final results."""
+    with tempfile.TemporaryDirectory() as directory:
+        _bench_wake_word(_fixtures(paths, 'wake_word', synthesize_wake_words, directory))
+
+def _bench_wake_word(paths):
+    start = time.perf_counter()
+    stt_models.get_vosk()
+    print(f"Vosk model load: {(time.perf_counter() - start) * 1000:.0f} ms")
+    detector = WakeWordDetector()
+    for path in paths:
+        print(path)
+        for mode in ('partial', 'final-only'):
+            source = WavFileSource(path)
+            source.open()
+            detector.reset()
+            rec = detector.recognizer
+            chunk_times = []
+            position = 0
+            detected_at = None
+            while True:
+                data = source.read()
+                if not data:
+                    break
+                position += len(data) // 2
+                t0 = time.perf_counter()
+                if mode == 'partial':
+                    heard = detector.accept(data)
+                else:
+                    heard = rec.AcceptWaveform(data) and detector.wake_word in rec.Result().lower()
+                chunk_times.append(time.perf_counter() - t0)
+                if heard:
+                    detected_at = position / source.rate
+                    break
+            source.close()
+            if detected_at is None:
+                print(f"  [{mode}] wake word not detected")
+            else:
+                print(f"  [{mode}] detected at {detected_at:.2f}s of audio")
+            _report(f"[{mode}] per-chunk ({CHUNK} samples) decode", chunk_times)
+
+def _load_samples(path):
+    source = WavFileSource(path)
+    source.open()
+    chunks = []
+    while True:
+        data = source.read()
+        if not data:
+            break
+        chunks.append(data)
+    source.close()
+    return np.frombuffer(b''.join(chunks), dtype=np.int16), source.rate
+
+def bench_endpointing(paths):
+    """Report when VAD endpointing stops recording compared to the fixed window."""
+    with tempfile.TemporaryDirectory() as directory:
+        _bench_endpointing(_fixtures(paths, 'commands', synthesize_commands, directory))
+
+def _bench_endpointing(paths):
+    saved = []
+    for path in paths:
+        samples, rate = _load_samples(path)
+        endpointer = SpeechEndpointer(rate)
+        t0 = time.perf_counter()
+        end = endpointer.find_endpoint(samples)
+        elapsed = time.perf_counter() - t0
+        stop_at = end / rate
+        saved.append(COMMAND_MAX_DURATION - stop_at)
+        print(f"{path}: stops at {stop_at:.2f}s (fixed window {COMMAND_MAX_DURATION}s), "
+              f"VAD cost {elapsed * 1000:.2f} ms for {len(samples) / rate:.2f}s of audio")
+    print(f"Mean capture time saved: {np.mean(saved):.2f}s")
+
+def apply_vad_reference(audio_data, rate=RATE):
+    """The original per-frame apply_vad, kept as the baseline."""
+    vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
+    frame_length = int(rate * 30 / 1000)
+    speech_frames = []
+    for i in range(0, len(audio_data) - frame_length, frame_length):
+        frame = audio_data[i:i+frame_length]
+        frame_int16 = (frame * 32767).astype(np.int16)
+        if vad.is_speech(frame_int16.tobytes(), rate):
+            speech_frames.extend(frame)
+    return np.array(speech_frames)
+
+def bench_apply_vad(_paths, repeats=5):
+    """Compare the vectorized apply_vad with the per-frame reference on long clips."""
+    rng = np.random.default_rng(0)
+    for seconds in (5, 30, 120):
+        # Alternate one second of noise bursts and one second of silence
+        audio = (rng.standard_normal(RATE * seconds) * 0.1).astype(np.float32)
+        audio.reshape(-1, RATE)[1::2] = 0
+        expected = apply_vad_reference(audio)
+        assert np.array_equal(apply_vad(audio), expected.astype(np.float32))
+        timings = {}
+        for name, fn in (('reference', apply_vad_reference), ('vectorized', apply_vad)):
+            best = float('inf')
+            for _ in range(repeats):
+                t0 = time.perf_counter()
+                fn(audio)
+                best = min(best, time.perf_counter() - t0)
+            timings[name] = best
+        print(f"{seconds:4d}s clip: reference {timings['reference'] * 1000:.1f} ms, "
+              f"vectorized {timings['vectorized'] * 1000:.1f} ms "
+              f"({timings['reference'] / timings['vectorized']:.1f}x)")
+
+if __name__ == "__main__":
+    benchmarks = {'wake': bench_wake_word, 'endpoint': bench_endpointing, 'vad': bench_apply_vad}
+    name = sys.argv[1] if len(sys.argv) > 1 else 'wake'
+    benchmarks[name](sys.argv[2:])
@@ -0,0 +1,193 @@
+"""Compaction of old memories.
+
+Interactions newer than `hot_days` are the hot tier and stay verbatim.
+Older ones form the cold tier: they are read in storage (that is, arrival)
+order, a window at a time, and grouped by embedding similarity around a
+leader memory. Within a group, near-identical memories are dropped in
+favour of the newest one; groups of at least `min_cluster_size` memories
+are replaced by a single "summary" memory. A group holds at most as many
+memories as a summary keeps, so no exchange is dropped from it. Summaries
+are never compacted again, so the collection grows with the number of
+topics rather than the number of interactions.
+
+Each window's changes are written before the next window is read, so only
+one window of memories and embeddings is held in RAM.
+"""
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+
+# Exchanges quoted in a summary, and so the largest group one replaces
+SUMMARY_ITEMS = 5
+# Stored queries timed before and after compaction
+LATENCY_SAMPLES = 20
+INTERACTION_PATTERN = re.compile(r"User: (.*?)\nAgent: (.*)", re.DOTALL)
+
+def extractive_summary(texts: Sequence[str]) -> str:
+    """Summarize interactions without a model: the first few distinct exchanges, in full, and a count."""
+    items = []
+    for text in texts:
+        match = INTERACTION_PATTERN.match(text)
+        item = f"{match.group(1).strip()} -> {match.group(2).strip()}" if match else text.strip()
+        if item not in items:
+            items.append(item)
+    summary = f"Summary of {len(texts)} past interactions: " + "; ".join(items[:SUMMARY_ITEMS])
+    if len(items) > SUMMARY_ITEMS:
+        summary += f"; and {len(items) - SUMMARY_ITEMS} more"
+    return summary
+
+def cluster(embeddings: np.ndarray, threshold: float, max_size: int) -> List[List[int]]:
+    """Greedy leader clustering: each unassigned row in order takes its unassigned neighbours."""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    unit = embeddings / np.where(norms, norms, 1)
+    similarity = unit @ unit.T
+    assigned = np.zeros(len(unit), dtype=bool)
+    clusters = []
+    for leader in range(len(unit)):
+        if assigned[leader]:
+            continue
+        neighbours = np.flatnonzero((similarity[leader] >= threshold) & ~assigned)
+        # The leader is always its own neighbour
+        members = [leader] + [i for i in neighbours if i != leader][:max_size - 1]
+        assigned[members] = True
+        clusters.append(members)
+    return clusters
+
+def deduplicate(embeddings: np.ndarray, timestamps: Sequence[float], threshold: float) -> List[int]:
+    """Return the rows to keep: for each group of near-identical rows, the newest."""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    unit = embeddings / np.where(norms, norms, 1)
+    keep = []
+    for row in sorted(range(len(unit)), key=lambda i: timestamps[i], reverse=True):
+        if not keep or (unit[keep] @ unit[row]).max() < threshold:
+            keep.append(row)
+    return sorted(keep)
+
+def sample_queries(collection, count: int = LATENCY_SAMPLES) -> List[List[float]]:
+    """Embeddings of up to `count` stored memories, to time queries with."""
+    found = collection.get(include=["embeddings"], limit=count)
+    return [list(map(float, embedding)) for embedding in found["embeddings"]]
+
+def query_latency(collection, queries: Sequence[List[float]], n_results: int = 5) -> float:
+    """Mean seconds per nearest-neighbour query."""
+    if not queries or not collection.count():
+        return 0.0
+    n_results = min(n_results, collection.count())
+    start = time.perf_counter()
+    for query in queries:
+        collection.query(query_embeddings=[query], n_results=n_results)
+    return (time.perf_counter() - start) / len(queries)
+
+def compact(memory, hot_days: float = 7.0, similarity: float = 0.8, duplicate_similarity: float = 0.97,
+            min_cluster_size: int = 3, max_cluster_size: int = SUMMARY_ITEMS, window: int = 1000,
+            summarize: Callable[[Sequence[str]], str] = extractive_summary, clock: Callable[[], float] = time.time) -> Dict[str, Any]:
+    """Deduplicate and summarize interactions older than `hot_days`.
+
+    Returns counts of what changed, the collection size and the mean query
+    latency before and after.
+    """
+    start = time.perf_counter()
+    cutoff = clock() - hot_days * 86400
+    collection = memory.collection
+    queries = sample_queries(collection)
+    report = {"count_before": collection.count(), "query_seconds_before": query_latency(collection, queries),
+              "scanned": 0, "removed": 0, "duplicates": 0, "summaries": 0}
+    offset = 0
+    while True:
+        batch = collection.get(where={"type": "interaction"}, include=["documents", "metadatas", "embeddings"],
+                               limit=window, offset=offset)
+        if not batch["ids"]:
+            break
+        removed, summaries, summary_metadatas = compact_window(batch, cutoff, similarity, duplicate_similarity,
+                                                               min_cluster_size, max_cluster_size, summarize, report)
+        memory.store_memories(summaries, summary_metadatas)
+        memory.delete_memories(removed)
+        # Removed rows were all in this window; summaries are not interactions
+        offset += len(batch["ids"]) - len(removed)
+
+    report["count_after"] = collection.count()
+    report["query_seconds_after"] = query_latency(collection, queries)
+    report["seconds"] = time.perf_counter() - start
+    return report
+
+def compact_window(batch: Dict[str, Any], cutoff: float, similarity: float, duplicate_similarity: float,
+                   min_cluster_size: int, max_cluster_size: int, summarize: Callable[[Sequence[str]], str],
+                   report: Dict[str, Any]):
+    """Compact the cold memories of one get() batch. Returns (ids to remove, summaries, their metadata)."""
+    ids, documents, timestamps, embeddings = [], [], [], []
+    for id, document, metadata, embedding in zip(batch["ids"], batch["documents"], batch["metadatas"], batch["embeddings"]):
+        # Memories stored before timestamps existed count as old
+        timestamp = (metadata or {}).get("timestamp", 0.0)
+        if timestamp < cutoff:
+            ids.append(id)
+            documents.append(document)
+            timestamps.append(timestamp)
+            embeddings.append(embedding)
+    report["scanned"] += len(ids)
+    removed, summaries, summary_metadatas = [], [], []
+    if not ids:
+        return removed, summaries, summary_metadatas
+    rows = sorted(range(len(ids)), key=lambda i: timestamps[i])
+    vectors = np.asarray([embeddings[i] for i in rows], dtype=np.float32)
+    # Duplicates are dropped across the whole window first, so clusters capped
+    # at max_cluster_size cannot each keep a copy of the same exchange
+    unique = deduplicate(vectors, [timestamps[r] for r in rows], duplicate_similarity)
+    kept = [rows[i] for i in unique]
+    report["duplicates"] += len(rows) - len(kept)
+    kept_set = set(kept)
+    removed.extend(ids[r] for r in rows if r not in kept_set)
+    for members in cluster(vectors[unique], similarity, max_cluster_size):
+        member_rows = [kept[i] for i in members]
+        if len(member_rows) >= min_cluster_size:
+            # Newest first, so the latest statement of a fact leads the summary
+            summaries.append(summarize([documents[r] for r in sorted(member_rows, key=lambda r: timestamps[r], reverse=True)]))
+            summary_metadatas.append({
+                "type": "summary",
+                "timestamp": max(timestamps[r] for r in member_rows),
+                "first_timestamp": min(timestamps[r] for r in member_rows),
+                "summarized": len(member_rows)
+            })
+            removed.extend(ids[r] for r in member_rows)
+    report["removed"] += len(removed)
+    report["summaries"] += len(summaries)
+    return removed, summaries, summary_metadatas
+
+class MemoryCompactor:
+    """Runs `compact` on a MemorySystem every `interval` seconds on a background thread."""
+
+    def __init__(self, memory, interval: float = 6 * 3600, **options):
+        self.memory = memory
+        self.interval = interval
+        self.options = options
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self) -> Dict[str, Any]:
+        self.last_report = report = compact(self.memory, **self.options)
+        print(f"Memory compaction: {report['count_before']} -> {report['count_after']} memories "
+              f"({report['summaries']} summaries, {report['duplicates']} duplicates dropped), "
+              f"query {report['query_seconds_before'] * 1000:.1f} -> {report['query_seconds_after'] * 1000:.1f} ms, "
+              f"took {report['seconds']:.1f}s")
+        return report
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Memory compaction failed: {e}")
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="memory-compaction", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
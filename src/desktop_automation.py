@@ -1,12 +1,14 @@
-import pyautogui
 from langchain.tools import BaseTool
 from typing import Any
 import time
 import threading
-from pynput import mouse, keyboard
-from voice import speak, process_voice_input
+from voice import speak, process_voice_input, SPEECH_WAIT_TIMEOUT
+from lazy_imports import lazy_import
 
-# Disable PyAutoGUI failsafe for automation
+# Imported on first use: it connects to the display as soon as it is imported
+pyautogui = lazy_import("pyautogui")
+# Disable PyAutoGUI failsafe for automation. Setting an attribute does not
+# trigger the import, and the value is kept once the module loads.
 pyautogui.FAILSAFE = False
 
 class MouseMoveTool(BaseTool):
@@ -102,8 +104,8 @@ def on_activity():
     global last_activity
     last_activity = time.time()
 
-mouse_listener = mouse.Listener(on_move=on_activity, on_click=on_activity)
-keyboard_listener = keyboard.Listener(on_press=on_activity)
+mouse_listener = None
+keyboard_listener = None
 
 class CheckUserActivityTool(BaseTool):
     name: str = "check_user_activity"
@@ -128,7 +130,7 @@ class RequestPermissionTool(BaseTool):
     description: str = "Request verbal permission from user before taking control. Input: any (ignored)"
 
     def _run(self, query: str) -> str:
-        speak("Do you allow me to take control of the desktop? Say yes or no after the wake word.")
+        speak("Do you allow me to take control of the desktop? Say yes or no after the wake word.").wait(SPEECH_WAIT_TIMEOUT)
         response = process_voice_input()
         if response and 'yes' in response.lower():
             return "Permission granted"
@@ -150,6 +152,20 @@ desktop_tools = [
     RequestPermissionTool()
 ]
 
-# Start listeners for activity tracking
-mouse_listener.start()
-keyboard_listener.start()
\ No newline at end of file
+def start():
+    """Start the mouse/keyboard listeners for activity tracking."""
+    global mouse_listener, keyboard_listener
+    if mouse_listener is None:
+        from pynput import mouse, keyboard
+        mouse_listener = mouse.Listener(on_move=on_activity, on_click=on_activity)
+        keyboard_listener = keyboard.Listener(on_press=on_activity)
+        mouse_listener.start()
+        keyboard_listener.start()
+
+def stop():
+    global mouse_listener, keyboard_listener
+    if mouse_listener is not None:
+        mouse_listener.stop()
+        keyboard_listener.stop()
+        mouse_listener = None
+        keyboard_listener = None
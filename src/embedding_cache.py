@@ -0,0 +1,155 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+
+DIGEST_SIZE = 20
+
+class EmbeddingCache:
+    """LRU cache of embeddings keyed by a SHA-1 of the text.
+
+    `namespace` (e.g. the model name) is part of the key, so vectors from a
+    different model are never returned. With `disk_path`, embeddings are also
+    written to a memory-mapped float32 matrix (`<disk_path>.npy`) with the
+    row keys in `<disk_path>.keys`, so they survive restarts. The disk tier
+    holds `disk_capacity` rows and overwrites the oldest once full; its
+    embedding size is fixed by the first vector written.
+    """
+
+    def __init__(self, max_entries: int = 4096, namespace: str = "", disk_path: Optional[str] = None, disk_capacity: int = 65536):
+        self.max_entries = max_entries
+        self.namespace = namespace
+        self.disk_path = disk_path
+        self.disk_capacity = disk_capacity
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._keys_file = None
+        self._rows: Dict[bytes, int] = {}
+        self._row_keys: List[Optional[bytes]] = []
+        self._next_row = 0
+        if disk_path and os.path.exists(disk_path + ".npy"):
+            self._open_disk()
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha1(f"{self.namespace}\0{text}".encode("utf-8")).digest()
+
+    def _open_disk(self, dim: Optional[int] = None) -> None:
+        matrix_path, keys_path = self.disk_path + ".npy", self.disk_path + ".keys"
+        if os.path.exists(matrix_path):
+            self._matrix = np.load(matrix_path, mmap_mode="r+")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(matrix_path)), exist_ok=True)
+            self._matrix = np.lib.format.open_memmap(matrix_path, mode="w+", dtype=np.float32, shape=(self.disk_capacity, dim))
+        self.disk_capacity = self._matrix.shape[0]
+        self._row_keys = [None] * self.disk_capacity
+        self._rows = {}
+        mode = "r+b" if os.path.exists(keys_path) else "w+b"
+        # Unbuffered, so every key reaches the OS as soon as it is written
+        self._keys_file = open(keys_path, mode, buffering=0)
+        data = self._keys_file.readall()
+        for row in range(min(len(data) // DIGEST_SIZE, self.disk_capacity)):
+            digest = data[row * DIGEST_SIZE:(row + 1) * DIGEST_SIZE]
+            if digest != bytes(DIGEST_SIZE):
+                self._rows[digest] = row
+                self._row_keys[row] = digest
+        # The keys are followed by the index of the next row to overwrite
+        counter = data[self.disk_capacity * DIGEST_SIZE:]
+        self._next_row = int.from_bytes(counter, "little") if counter else 0
+
+    def _disk_get(self, digest: bytes) -> Optional[np.ndarray]:
+        row = self._rows.get(digest)
+        if row is None:
+            return None
+        return np.array(self._matrix[row])
+
+    def _disk_put(self, digest: bytes, vector: np.ndarray) -> None:
+        if self._matrix is None:
+            self._open_disk(len(vector))
+        if digest in self._rows or len(vector) != self._matrix.shape[1]:
+            return
+        row = self._next_row
+        old = self._row_keys[row]
+        if old is not None:
+            del self._rows[old]
+        # The vector is written before its key, so a key on disk always has its vector
+        self._matrix[row] = vector
+        self._keys_file.seek(row * DIGEST_SIZE)
+        self._keys_file.write(digest)
+        self._next_row = (row + 1) % self.disk_capacity
+        self._keys_file.seek(self.disk_capacity * DIGEST_SIZE)
+        self._keys_file.write(self._next_row.to_bytes(8, "little"))
+        self._rows[digest] = row
+        self._row_keys[row] = digest
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Return the cached embedding for `text`, or None."""
+        return self.get_many([text])[0]
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Look up several texts; missing ones are None."""
+        results = []
+        with self._lock:
+            for text in texts:
+                digest = self.key(text)
+                vector = self._entries.get(digest)
+                if vector is not None:
+                    self._entries.move_to_end(digest)
+                    self.hits += 1
+                elif self._matrix is not None and (vector := self._disk_get(digest)) is not None:
+                    self.disk_hits += 1
+                    self._remember(digest, vector)
+                else:
+                    self.misses += 1
+                results.append(vector)
+        return results
+
+    def put(self, text: str, vector: Sequence[float]) -> None:
+        self.put_many([text], [vector])
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        with self._lock:
+            for text, vector in zip(texts, vectors):
+                digest = self.key(text)
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember(digest, vector)
+                if self.disk_path:
+                    self._disk_put(digest, vector)
+
+    def _remember(self, digest: bytes, vector: np.ndarray) -> None:
+        self._entries[digest] = vector
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def flush(self) -> None:
+        """Write the disk tier out to the files."""
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+                self._keys_file.flush()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            if self._keys_file is not None:
+                self._keys_file.close()
+                self._keys_file = None
+            self._matrix = None
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "disk_entries": len(self._rows),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
@@ -0,0 +1,62 @@
+"""Sentence embedding engines for MemorySystem.
+
+    torch  full-precision PyTorch, the default
+    int8   PyTorch with the Linear layers dynamically quantized to int8
+    onnx   ONNX Runtime, through sentence-transformers' ONNX backend
+           (needs `pip install optimum[onnxruntime]`)
+
+The model is loaded on first use. `threads` caps the CPU threads used for
+inference; for the PyTorch engines this is process-wide (torch.set_num_threads).
+"""
+import threading
+from typing import Optional, Sequence
+import numpy as np
+
+EMBEDDING_ENGINES = ("torch", "int8", "onnx")
+
+class EmbeddingEngine:
+    def __init__(self, model_name: str, engine: str = "torch", threads: Optional[int] = None, batch_size: int = 64):
+        if engine not in EMBEDDING_ENGINES:
+            raise ValueError(f"Unknown embedding engine: {engine}")
+        self.model_name = model_name
+        self.engine = engine
+        self.threads = threads
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_namespace(self) -> str:
+        """Key prefix for cached embeddings; engines other than torch give slightly different vectors."""
+        return self.model_name if self.engine == "torch" else f"{self.model_name}:{self.engine}"
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                self._model = self._load()
+            return self._model
+
+    def _load(self):
+        # Imported here rather than with lazy_import: transformers inspects it while
+        # initializing, which would run a lazy module in the middle of that import
+        import sentence_transformers
+        if self.engine == "onnx":
+            model_kwargs = {}
+            if self.threads:
+                import onnxruntime
+                options = onnxruntime.SessionOptions()
+                options.intra_op_num_threads = self.threads
+                model_kwargs["session_options"] = options
+            return sentence_transformers.SentenceTransformer(self.model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+        import torch
+        if self.threads:
+            torch.set_num_threads(self.threads)
+        # Dynamically quantized layers only run on the CPU
+        model = sentence_transformers.SentenceTransformer(self.model_name, device="cpu" if self.engine == "int8" else None)
+        if self.engine == "int8":
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        return self.model.encode(list(texts), batch_size=self.batch_size, convert_to_numpy=True)
@@ -0,0 +1,145 @@
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Optional
+
+class FakeOllamaServer:
+    """Minimal local stand-in for the Ollama HTTP API, for tests and benchmarks.
+
+    /api/generate streams a canned response token by token as NDJSON, the
+    same way Ollama does, and every request body is recorded in `requests`.
+    Responses come from `responder(prompt)` if given, otherwise from the
+    `responses` list in order (the last one repeats). `request_delay` and
+    `token_delay` imitate prompt processing and generation time.
+
+    Like Ollama, the server keeps the previous prompt "in the KV cache" while
+    the model and options stay the same and `keep_alive` is not 0; only the
+    words after the shared prefix count towards `prompt_eval_count`, each
+    costing `prompt_token_delay`.
+    """
+
+    def __init__(self, responses: Optional[List[str]] = None, responder: Optional[Callable[[str], str]] = None, token_delay: float = 0.0, request_delay: float = 0.0, prompt_token_delay: float = 0.0):
+        self.responses = list(responses or ["Final Answer: OK"])
+        self.responder = responder
+        self.token_delay = token_delay
+        self.request_delay = request_delay
+        self.prompt_token_delay = prompt_token_delay
+        self._cache_key = None
+        self._cached_prompt = ""
+        self.requests: List[dict] = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def generate_calls(self) -> int:
+        return sum(1 for r in self.requests if r["path"] == "/api/generate")
+
+    def _next_response(self, prompt: str) -> str:
+        if self.responder:
+            return self.responder(prompt)
+        with self._lock:
+            if len(self.responses) > 1:
+                return self.responses.pop(0)
+            return self.responses[0]
+
+    def _evaluate_prompt(self, body: dict) -> int:
+        """Return the number of prompt words that miss the cached prefix."""
+        prompt = body.get("prompt", "")
+        # Stop sequences are applied per request and don't force a reload
+        options = {k: v for k, v in (body.get("options") or {}).items() if k != "stop"}
+        key = (body.get("model"), json.dumps(options, sort_keys=True))
+        with self._lock:
+            cached = self._cached_prompt if key == self._cache_key else ""
+            shared = len(os.path.commonprefix([cached, prompt]))
+            if body.get("keep_alive") in (0, "0", "0s"):
+                self._cache_key, self._cached_prompt = None, ""
+            else:
+                self._cache_key, self._cached_prompt = key, prompt
+        cached_words = len(prompt[:shared].split())
+        if 0 < shared < len(prompt) and not prompt[shared - 1].isspace():
+            # A word cut by the end of the shared prefix is evaluated again
+            cached_words -= 1
+        return len(prompt.split()) - cached_words
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.0"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with server._lock:
+                    server.requests.append({"path": self.path, "body": body})
+                if self.path != "/api/generate":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                if server.request_delay:
+                    time.sleep(server.request_delay)
+                prompt_start = time.perf_counter()
+                prompt_tokens = server._evaluate_prompt(body)
+                if server.prompt_token_delay:
+                    time.sleep(prompt_tokens * server.prompt_token_delay)
+                prompt_ns = int((time.perf_counter() - prompt_start) * 1e9)
+                text = server._next_response(body.get("prompt", ""))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                start = time.perf_counter()
+                tokens = re.findall(r"\S+\s*|\s+", text)
+                for token in tokens:
+                    if server.token_delay:
+                        time.sleep(server.token_delay)
+                    self._write({"model": body.get("model"), "response": token, "done": False})
+                elapsed_ns = int((time.perf_counter() - start) * 1e9)
+                self._write({
+                    "model": body.get("model"),
+                    "response": "",
+                    "done": True,
+                    "done_reason": "stop",
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": prompt_ns,
+                    "eval_count": len(tokens),
+                    "eval_duration": elapsed_ns,
+                    "load_duration": 0,
+                    "total_duration": prompt_ns + elapsed_ns
+                })
+
+            def _write(self, payload):
+                self.wfile.write((json.dumps(payload) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+        return Handler
@@ -1,10 +1,33 @@
 import json
 import os
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
 FEEDBACK_FILE = "feedback_data.jsonl"
 
+# Called with each new feedback entry, e.g. to invalidate cached answers
+_feedback_listeners: List[Callable[[Dict], None]] = []
+
+def add_feedback_listener(listener: Callable[[Dict], None]) -> None:
+    """
+    Register a callback to run whenever feedback is logged.
+
+    Args:
+        listener: Function receiving the logged feedback entry
+    """
+    if listener not in _feedback_listeners:
+        _feedback_listeners.append(listener)
+
+def remove_feedback_listener(listener: Callable[[Dict], None]) -> None:
+    """
+    Unregister a callback added with add_feedback_listener.
+
+    Args:
+        listener: The function that was registered
+    """
+    if listener in _feedback_listeners:
+        _feedback_listeners.remove(listener)
+
 def log_feedback(original_instruction: str, agent_response: str, correction: str, context: Optional[str] = None) -> None:
     """
     Log user feedback/correction for continuous learning.
@@ -28,6 +51,13 @@ def log_feedback(original_instruction: str, agent_response: str, correction: str
 
     print(f"Feedback logged: {correction}")
 
+    # The entry is already on disk, so a failing listener must not fail the call
+    for listener in list(_feedback_listeners):
+        try:
+            listener(feedback_entry)
+        except Exception as e:
+            print(f"Feedback listener failed: {e}")
+
 def load_feedback() -> List[Dict]:
     """
     Load all accumulated feedback data.
@@ -1,27 +1,55 @@
-from pynput import keyboard
-from voice import process_voice_input
-from agent import run_agentic_loop
+import threading
+from voice import get_audio_capture
+
+# Called instead of running the agent loop here when set, e.g. to post the
+# trigger to the agent's event loop
+_trigger = None
+
+def set_trigger(callback):
+    """Route hotkey presses to `callback(position)`, where position is the capture position at the press."""
+    global _trigger
+    _trigger = callback
 
 def on_activate():
     print("Hotkey activated: Ctrl+Alt+J")
-    # Trigger voice input and run agent loop
-    transcription = process_voice_input()
-    if transcription:
-        result = run_agentic_loop()
-        print(f"Agent result: {result}")
-
-# Set up hotkey
-hotkey = keyboard.HotKey(
-    keyboard.HotKey.parse('<ctrl>+<alt>+j'),
-    on_activate
-)
-
-def for_canonical(f):
-    return lambda k: f(l.canonical(k))
-
-l = keyboard.Listener(
-    on_press=for_canonical(hotkey.press),
-    on_release=for_canonical(hotkey.release)
-)
-
-l.start()
\ No newline at end of file
+    # The hotkey stands in for the wake word: the command starts at the key press
+    position = get_audio_capture().position
+    if _trigger is not None:
+        _trigger(position)
+        return
+    # Listener callbacks must not block, so the loop runs on its own thread
+    threading.Thread(target=run_agent, args=(position,), daemon=True).start()
+
+def run_agent(position):
+    # Imported here: agent imports this module, so a top-level import is circular
+    from agent import run_agentic_loop
+    result = run_agentic_loop(start=position)
+    print(f"Agent result: {result}")
+
+listener = None
+
+def start():
+    """Start listening for Ctrl+Alt+J."""
+    global listener
+    if listener is not None:
+        return
+    from pynput import keyboard
+    hotkey = keyboard.HotKey(
+        keyboard.HotKey.parse('<ctrl>+<alt>+j'),
+        on_activate
+    )
+
+    def for_canonical(f):
+        return lambda k: f(listener.canonical(k))
+
+    listener = keyboard.Listener(
+        on_press=for_canonical(hotkey.press),
+        on_release=for_canonical(hotkey.release)
+    )
+    listener.start()
+
+def stop():
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
@@ -0,0 +1,126 @@
+import re
+import threading
+from collections import Counter, deque
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# Politeness and wake-word fillers stripped before matching
+FILLER_PATTERN = re.compile(r"^((hey |ok |okay )?jarvis\b|please\b|can you\b|could you\b|would you\b|[,\s])+|(\bplease|\bfor me|\bright now|\bnow|[,\s])+$")
+
+class RouteMatch(NamedTuple):
+    tool: str
+    tool_input: str
+    normalized: str
+
+class IntentRule:
+    """A high-confidence command pattern for one tool.
+
+    Patterns must match the whole normalized command, so anything with extra
+    clauses ("... and then ...") falls through to the agent. Named groups in
+    the pattern fill `input_template`.
+    """
+
+    def __init__(self, tool: str, patterns: List[str], input_template: str = "", defaults: Optional[Dict[str, str]] = None):
+        self.tool = tool
+        self.patterns = [re.compile(p) for p in patterns]
+        self.input_template = input_template
+        self.defaults = defaults or {}
+
+    def match(self, command: str) -> Optional[str]:
+        """Return the tool input if the command matches, else None."""
+        for pattern in self.patterns:
+            m = pattern.fullmatch(command)
+            if m:
+                values = {name: "" for name in pattern.groupindex}
+                values.update(self.defaults)
+                values.update({k: v for k, v in m.groupdict().items() if v})
+                return self.input_template.format(**values)
+        return None
+
+WHAT_IS = r"((what'?s|what is|show( me)?|check|get|tell me)( my| the)?( current)? )?"
+
+DEFAULT_RULES = [
+    IntentRule("cpu_usage", [
+        WHAT_IS + r"(cpu|processor)( usage| load| utilization| percentage)?",
+        r"how (busy|loaded) is (my |the )?(cpu|processor)",
+    ]),
+    IntentRule("memory_usage", [
+        WHAT_IS + r"(memory|ram)( usage| use)?",
+        r"how much (memory|ram) (am i using|is (being )?used|is free)",
+    ]),
+    IntentRule("disk_usage", [
+        WHAT_IS + r"disk( usage| space)?( (for|on|of) (?P<path>\S+))?",
+        r"how much disk space (is left|do i have)( on (?P<path>\S+))?",
+    ], input_template="{path}", defaults={"path": "C:"}),
+    IntentRule("list_processes", [
+        r"((list|show)( me)?|what are)( all)?( the| my)?( running)? (processes|programs)( running)?",
+        r"what'?s running",
+    ]),
+    IntentRule("process_details", [
+        r"((show|get) )?(the )?(details|info|information) (for|of|about|on) (process|pid) (?P<pid>\d+)",
+    ], input_template="{pid}"),
+    IntentRule("network_stats", [
+        WHAT_IS + r"network( stats| statistics| usage| traffic)",
+    ]),
+    IntentRule("take_screenshot", [
+        r"(take|grab|capture) (a )?screen ?shot( of (the|my) screen)?( and save it as (?P<filename>\S+))?",
+    ], input_template="{filename}"),
+    IntentRule("mouse_move", [
+        r"move (the )?mouse to (?P<x>\d+)[ ,]+(?P<y>\d+)",
+    ], input_template="{x},{y}"),
+    IntentRule("mouse_click", [
+        r"(left )?click( the mouse)?",
+    ], input_template="left"),
+]
+
+def normalize_command(command: str) -> str:
+    """Lowercase the command and strip punctuation and filler words."""
+    text = command.lower().replace("\u2019", "'")
+    text = re.sub(r"[^\w\s',:./\\-]", " ", text)
+    text = re.sub(r"\s+", " ", text).strip(" .")
+    return FILLER_PATTERN.sub("", text).strip(" .")
+
+class IntentRouter:
+    """Fast path that sends common tool commands straight to their tool.
+
+    Only rules whose tool is actually registered are used. Every decision
+    is counted so the hit rate can be monitored.
+    """
+
+    def __init__(self, tool_names: Iterable[str], rules: Optional[List[IntentRule]] = None, history_size: int = 50):
+        available = set(tool_names)
+        self.rules = [rule for rule in (rules or DEFAULT_RULES) if rule.tool in available]
+        self._lock = threading.Lock()
+        self.routed = Counter()
+        self.fallbacks = 0
+        self.recent = deque(maxlen=history_size)
+
+    def route(self, command: str) -> Optional[RouteMatch]:
+        """Return the tool to run for a command, or None to fall back to the agent."""
+        normalized = normalize_command(command)
+        match = None
+        for rule in self.rules:
+            tool_input = rule.match(normalized)
+            if tool_input is not None:
+                match = RouteMatch(rule.tool, tool_input, normalized)
+                break
+        with self._lock:
+            if match:
+                self.routed[match.tool] += 1
+            else:
+                self.fallbacks += 1
+            self.recent.append((command, match.tool if match else None))
+        return match
+
+    def get_metrics(self) -> Dict[str, object]:
+        """Return routing counts and the fast-path hit rate."""
+        with self._lock:
+            routed = sum(self.routed.values())
+            total = routed + self.fallbacks
+            return {
+                "requests": total,
+                "routed": routed,
+                "fallbacks": self.fallbacks,
+                "hit_rate": routed / total if total else 0.0,
+                "by_tool": dict(self.routed),
+                "recent": list(self.recent)
+            }
@@ -0,0 +1,24 @@
+import importlib
+import importlib.util
+import sys
+
+def lazy_import(name: str):
+    """Return module `name`, deferring its execution until an attribute is first used.
+
+    Only the module spec is looked up now, so a missing package still fails
+    at import time. Meant for heavy pure-Python packages (whisper,
+    chromadb); extension modules are imported eagerly.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'", name=name)
+    if spec.loader is None or not hasattr(spec.loader, "exec_module") or spec.origin is None or not spec.origin.endswith(".py"):
+        return importlib.import_module(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
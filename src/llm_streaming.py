@@ -0,0 +1,162 @@
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List
+from langchain_core.callbacks import BaseCallbackHandler
+
+# A sentence ends at . ! ? (optionally followed by a closing quote/bracket) and whitespace, or at a newline
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n+")
+
+class SentenceSplitter:
+    """Accumulates streamed tokens and emits each sentence as soon as it is complete."""
+
+    def __init__(self, on_sentence: Callable[[str], Any]):
+        self.on_sentence = on_sentence
+        self._buffer = ""
+        self.sentences: List[str] = []
+
+    def feed(self, text: str) -> None:
+        self._buffer += text
+        while True:
+            match = SENTENCE_BOUNDARY.search(self._buffer)
+            if not match:
+                return
+            sentence = self._buffer[:match.end()].strip()
+            self._buffer = self._buffer[match.end():]
+            self._emit(sentence)
+
+    def flush(self) -> None:
+        """Emit whatever is left once the stream has ended."""
+        sentence = self._buffer.strip()
+        self._buffer = ""
+        self._emit(sentence)
+
+    def _emit(self, sentence: str) -> None:
+        if sentence:
+            self.sentences.append(sentence)
+            self.on_sentence(sentence)
+
+class FinalAnswerSpeaker(BaseCallbackHandler):
+    """Speaks the ReAct final answer while the LLM is still generating it.
+
+    Streamed tokens are scanned for the "Final Answer:" marker; everything
+    after it is cut into sentences and handed to `speak_fn` one sentence at
+    a time, so the first words are spoken long before generation ends.
+    """
+
+    # Tokens must be handled in order, also when the LLM is called asynchronously
+    run_inline = True
+
+    def __init__(self, speak_fn: Callable[[str], Any], marker: str = "Final Answer:"):
+        self.speak_fn = speak_fn
+        self.marker = marker
+        self.splitter = SentenceSplitter(speak_fn)
+        self._text = ""
+        self._in_answer = False
+
+    @property
+    def spoken(self) -> List[str]:
+        return self.splitter.sentences
+
+    def on_llm_start(self, serialized: Any, prompts: List[str], **kwargs: Any) -> None:
+        # Each ReAct step is a separate LLM call
+        self._text = ""
+        self._in_answer = False
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        if self._in_answer:
+            self.splitter.feed(token)
+            return
+        self._text += token
+        index = self._text.find(self.marker)
+        if index != -1:
+            self._in_answer = True
+            self.splitter.feed(self._text[index + len(self.marker):])
+
+    def on_llm_end(self, response: Any, **kwargs: Any) -> None:
+        if self._in_answer:
+            self.splitter.flush()
+            self._in_answer = False
+
+class LLMTimingHandler(BaseCallbackHandler):
+    """Records where the time of each Ollama call goes.
+
+    Ollama reports prompt evaluation and generation separately in the final
+    chunk's generation info. A prompt whose prefix was served from the KV
+    cache shows up as a small `prompt_eval_count` and a short
+    `prompt_eval_ms`. Time to first token is measured locally.
+    """
+
+    run_inline = True
+
+    def __init__(self, history_size: int = 100, log: bool = False):
+        self.calls = deque(maxlen=history_size)
+        self.log = log
+        self._started: Dict[Any, float] = {}
+        self._first_token: Dict[Any, float] = {}
+        self._lock = threading.Lock()
+
+    def on_llm_start(self, serialized: Any, prompts: List[str], *, run_id: Any = None, **kwargs: Any) -> None:
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_llm_new_token(self, token: str, *, run_id: Any = None, **kwargs: Any) -> None:
+        with self._lock:
+            self._first_token.setdefault(run_id, time.perf_counter())
+
+    def on_llm_end(self, response: Any, *, run_id: Any = None, **kwargs: Any) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            started = self._started.pop(run_id, now)
+            first_token = self._first_token.pop(run_id, now)
+        info = {}
+        if response.generations and response.generations[0]:
+            info = response.generations[0][0].generation_info or {}
+        stats = {
+            "prompt_eval_count": info.get("prompt_eval_count", 0),
+            "prompt_eval_ms": info.get("prompt_eval_duration", 0) / 1e6,
+            "eval_count": info.get("eval_count", 0),
+            "eval_ms": info.get("eval_duration", 0) / 1e6,
+            "load_ms": info.get("load_duration", 0) / 1e6,
+            "first_token_ms": (first_token - started) * 1000,
+            "total_ms": (now - started) * 1000
+        }
+        with self._lock:
+            self.calls.append(stats)
+        if self.log:
+            print(f"LLM call: prompt {stats['prompt_eval_count']} tokens in {stats['prompt_eval_ms']:.0f} ms, "
+                  f"generation {stats['eval_count']} tokens in {stats['eval_ms']:.0f} ms, "
+                  f"first token after {stats['first_token_ms']:.0f} ms")
+
+    def on_llm_error(self, error: BaseException, *, run_id: Any = None, **kwargs: Any) -> None:
+        with self._lock:
+            self._started.pop(run_id, None)
+            self._first_token.pop(run_id, None)
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return totals over the recorded calls."""
+        with self._lock:
+            calls = list(self.calls)
+        totals = {"calls": len(calls)}
+        for key in ("prompt_eval_count", "prompt_eval_ms", "eval_count", "eval_ms", "total_ms"):
+            totals[key] = sum(call[key] for call in calls)
+        return totals
+
+class ToolRecorder(BaseCallbackHandler):
+    """Collects the names of the tools run while answering one request."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.tools: List[str] = []
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs: Any) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name")
+        if name and name not in self.tools:
+            self.tools.append(name)
+
+    @property
+    def source_tool(self):
+        """The tools used, comma-separated, or None if the answer needed none."""
+        return ",".join(self.tools) or None
@@ -1,68 +1,379 @@
-import chromadb
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any, Optional
+import atexit
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import List, Dict, Any, Optional, Sequence
+import numpy as np
+from lazy_imports import lazy_import
+from embedding_cache import EmbeddingCache
+from retrieval import CONTEXT_TOKENS, HybridRetriever
+from vector_store import NumpyVectorStore
+from embeddings import EmbeddingEngine
+
+# Takes seconds to import; it is loaded on first use
+chromadb = lazy_import("chromadb")
+
+EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+EMBEDDING_BATCH_SIZE = 64
+# "torch", "int8" or "onnx" (see embeddings.py); None threads leaves the runtime's default
+EMBEDDING_ENGINE = "torch"
+EMBEDDING_THREADS = None
+# Chroma refuses larger add() calls
+MAX_ADD_BATCH = 5000
+# Embeddings kept in RAM, and on disk (memory-mapped, survives restarts)
+EMBEDDING_CACHE_SIZE = 4096
+EMBEDDING_DISK_CACHE_SIZE = 16384
+# "chroma", or "numpy" / "numpy-int8" for the in-process NumpyVectorStore
+MEMORY_BACKEND = "chroma"
+
+# Metadata every memory carries, with its type. "type" defaults to "note",
+# "timestamp" to the time of storing and "session" to the MemorySystem's
+# session; "source_tool" is optional. Other keys are stored as given.
+METADATA_FIELDS = {"timestamp": float, "type": str, "session": str, "source_tool": str}
+
+def make_metadata(metadata: Optional[Dict[str, Any]], session: str, now: Optional[float] = None) -> Dict[str, Any]:
+    """Fill in the default metadata fields and check their types."""
+    metadata = {"timestamp": time.time() if now is None else now, "type": "note", "session": session, **(metadata or {})}
+    for field, kind in METADATA_FIELDS.items():
+        value = metadata.get(field)
+        if value is None:
+            # Chroma does not store None values
+            metadata.pop(field, None)
+        elif kind is float and isinstance(value, (int, float)) and not isinstance(value, bool):
+            metadata[field] = float(value)
+        elif not isinstance(value, kind):
+            raise TypeError(f"Memory metadata '{field}' must be {kind.__name__}, not {type(value).__name__}")
+    return metadata
+
+def memory_filter(where: Optional[Dict[str, Any]] = None, type=None, session=None, source_tool=None,
+                  since: Optional[float] = None, until: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Combine a Chroma `where` filter with field and time-window conditions.
+
+    `type`, `session` and `source_tool` take a value or a list of values;
+    `since` and `until` are timestamps (since inclusive, until exclusive).
+    """
+    clauses = [where] if where else []
+    for field, value in (("type", type), ("session", session), ("source_tool", source_tool)):
+        if isinstance(value, (list, tuple, set)):
+            clauses.append({field: {"$in": list(value)}})
+        elif value is not None:
+            clauses.append({field: value})
+    if since is not None:
+        clauses.append({"timestamp": {"$gte": float(since)}})
+    if until is not None:
+        clauses.append({"timestamp": {"$lt": float(until)}})
+    if not clauses:
+        return None
+    # Chroma wants one condition per dict, combined with $and
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+# Sentinel that tells the ingestor thread to exit
+_STOP = object()
+
+class MemoryIngestor:
+    """Write-behind queue that stores memories in batches.
+
+    `submit()` returns at once. A worker thread collects queued memories
+    until `batch_size` are waiting or `flush_interval` seconds have passed
+    since the first of them, then embeds the batch with one encode call and
+    writes it with one collection.add. Everything queued is written on
+    flush() and stop(); stop() also runs at interpreter exit.
+    """
+
+    def __init__(self, memory: "MemorySystem", batch_size: int = EMBEDDING_BATCH_SIZE, flush_interval: float = 2.0, max_pending: int = 10000):
+        self.memory = memory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Full queue blocks submit(): backpressure for bulk imports
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="memory-ingest", daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+
+    def submit(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Queue a memory and return the ID it will be stored under."""
+        self.start()
+        id = uuid.uuid4().hex
+        self._queue.put((id, text, metadata))
+        return id
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything submitted so far is written. Returns False on timeout."""
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def stop(self) -> None:
+        """Write what is queued and stop the worker thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "written": self.written,
+            "failed": self.failed,
+            "pending": self.pending(),
+            "mean_batch_size": self.written / self.batches if self.batches else 0.0
+        }
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is _STOP:
+                    stopping = True
+                    break
+                if isinstance(item, threading.Event):
+                    # A flush request writes the batch right away
+                    waiters.append(item)
+                    break
+                batch.append(item)
+                remaining = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for waiter in waiters:
+                waiter.set()
+
+    def _write(self, batch) -> None:
+        if not batch:
+            return
+        ids, texts, metadatas = zip(*batch)
+        try:
+            self.memory.store_memories(texts, metadatas, ids)
+            self.batches += 1
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            print(f"Failed to store {len(batch)} memories: {e}")
 
 class MemorySystem:
-    def __init__(self, persist_directory: str = "./data"):
-        # Set up ChromaDB client with persistent storage
-        self.client = chromadb.PersistentClient(path=persist_directory)
+    """Long-term memory in ChromaDB or a NumpyVectorStore.
 
-        # Load the embedding model
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+    The client, collection and embedding model are created on first use, so
+    constructing the global instance costs nothing at import time; call
+    `preload()` to warm them up in the background. `backend` picks the
+    store; both offer the same collection API.
+    """
 
-        # Create or get the collection for memories
-        self.collection = self.client.get_or_create_collection(
-            name="agent_memories",
-            metadata={"description": "Agent's long-term memory for interactions and preferences"}
+    def __init__(self, persist_directory: str = "./data", disk_cache: bool = True, backend: str = MEMORY_BACKEND,
+                 embedding_engine: str = EMBEDDING_ENGINE, embedding_threads: Optional[int] = EMBEDDING_THREADS):
+        if backend not in ("chroma", "numpy", "numpy-int8"):
+            raise ValueError(f"Unknown memory backend: {backend}")
+        self.persist_directory = persist_directory
+        self.backend = backend
+        # Tags the memories stored by this process
+        self.session = uuid.uuid4().hex[:12]
+        self.embedder = EmbeddingEngine(EMBEDDING_MODEL_NAME, embedding_engine, embedding_threads, EMBEDDING_BATCH_SIZE)
+        self.embedding_cache = EmbeddingCache(
+            EMBEDDING_CACHE_SIZE,
+            namespace=self.embedder.cache_namespace,
+            disk_path=os.path.join(persist_directory, "embedding_cache") if disk_cache else None,
+            disk_capacity=EMBEDDING_DISK_CACHE_SIZE
         )
+        self._client = None
+        self._collection = None
+        self._lock = threading.Lock()
+        self.ingestor = MemoryIngestor(self)
+        self.retriever = HybridRetriever(self)
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                # Set up ChromaDB client with persistent storage
+                self._client = chromadb.PersistentClient(path=self.persist_directory)
+            return self._client
+
+    @property
+    def collection(self):
+        if self._collection is None and self.backend != "chroma":
+            with self._lock:
+                if self._collection is None:
+                    self._collection = NumpyVectorStore(os.path.join(self.persist_directory, "numpy_store"), quantize=self.backend == "numpy-int8")
+        if self._collection is None:
+            client = self.client
+            with self._lock:
+                if self._collection is None:
+                    # Create or get the collection for memories
+                    self._collection = client.get_or_create_collection(
+                        name="agent_memories",
+                        metadata={"description": "Agent's long-term memory for interactions and preferences"}
+                    )
+        return self._collection
+
+    @property
+    def embedding_model(self):
+        return self.embedder.model
+
+    def preload(self) -> threading.Thread:
+        """Load the embedding model and open the collection on a background thread."""
+        def load():
+            self.embedding_model
+            self.collection
+        thread = threading.Thread(target=load, name="memory-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def _encode(self, texts: List[str]):
+        return self.embedder.encode(texts)
+
+    def embed_texts(self, texts: Sequence[str]) -> List[List[float]]:
+        """Generate embeddings for several texts with one encode call.
+
+        Texts found in the embedding cache are not encoded again.
+        """
+        vectors = self.embedding_cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            encoded = self._encode(missing)
+            self.embedding_cache.put_many(missing, encoded)
+            by_text = dict(zip(missing, encoded))
+            vectors = [by_text[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in vectors]
+
+    def get_embedding_stats(self) -> Dict[str, float]:
+        """Hit-rate statistics of the embedding cache."""
+        return self.embedding_cache.get_stats()
 
     def embed_text(self, text: str) -> List[float]:
         """Generate embeddings for the given text."""
-        return self.embedding_model.encode(text).tolist()
-
-    def store_memory(self, text: str, metadata: Optional[Dict[str, Any]] = None):
-        """Store a memory with its embedding."""
-        embedding = self.embed_text(text)
-        id = str(len(self.collection.get()['ids']) + 1)  # Simple ID generation
-        self.collection.add(
-            documents=[text],
-            embeddings=[embedding],
-            metadatas=[metadata] if metadata else [{}],
-            ids=[id]
-        )
+        return self.embed_texts([text])[0]
+
+    def store_memory(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Store a memory with its embedding. Returns the new memory's ID."""
+        return self.store_memories([text], [metadata])[0]
+
+    def store_memories(self, texts: Sequence[str], metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None, ids: Optional[Sequence[str]] = None) -> List[str]:
+        """Embed and store several memories in one batch. Returns their IDs."""
+        if not texts:
+            return []
+        embeddings = self.embed_texts(texts)
+        # Random IDs need no look-up of the existing ones and never collide after deletions
+        ids = list(ids) if ids else [uuid.uuid4().hex for _ in texts]
+        now = time.time()
+        metadatas = [make_metadata(m, self.session, now) for m in (metadatas or [None] * len(texts))]
+        for start in range(0, len(texts), MAX_ADD_BATCH):
+            end = start + MAX_ADD_BATCH
+            self.collection.add(
+                documents=list(texts[start:end]),
+                embeddings=embeddings[start:end],
+                metadatas=metadatas[start:end],
+                ids=ids[start:end]
+            )
+        self.retriever.add(ids, texts)
+        return ids
 
-    def retrieve_relevant_memories(self, query: str, n_results: int = 5):
-        """Retrieve relevant memories based on semantic search."""
+    def delete_memories(self, ids: Sequence[str]) -> None:
+        """Delete memories by ID."""
+        ids = list(ids)
+        for start in range(0, len(ids), MAX_ADD_BATCH):
+            self.collection.delete(ids=ids[start:start + MAX_ADD_BATCH])
+        self.retriever.remove(ids)
+
+    def store_memory_later(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """Queue a memory for the background ingestor and return its ID without waiting."""
+        # Stamped now, not when the ingestor gets to it
+        return self.ingestor.submit(text, make_metadata(metadata, self.session))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until all queued memories are stored."""
+        return self.ingestor.flush(timeout)
+
+    def close(self) -> None:
+        """Write queued memories, the embedding cache's disk tier and the NumPy store."""
+        self.ingestor.stop()
+        self.embedding_cache.close()
+        if isinstance(self._collection, NumpyVectorStore):
+            self._collection.close()
+            self._collection = None
+
+    def retrieve_relevant_memories(self, query: str, n_results: int = 5, where: Optional[Dict[str, Any]] = None):
+        """Retrieve relevant memories based on semantic search, optionally filtered by metadata."""
         query_embedding = self.embed_text(query)
         results = self.collection.query(
             query_embeddings=[query_embedding],
-            n_results=n_results
+            n_results=n_results,
+            where=where
         )
         return results
 
+    def search_memories(self, query: Optional[str] = None, n_results: int = 5, where: Optional[Dict[str, Any]] = None,
+                        type=None, session=None, source_tool=None, since: Optional[float] = None,
+                        until: Optional[float] = None, within: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Find memories by metadata and, with `query`, by similarity.
+
+        The filter (see memory_filter; `within` is a number of seconds back
+        from now) is evaluated by the store, so only matching memories are
+        scanned. With a query, results are the most similar first; without
+        one, the newest first.
+        """
+        if within is not None:
+            since = max(since or 0.0, time.time() - within)
+        where = memory_filter(where, type, session, source_tool, since, until)
+        if query is not None:
+            found = self.collection.query(query_embeddings=[self.embed_text(query)], n_results=n_results, where=where,
+                                          include=["documents", "metadatas", "distances"])
+            return [{"id": id, "document": document, "metadata": metadata, "distance": distance}
+                    for id, document, metadata, distance in zip(found["ids"][0], found["documents"][0], found["metadatas"][0], found["distances"][0])]
+        found = self.collection.get(where=where, include=["documents", "metadatas"])
+        results = [{"id": id, "document": document, "metadata": metadata}
+                   for id, document, metadata in zip(found["ids"], found["documents"], found["metadatas"])]
+        results.sort(key=lambda result: (result["metadata"] or {}).get("timestamp", 0.0), reverse=True)
+        return results[:n_results]
+
     def get_all_memories(self):
         """Get all stored memories."""
         return self.collection.get()
 
-    def store_interaction(self, user_input: str, agent_response: str):
-        """Store user input and agent response as a memory."""
+    def store_interaction(self, user_input: str, agent_response: str, source_tool: Optional[str] = None) -> str:
+        """Queue user input and agent response to be stored as a memory.
+
+        Embedding happens on the ingestor's thread; call flush() to wait for it.
+        """
         memory_text = f"User: {user_input}\nAgent: {agent_response}"
         metadata = {
             "type": "interaction",
+            "source_tool": source_tool,
             "user_input": user_input,
             "agent_response": agent_response
         }
-        self.store_memory(memory_text, metadata)
-
-    def get_context_for_query(self, query: str, n_results: int = 3) -> str:
-        """Retrieve relevant context for a query and format it."""
-        results = self.retrieve_relevant_memories(query, n_results)
-        context = ""
-        if results['documents']:
-            context = "Relevant past interactions:\n"
-            for doc in results['documents'][0]:
-                context += f"- {doc}\n"
-        return context
+        return self.store_memory_later(memory_text, metadata)
+
+    def get_context_for_query(self, query: str, n_results: int = 3, *, max_tokens: int = CONTEXT_TOKENS,
+                              where: Optional[Dict[str, Any]] = None) -> str:
+        """Retrieve up to `n_results` relevant memories and format them within a token budget.
+
+        Memories are ranked by HybridRetriever: vector similarity, BM25 and recency.
+        """
+        return self.retriever.context(query, max_tokens, n_results, where=where)
 
 # Global instance
 memory_system = MemorySystem()
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""Import-time profile of the agent's cold start.
+
+Imports a module in a fresh interpreter with `python -X importtime` and
+reports the total import time and the slowest top-level packages:
+
+    python profile_startup.py                 # profiles `import agent`
+    python profile_startup.py voice --top 10
+    python profile_startup.py --record startup_profile.jsonl
+
+With --record, one JSON line per run is appended so cold-start time can be
+compared between releases.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+def profile_import(module):
+    """Import `module` in a subprocess. Returns (wall seconds, [(name, self_us, cumulative_us, depth)])."""
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return wall, entries
+
+def summarize(entries, top=15):
+    """Total import time and the slowest top-level packages, in seconds."""
+    packages = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        packages[name.split(".")[0]] += self_us
+    total = sum(self_us for _, self_us, _, _ in entries) / 1e6
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return total, [(name, us / 1e6) for name, us in slowest]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("module", nargs="?", default="agent")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--record", metavar="PATH", help="append the result as a JSON line")
+    args = parser.parse_args(argv)
+
+    wall, entries = profile_import(args.module)
+    total, slowest = summarize(entries, args.top)
+    print(f"import {args.module}: {total:.2f}s in imports, {wall:.2f}s wall (interpreter start included), {len(entries)} modules")
+    for name, seconds in slowest:
+        print(f"  {name:<30} {seconds:7.3f}s")
+
+    if args.record:
+        record = {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "module": args.module,
+            "import_seconds": round(total, 3),
+            "wall_seconds": round(wall, 3),
+            "modules": len(entries),
+            "slowest": {name: round(seconds, 3) for name, seconds in slowest}
+        }
+        with open(args.record, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+from langchain.prompts import PromptTemplate
+
+# Shared opening of every agent prompt. It only depends on the tool list, so it
+# renders to the same bytes on every call and Ollama can reuse its KV cache for
+# it instead of re-evaluating the tool descriptions each time. Anything that
+# changes per request must go after it.
+PROMPT_PREFIX = """You are Jarvis, an AI assistant. Follow the agentic loop: Perceive, Plan, Act, Learn.
+
+You have access to the following tools:
+{tools}
+"""
+
+REACT_TEMPLATE = PROMPT_PREFIX + """
+Use the following format:
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+Current task: {input}
+
+{agent_scratchpad}
+"""
+
+PLAN_TEMPLATE = PROMPT_PREFIX + """
+You are now planning. Break the request into tool calls.
+Respond with only a JSON list of steps, for example:
+[{{"tool": "tool_name", "input": "input for the tool"}}]
+If the request cannot be done with these tools, respond with [].
+
+Request: {input}
+"""
+
+react_prompt = PromptTemplate.from_template(REACT_TEMPLATE)
+plan_prompt = PromptTemplate.from_template(PLAN_TEMPLATE)
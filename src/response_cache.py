@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from intent_router import normalize_command
+
+class _CacheEntry:
+    def __init__(self, query: str, vector: np.ndarray, response: str, created: float):
+        self.query = query
+        self.vector = vector
+        self.response = response
+        self.created = created
+
+class ResponseCache:
+    """Semantic cache of agent answers keyed by the embedding of the query.
+
+    A lookup hits when the normalized query's embedding has a cosine
+    similarity of at least `threshold` with a cached query that is younger
+    than `ttl` seconds. Beyond `max_entries`, the least recently used entry
+    is evicted.
+    """
+
+    def __init__(self, embed_fn: Callable[[str], List[float]], threshold: float = 0.92, ttl: float = 3600, max_entries: int = 256, clock: Callable[[], float] = time.monotonic):
+        self.embed_fn = embed_fn
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self) -> None:
+        now = self.clock()
+        for key in [k for k, e in self._entries.items() if now - e.created > self.ttl]:
+            del self._entries[key]
+
+    def _best_match(self, vector: np.ndarray) -> Optional[str]:
+        if not self._entries:
+            return None
+        keys = list(self._entries)
+        similarities = np.stack([self._entries[k].vector for k in keys]) @ vector
+        best = int(np.argmax(similarities))
+        return keys[best] if similarities[best] >= self.threshold else None
+
+    def get(self, query: str) -> Optional[str]:
+        """Return a cached answer for a semantically equivalent query, or None."""
+        normalized = normalize_command(query)
+        vector = self._embed(normalized)
+        with self._lock:
+            self._expire()
+            key = normalized if normalized in self._entries else self._best_match(vector)
+            if key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key].response
+
+    def put(self, query: str, response: str) -> None:
+        normalized = normalize_command(query)
+        vector = self._embed(normalized)
+        with self._lock:
+            self._entries[normalized] = _CacheEntry(normalized, vector, response, self.clock())
+            self._entries.move_to_end(normalized)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, query: Optional[str] = None) -> int:
+        """Drop entries matching `query` (or everything). Returns the number removed."""
+        if query is None:
+            with self._lock:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+        with self._lock:
+            if not self._entries:
+                return 0  # Nothing to compare against, so skip the embedding
+        vector = self._embed(normalize_command(query))
+        with self._lock:
+            keys = list(self._entries)
+            if not keys:
+                return 0
+            similarities = np.stack([self._entries[k].vector for k in keys]) @ vector
+            stale = [k for k, s in zip(keys, similarities) if s >= self.threshold]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,246 @@
+"""Hybrid memory retrieval.
+
+Memories are ranked by a weighted sum of three signals: cosine similarity
+from the vector store, a BM25 score from an in-memory inverted index (so
+exact names, numbers and rare words are not lost in the embedding) and a
+recency bonus that halves every `half_life_days`, taken from the
+"timestamp" stored in each memory's metadata.
+"""
+import math
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+# Rough size of an English token, used for the context budget
+CHARS_PER_TOKEN = 4
+CONTEXT_TOKENS = 300
+CONTEXT_HEADER = "Relevant past interactions:\n"
+# Documents read per collection.get() call when building the index
+LOAD_BATCH = 5000
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+class LexicalIndex:
+    """Inverted index over memory texts, scored with BM25."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._lengths = array("I")
+        self._total_length = 0
+        # term -> (rows, term frequencies)
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        # NumPy copies of the postings, rebuilt for a term after it changes
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._length_array: Optional[np.ndarray] = None
+        self._deleted: set = set()
+        # True for removed rows, rebuilt after a removal
+        self._deleted_mask: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._rows
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index texts under their memory IDs; IDs already indexed are skipped."""
+        with self._lock:
+            for id, text in zip(ids, texts):
+                if id in self._rows:
+                    continue
+                row = len(self._ids)
+                self._ids.append(id)
+                self._rows[id] = row
+                terms = Counter(tokenize(text))
+                length = sum(terms.values())
+                self._lengths.append(length)
+                self._total_length += length
+                for term, count in terms.items():
+                    rows, counts = self._postings.setdefault(term, (array("I"), array("I")))
+                    rows.append(row)
+                    counts.append(count)
+                    self._arrays.pop(term, None)
+            self._length_array = None
+
+    def remove(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            for id in ids:
+                row = self._rows.pop(id, None)
+                if row is not None:
+                    self._deleted.add(row)
+                    self._total_length -= self._lengths[row]
+                    self._deleted_mask = None
+
+    def _term_arrays(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        arrays = self._arrays.get(term)
+        if arrays is None and term in self._postings:
+            rows, counts = self._postings[term]
+            arrays = self._arrays[term] = (np.array(rows, dtype=np.int64), np.array(counts, dtype=np.float32))
+        return arrays
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Return up to `k` (id, BM25 score) pairs with a positive score, best first."""
+        with self._lock:
+            count = len(self._rows)
+            if not count:
+                return []
+            if self._length_array is None:
+                self._length_array = np.array(self._lengths, dtype=np.float32)
+            lengths = self._length_array
+            average_length = self._total_length / count or 1.0
+            if self._deleted and (self._deleted_mask is None or len(self._deleted_mask) != len(self._ids)):
+                self._deleted_mask = np.zeros(len(self._ids), dtype=bool)
+                self._deleted_mask[list(self._deleted)] = True
+            scores = np.zeros(len(self._ids), dtype=np.float32)
+            for term in set(tokenize(query)):
+                arrays = self._term_arrays(term)
+                if arrays is None:
+                    continue
+                rows, counts = arrays
+                # Removed rows stay in the postings but must not count towards the
+                # document frequency: with many removals it could exceed `count`
+                # and turn the idf of common terms negative
+                frequency = len(rows) - (int(self._deleted_mask[rows].sum()) if self._deleted else 0)
+                if not frequency:
+                    continue
+                idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5))
+                norms = self.k1 * (1 - self.b + self.b * lengths[rows] / average_length)
+                scores[rows] += idf * counts * (self.k1 + 1) / (counts + norms)
+            if self._deleted:
+                scores[self._deleted_mask] = 0
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(self._ids[row], float(scores[row])) for row in top if scores[row] > 0]
+
+class HybridRetriever:
+    """Ranks a MemorySystem's memories by vector, lexical and recency scores.
+
+    The lexical index is built from the collection on first use and kept up
+    to date by the MemorySystem through `add`. Each search takes the top
+    `candidates` from both the vector store and the index, and scores the
+    union.
+    """
+
+    def __init__(self, memory, vector_weight: float = 0.6, lexical_weight: float = 0.3, recency_weight: float = 0.1,
+                 half_life_days: float = 30.0, candidates: int = 50, clock: Callable[[], float] = time.time):
+        self.memory = memory
+        self.vector_weight = vector_weight
+        self.lexical_weight = lexical_weight
+        self.recency_weight = recency_weight
+        self.half_life = half_life_days * 86400
+        self.candidates = candidates
+        self.clock = clock
+        self.index = LexicalIndex()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+
+    def load(self) -> None:
+        """Build the lexical index from the stored memories, once."""
+        with self._load_lock:
+            if self._loaded:
+                return
+            collection = self.memory.collection
+            offset = 0
+            while True:
+                batch = collection.get(include=["documents"], limit=LOAD_BATCH, offset=offset)
+                if not batch["ids"]:
+                    break
+                self.index.add(batch["ids"], batch["documents"])
+                offset += len(batch["ids"])
+            self._loaded = True
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """Index newly stored memories. Before the first load they are picked up by `load`."""
+        # Holding the load lock means a write that lands during the load is never missed
+        with self._load_lock:
+            if self._loaded:
+                self.index.add(ids, texts)
+
+    def remove(self, ids: Sequence[str]) -> None:
+        with self._load_lock:
+            self.index.remove(ids)
+
+    def recency(self, metadata: Optional[Dict[str, Any]], now: float) -> float:
+        timestamp = (metadata or {}).get("timestamp")
+        if timestamp is None:
+            return 0.0
+        return 0.5 ** (max(now - timestamp, 0.0) / self.half_life)
+
+    def search(self, query: str, n_results: int = 5, where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Return the best `n_results` memories with their combined and per-signal scores.
+
+        `where` is a metadata filter (see memory.memory_filter) applied by the store.
+        """
+        self.load()
+        collection = self.memory.collection
+        count = collection.count()
+        if not count:
+            return []
+        query_embedding = np.asarray(self.memory.embed_text(query), dtype=np.float32)
+        lexical = dict(self.index.search(query, self.candidates))
+        hits = collection.query(
+            query_embeddings=[query_embedding.tolist()],
+            n_results=min(self.candidates, count),
+            where=where,
+            include=["documents", "metadatas", "embeddings"]
+        )
+        candidates = {}
+        for id, document, metadata, embedding in zip(hits["ids"][0], hits["documents"][0], hits["metadatas"][0], hits["embeddings"][0]):
+            candidates[id] = (document, metadata, embedding)
+        missing = [id for id in lexical if id not in candidates]
+        if missing:
+            # Lexical candidates that fail the filter are not returned
+            found = collection.get(ids=missing, where=where, include=["documents", "metadatas", "embeddings"])
+            for id, document, metadata, embedding in zip(found["ids"], found["documents"], found["metadatas"], found["embeddings"]):
+                candidates[id] = (document, metadata, embedding)
+
+        top_lexical = max(lexical.values(), default=0.0)
+        query_norm = np.linalg.norm(query_embedding) or 1.0
+        now = self.clock()
+        results = []
+        for id, (document, metadata, embedding) in candidates.items():
+            embedding = np.asarray(embedding, dtype=np.float32)
+            vector = float(embedding @ query_embedding / ((np.linalg.norm(embedding) or 1.0) * query_norm))
+            lexical_score = lexical.get(id, 0.0) / top_lexical if top_lexical else 0.0
+            recency = self.recency(metadata, now)
+            results.append({
+                "id": id,
+                "document": document,
+                "metadata": metadata,
+                "score": self.vector_weight * vector + self.lexical_weight * lexical_score + self.recency_weight * recency,
+                "vector": vector,
+                "lexical": lexical_score,
+                "recency": recency
+            })
+        results.sort(key=lambda result: result["score"], reverse=True)
+        return results[:n_results]
+
+    def context(self, query: str, max_tokens: int = CONTEXT_TOKENS, max_results: int = 5, where: Optional[Dict[str, Any]] = None) -> str:
+        """Format the best memories for the prompt, within about `max_tokens` tokens.
+
+        Memories are added best first; one that does not fit in the remaining
+        budget is skipped in favour of shorter ones further down.
+        """
+        budget = max_tokens - estimate_tokens(CONTEXT_HEADER)
+        lines = []
+        for result in self.search(query, max_results, where):
+            line = f"- {result['document']}\n"
+            cost = estimate_tokens(line)
+            if cost <= budget:
+                lines.append(line)
+                budget -= cost
+        return CONTEXT_HEADER + "".join(lines) if lines else ""
@@ -0,0 +1,156 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+class AgentRequest:
+    """One trigger (hotkey press or wake word) and the work done for it.
+
+    `cancel_event` is set when the request is cancelled, so blocking work it
+    started in worker threads can stop early. `stages` maps stage names to
+    seconds spent in them. `command` is the transcribed command, once known.
+    """
+
+    def __init__(self, request_id: int, source: str, payload: Any, created: float):
+        self.id = request_id
+        self.source = source
+        self.payload = payload
+        self.created = created
+        self.status = "pending"
+        self.result = None
+        self.stages: Dict[str, float] = {}
+        self.queue_wait = 0.0
+        self.cancel_event = threading.Event()
+        self.command = None
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a stage of the request; repeated stages add up."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def __repr__(self):
+        return f"AgentRequest({self.id}, {self.source!r}, {self.status})"
+
+class RequestScheduler:
+    """Single-flight scheduler for agent requests on an asyncio event loop.
+
+    Only one request runs at a time. `submit()` may be called from any
+    thread and never blocks. A trigger arriving within `dedupe_window`
+    seconds of the newest pending or running request is dropped as a
+    repeat. Otherwise, with `preempt`, the newer request cancels the running
+    one. At most `max_pending` requests wait; when the queue is full the
+    oldest waiting request is dropped in favour of the new one.
+    """
+
+    def __init__(self, handler: Callable[[AgentRequest], Awaitable[Any]], max_pending: int = 2, dedupe_window: float = 1.0, preempt: bool = True, history_size: int = 50, clock: Callable[[], float] = time.monotonic):
+        self.handler = handler
+        self.max_pending = max_pending
+        self.dedupe_window = dedupe_window
+        self.preempt = preempt
+        self.clock = clock
+        self.loop = None
+        self.current: Optional[AgentRequest] = None
+        self.history = deque(maxlen=history_size)
+        self.counts = {"submitted": 0, "deduplicated": 0, "dropped": 0, "cancelled": 0, "completed": 0, "failed": 0}
+        self._pending: deque = deque()
+        self._wakeup = None
+        self._task = None
+        self._ids = itertools.count(1)
+
+    def submit(self, source: str, payload: Any = None) -> bool:
+        """Thread-safe, non-blocking. Returns False if the scheduler is not running."""
+        loop = self.loop
+        if loop is None or loop.is_closed():
+            return False
+        request = AgentRequest(next(self._ids), source, payload, self.clock())
+        try:
+            loop.call_soon_threadsafe(self._enqueue, request)
+        except RuntimeError:
+            return False  # Loop closed in the meantime
+        return True
+
+    def _is_repeat(self, request: AgentRequest) -> bool:
+        latest = self._pending[-1] if self._pending else self.current
+        return latest is not None and request.created - latest.created < self.dedupe_window
+
+    def _enqueue(self, request: AgentRequest) -> None:
+        self.counts["submitted"] += 1
+        if self._is_repeat(request):
+            self.counts["deduplicated"] += 1
+            return
+        if self.preempt and self._task is not None and not self._task.done():
+            self._task.cancel()
+        while len(self._pending) >= self.max_pending:
+            dropped = self._pending.popleft()
+            dropped.status = "dropped"
+            self.counts["dropped"] += 1
+            self.history.append(dropped)
+        self._pending.append(request)
+        self._wakeup.set()
+
+    def cancel_current(self) -> None:
+        """Cancel the running request, if any (call on the loop)."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def run(self) -> None:
+        """Serve requests until cancelled."""
+        self.loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        try:
+            while True:
+                while not self._pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                await self._serve(self._pending.popleft())
+        finally:
+            self.loop = None
+            self.cancel_current()
+
+    async def _serve(self, request: AgentRequest) -> None:
+        self.current = request
+        request.status = "running"
+        request.queue_wait = self.clock() - request.created
+        self._task = asyncio.ensure_future(self.handler(request))
+        try:
+            request.result = await asyncio.shield(self._task)
+            request.status = "completed"
+            self.counts["completed"] += 1
+        except asyncio.CancelledError:
+            request.cancel_event.set()
+            request.status = "cancelled"
+            self.counts["cancelled"] += 1
+            if not self._task.cancelled():
+                # The scheduler itself is being cancelled
+                self._task.cancel()
+                raise
+        except Exception as e:
+            request.status = "failed"
+            request.result = e
+            self.counts["failed"] += 1
+        finally:
+            self.current = None
+            self._task = None
+            self.history.append(request)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return request counts and mean seconds per stage over completed requests."""
+        completed = [r for r in self.history if r.status == "completed"]
+        stage_totals: Dict[str, List[float]] = {}
+        for request in completed:
+            for name, seconds in request.stages.items():
+                stage_totals.setdefault(name, []).append(seconds)
+        return {
+            **self.counts,
+            "pending": len(self._pending),
+            "mean_queue_wait": sum(r.queue_wait for r in completed) / len(completed) if completed else 0.0,
+            "mean_stage_seconds": {name: sum(v) / len(v) for name, v in stage_totals.items()},
+            "recent": [(r.id, r.source, r.status) for r in self.history]
+        }
@@ -1,10 +1,18 @@
+import asyncio
+import functools
+import inspect
 import os
-from typing import Any, Dict, List, Callable
-from voice import speak, verify_speaker, record_command_audio, transcribe_audio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Callable, Optional
+from voice import speak, SPEECH_WAIT_TIMEOUT, verify_speaker, record_command_audio, transcribe_audio, verify_and_transcribe
+
+# Blocking tools run on this many worker threads on the async path
+TOOL_WORKERS = 4
 
 class SecurityMediator:
-    def __init__(self, policies: Dict[str, Any] = None):
+    def __init__(self, policies: Dict[str, Any] = None, max_workers: int = TOOL_WORKERS):
         self.policies = policies or self.default_policies()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
 
     def default_policies(self) -> Dict[str, Any]:
         return {
@@ -30,16 +38,17 @@ class SecurityMediator:
 
     def request_confirmation(self, message: str) -> bool:
         """Request verbal confirmation from user using TTS and speaker verification."""
-        speak(message)
+        speak(message).wait(SPEECH_WAIT_TIMEOUT)  # Don't record the prompt itself
         audio, sr = record_command_audio(5)
-        if verify_speaker(audio, sr):
-            transcription = transcribe_audio(audio, sr)
+        # Verification and transcription run in parallel; the transcript is dropped if verification fails
+        transcription = verify_and_transcribe(audio, sr, verify=verify_speaker, transcribe=transcribe_audio)
+        if transcription is not None:
             if 'yes' in transcription.lower() or 'confirm' in transcription.lower():
                 return True
         return False
 
-    def execute_tool(self, tool: Callable, tool_name: str, *args, **kwargs) -> Any:
-        """Intercept and execute tool call with security checks."""
+    def screen_tool_call(self, tool_name: str, *args, **kwargs) -> Optional[str]:
+        """Apply the policies to a tool call. Returns a refusal message, or None if it may run."""
         tool_input = kwargs if kwargs else args[0] if args else {}
         if isinstance(tool_input, str):
             tool_input = {'query': tool_input}
@@ -55,6 +64,13 @@ class SecurityMediator:
         if any(action in tool_name.lower() for action in self.policies['HIGH_RISK_ACTIONS']):
             if not self.request_confirmation(f"High-risk action: {tool_name}. Confirm by saying 'yes'."):
                 return "Action rejected by user."
+        return None
+
+    def execute_tool(self, tool: Callable, tool_name: str, *args, **kwargs) -> Any:
+        """Intercept and execute tool call with security checks."""
+        refusal = self.screen_tool_call(tool_name, *args, **kwargs)
+        if refusal is not None:
+            return refusal
 
         # Execute the tool
         try:
@@ -62,5 +78,23 @@ class SecurityMediator:
         except Exception as e:
             return f"Tool execution failed: {str(e)}"
 
+    async def aexecute_tool(self, tool: Callable, tool_name: str, *args, **kwargs) -> Any:
+        """Async execute_tool: blocking tools run on the bounded tool thread pool.
+
+        The policy check also runs there, since a confirmation blocks on the
+        microphone. Coroutine functions are awaited directly.
+        """
+        loop = asyncio.get_running_loop()
+        refusal = await loop.run_in_executor(self._executor, functools.partial(self.screen_tool_call, tool_name, *args, **kwargs))
+        if refusal is not None:
+            return refusal
+
+        try:
+            if inspect.iscoroutinefunction(tool):
+                return await tool(*args, **kwargs)
+            return await loop.run_in_executor(self._executor, functools.partial(tool, *args, **kwargs))
+        except Exception as e:
+            return f"Tool execution failed: {str(e)}"
+
 # Global instance
 security_mediator = SecurityMediator()
\ No newline at end of file
@@ -1,5 +1,10 @@
+import asyncio
+import time
 import unittest
-from feedback_logger import log_feedback, load_feedback, get_feedback_count, clear_feedback
+from unittest.mock import patch
+import agent
+from scheduler import AgentRequest
+from feedback_logger import log_feedback, load_feedback, get_feedback_count, clear_feedback, add_feedback_listener, remove_feedback_listener
 import os
 
 class TestContinuousLearning(unittest.TestCase):
@@ -26,6 +31,31 @@ class TestContinuousLearning(unittest.TestCase):
         clear_feedback()
         self.assertEqual(get_feedback_count(), 0)
 
+    def test_feedback_listener(self):
+        received = []
+        add_feedback_listener(received.append)
+        try:
+            log_feedback("Jarvis, what's the weather?", "It's raining.", "It's sunny.")
+        finally:
+            remove_feedback_listener(received.append)
+        self.assertEqual(received[-1]["original_instruction"], "Jarvis, what's the weather?")
+        log_feedback("Test", "Wrong", "Correct")
+        self.assertEqual(len(received), 1)
+
+    def test_failing_listener_does_not_fail_logging(self):
+        def broken(entry):
+            raise RuntimeError("model unavailable")
+        received = []
+        add_feedback_listener(broken)
+        add_feedback_listener(received.append)
+        try:
+            log_feedback("Test", "Wrong", "Correct")
+        finally:
+            remove_feedback_listener(broken)
+            remove_feedback_listener(received.append)
+        self.assertEqual(get_feedback_count(), 1)
+        self.assertEqual(len(received), 1)
+
     def test_retraining_simulation(self):
         # Log some feedback
         log_feedback("Jarvis, open email.", "Opening browser.", "Opening email client.")
@@ -40,5 +70,34 @@ class TestContinuousLearning(unittest.TestCase):
         clear_feedback()
         self.assertEqual(get_feedback_count(), 0)
 
+class TestSpokenCorrections(unittest.TestCase):
+    def run_commands(self, transcripts):
+        transcripts = iter(transcripts)
+        logged = []
+        runtime = agent.AgentRuntime()
+
+        async def answer(command, context, callbacks=None):
+            return "It's raining."
+
+        async def main():
+            runtime._idle = asyncio.Event()
+            return [await runtime.handle_request(AgentRequest(i, "hotkey", 0, time.monotonic())) for i in range(3)]
+
+        with patch.object(agent, "perceive", lambda start, prefetcher=None, cancel_event=None: next(transcripts)), \
+                patch.object(agent.ContextPrefetcher, "context_for", return_value=""), \
+                patch.object(agent, "ahandle_command", answer), patch.object(agent, "learn"), \
+                patch.object(agent, "speak"), patch.object(agent, "log_feedback", lambda *entry: logged.append(entry)):
+            return asyncio.run(main()), logged
+
+    def test_next_command_corrects_previous_answer(self):
+        results, logged = self.run_commands(["What's the weather?", "That was wrong. The correct answer is sunny weather.", "that was wrong"])
+        self.assertEqual(results, ["It's raining.", "Correction logged", "It's raining."])
+        self.assertEqual(logged, [("What's the weather?", "It's raining.", "sunny weather")])
+
+    def test_correction_without_answer(self):
+        results, logged = self.run_commands(["What's the weather?", "Jarvis, that was wrong", "What's the time?"])
+        self.assertEqual(results, ["It's raining.", "Correction not understood", "It's raining."])
+        self.assertEqual(logged, [])
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,71 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import torch
+from embeddings import EmbeddingEngine
+
+TEXTS = ["what is my cpu usage", "open the browser", "play some music", "what is the weather today"]
+
+def make_tiny_model(directory: str) -> str:
+    """Save a small randomly initialized BERT sentence model, so no download is needed."""
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer, models
+    words = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted({word for text in TEXTS for word in text.split()})
+    with open(os.path.join(directory, "vocab.txt"), "w") as f:
+        f.write("\n".join(words))
+    bert = os.path.join(directory, "bert")
+    BertTokenizerFast(os.path.join(directory, "vocab.txt")).save_pretrained(bert)
+    torch.manual_seed(0)
+    config = BertConfig(vocab_size=len(words), hidden_size=64, num_hidden_layers=2, num_attention_heads=2, intermediate_size=128)
+    BertModel(config).save_pretrained(bert)
+    path = os.path.join(directory, "model")
+    SentenceTransformer(modules=[models.Transformer(bert), models.Pooling(64, "mean"), models.Normalize()]).save(path)
+    return path
+
+class TestEmbeddingEngine(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.model_path = make_tiny_model(cls.directory)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def test_unknown_engine(self):
+        """Test that a misspelled engine fails at construction."""
+        with self.assertRaises(ValueError):
+            EmbeddingEngine(self.model_path, "int4")
+
+    def test_model_loads_on_first_use(self):
+        """Test that constructing an engine does not load the model."""
+        engine = EmbeddingEngine(self.model_path)
+        self.assertIsNone(engine._model)
+        self.assertEqual(engine.encode(TEXTS).shape, (4, 64))
+        self.assertIsNotNone(engine._model)
+
+    def test_int8_close_to_fp32(self):
+        """Test that the quantized engine gives nearly the same vectors, under its own cache namespace."""
+        threads = torch.get_num_threads()
+        try:
+            full = EmbeddingEngine(self.model_path).encode(TEXTS)
+            quantized_engine = EmbeddingEngine(self.model_path, "int8", threads=1)
+            quantized = quantized_engine.encode(TEXTS)
+            self.assertEqual(torch.get_num_threads(), 1)
+        finally:
+            torch.set_num_threads(threads)
+        self.assertGreater((full * quantized).sum(axis=1).min(), 0.98)
+        self.assertNotEqual(quantized_engine.cache_namespace, EmbeddingEngine(self.model_path).cache_namespace)
+
+    @unittest.skipUnless(importlib.util.find_spec("optimum"), "ONNX backend needs optimum[onnxruntime]")
+    def test_onnx_matches_fp32(self):
+        """Test that the ONNX Runtime engine reproduces the PyTorch vectors."""
+        full = EmbeddingEngine(self.model_path).encode(TEXTS)
+        onnx = EmbeddingEngine(self.model_path, "onnx", threads=1).encode(TEXTS)
+        np.testing.assert_allclose(onnx, full, atol=1e-4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+from unittest.mock import patch
+from langchain.agents import AgentExecutor, create_react_agent
+from langchain.tools import Tool
+from langchain_ollama import OllamaLLM
+import agent
+from fake_ollama import FakeOllamaServer
+from intent_router import IntentRouter, normalize_command
+from prompts import react_prompt
+from response_cache import ResponseCache
+
+TOOL_NAMES = ["cpu_usage", "memory_usage", "disk_usage", "list_processes", "process_details",
+              "network_stats", "take_screenshot", "mouse_move", "mouse_click"]
+
+class TestIntentRouter(unittest.TestCase):
+    def setUp(self):
+        self.router = IntentRouter(TOOL_NAMES)
+
+    def test_normalize_command(self):
+        """Test that wake word, punctuation and politeness are stripped."""
+        self.assertEqual(normalize_command("Jarvis, what’s my CPU usage, please?"), "what's my cpu usage")
+
+    def test_routes_common_commands(self):
+        """Test that high-confidence commands map to their tool and input."""
+        cases = {
+            "What's my CPU usage?": ("cpu_usage", ""),
+            "how much RAM am I using right now": ("memory_usage", ""),
+            "how much disk space is left": ("disk_usage", "C:"),
+            "Take a screenshot and save it as desk.png": ("take_screenshot", "desk.png"),
+            "show details for process 1234": ("process_details", "1234"),
+            "move the mouse to 100, 200": ("mouse_move", "100,200"),
+        }
+        for command, (tool, tool_input) in cases.items():
+            match = self.router.route(command)
+            self.assertIsNotNone(match, command)
+            self.assertEqual((match.tool, match.tool_input), (tool, tool_input))
+
+    def test_falls_back_for_other_commands(self):
+        """Test that multi-step and open-ended requests go to the agent."""
+        for command in ["check my memory usage and network statistics", "what is the weather", "open notepad"]:
+            self.assertIsNone(self.router.route(command))
+
+    def test_only_registered_tools(self):
+        """Test that rules for unregistered tools are ignored."""
+        router = IntentRouter(["memory_usage"])
+        self.assertIsNone(router.route("take a screenshot"))
+
+    def test_metrics(self):
+        """Test routing counters and hit rate."""
+        self.router.route("cpu usage")
+        self.router.route("cpu usage")
+        self.router.route("write me a poem")
+        metrics = self.router.get_metrics()
+        self.assertEqual(metrics["routed"], 2)
+        self.assertEqual(metrics["fallbacks"], 1)
+        self.assertAlmostEqual(metrics["hit_rate"], 2 / 3)
+        self.assertEqual(metrics["by_tool"], {"cpu_usage": 2})
+        self.assertEqual(metrics["recent"][-1], ("write me a poem", None))
+
+class TestPlanning(unittest.TestCase):
+    def test_multi_step_pattern(self):
+        """Test that conjunctions and separators mark a command as multi-step."""
+        for command in ["what's my cpu usage", "take a screenshot", "show the android apps",
+                        "okay, take a screenshot", "Jarvis, what's the CPU usage?", "well, how much disk space is left"]:
+            self.assertTrue(agent.is_simple_request(command), command)
+        for command in ["check memory and cpu", "show disk usage, then processes", "cpu usage; memory usage",
+                        "take a screenshot after that move the mouse", "Jarvis, memory usage plus network stats"]:
+            self.assertFalse(agent.is_simple_request(command), command)
+        self.assertIsNone(agent.MULTI_STEP_PATTERN.search("brandon"))
+
+    def test_parse_plan(self):
+        """Test that planner output becomes tool steps only when every step names a known tool."""
+        with patch.object(agent, "tools_by_name", dict.fromkeys(["cpu_usage", "memory_usage"])):
+            steps = agent.parse_plan('Here is the plan: [{"tool": "cpu_usage"}, {"tool": "memory_usage", "input": 5}] Done.')
+            self.assertEqual(steps, [{"tool": "cpu_usage", "input": ""}, {"tool": "memory_usage", "input": "5"}])
+            for output in ["no plan", "[]", "[not json]", '{"tool": "cpu_usage"}', '["cpu_usage"]',
+                           '[{"tool": "cpu_usage"}, {"tool": "format_disk"}]']:
+                self.assertIsNone(agent.parse_plan(output), output)
+
+VOCABULARY = ["joke", "weather", "tell", "me", "a", "what", "is", "the"]
+
+def bag_of_words(text):
+    words = text.lower().split()
+    return [float(words.count(w)) for w in VOCABULARY]
+
+def fake_phi3(prompt):
+    """Plans memory then CPU, and answers ReAct prompts directly."""
+    if "Break the request into tool calls" in prompt:
+        return '[{"tool": "memory_usage", "input": ""}, {"tool": "cpu_usage", "input": ""}]'
+    if prompt.startswith("Decompose the following goal into steps:"):
+        return "1. Answer the question."
+    return "Thought: I now know the final answer\nFinal Answer: Here you go."
+
+class TestCommandRouting(unittest.TestCase):
+    """handle_command against stub tools and a fake Ollama server."""
+
+    def setUp(self):
+        self.server = FakeOllamaServer(responder=fake_phi3)
+        self.server.start()
+        self.calls = []
+        tools = [Tool(name=name, func=lambda query, name=name: self.calls.append(name) or f"{name}: 12%", description=f"Get {name}")
+                 for name in ["cpu_usage", "memory_usage"]]
+        llm = OllamaLLM(model="phi3:3.8b", base_url=self.server.url)
+        executor = AgentExecutor(agent=create_react_agent(llm, tools, react_prompt), tools=tools, return_intermediate_steps=True)
+        tools_by_name = {tool.name: tool for tool in tools}
+        self.router = IntentRouter(tools_by_name)
+        self.patches = [patch.object(agent, "llm", llm), patch.object(agent, "tools", tools),
+                        patch.object(agent, "tools_by_name", tools_by_name), patch.object(agent, "intent_router", self.router),
+                        patch.object(agent, "agent_executor", executor), patch.object(agent, "PLANNER_MODE", "auto"),
+                        patch.object(agent, "response_cache", ResponseCache(bag_of_words))]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        self.server.stop()
+
+    def prompts(self):
+        return [r["body"]["prompt"] for r in self.server.requests]
+
+    def test_legacy_mode_skips_router(self):
+        """Test that legacy mode plans in free text and never consults the router."""
+        with patch.object(agent, "PLANNER_MODE", "legacy"):
+            self.assertEqual(agent.handle_command("what's my cpu usage"), "Here you go.")
+        prompts = self.prompts()
+        self.assertEqual(len(prompts), 2)
+        self.assertTrue(prompts[0].startswith("Decompose the following goal into steps:"))
+        self.assertEqual(self.router.get_metrics()["requests"], 0)
+
+    def test_router_before_planner(self):
+        """Test that a routed command runs its tool with no LLM call."""
+        self.assertEqual(agent.handle_command("what's my cpu usage"), "cpu_usage: 12%")
+        self.assertEqual(self.calls, ["cpu_usage"])
+        self.assertEqual(self.prompts(), [])
+
+    def test_multi_step_runs_plan_without_react(self):
+        """Test that a multi-step command costs one planning call and runs the steps in order."""
+        self.assertEqual(agent.handle_command("check my memory usage and cpu usage"), "memory_usage: 12%\ncpu_usage: 12%")
+        self.assertEqual(self.calls, ["memory_usage", "cpu_usage"])
+        prompts = self.prompts()
+        self.assertEqual(len(prompts), 1)
+        self.assertIn("Break the request into tool calls", prompts[0])
+
+    def test_simple_request_goes_through_cache(self):
+        """Test that other single-intent commands use the executor once, then the cache."""
+        self.assertEqual(agent.handle_command("tell me a joke"), "Here you go.")
+        self.assertEqual(agent.handle_command("Jarvis, tell me a joke"), "Here you go.")
+        prompts = self.prompts()
+        self.assertEqual(len(prompts), 1)
+        self.assertNotIn("Break the request into tool calls", prompts[0])
+        self.assertEqual(self.calls, [])
+
+if __name__ == '__main__':
+    unittest.main()
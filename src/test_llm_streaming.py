@@ -0,0 +1,145 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import patch
+from langchain.agents import AgentExecutor, create_react_agent
+from langchain.tools import Tool
+from langchain.tools.render import render_text_description
+from langchain_ollama import OllamaLLM
+import agent
+from fake_ollama import FakeOllamaServer
+from llm_streaming import SentenceSplitter, FinalAnswerSpeaker, LLMTimingHandler, ToolRecorder
+from prompts import PROMPT_PREFIX, react_prompt, plan_prompt
+
+class TestSentenceSplitter(unittest.TestCase):
+    def test_emits_complete_sentences(self):
+        """Test that sentences are emitted as soon as their boundary arrives."""
+        sentences = []
+        splitter = SentenceSplitter(sentences.append)
+        for token in ["CPU usage ", "is 12.5%. ", "Memory ", "is fine! ", "Anything", " else"]:
+            splitter.feed(token)
+        self.assertEqual(sentences, ["CPU usage is 12.5%.", "Memory is fine!"])
+        splitter.flush()
+        self.assertEqual(sentences[-1], "Anything else")
+
+class TestFinalAnswerStreaming(unittest.TestCase):
+    def test_speaks_before_generation_finishes(self):
+        """Test that the first sentence is spoken while the fake server is still streaming."""
+        answer = ("Thought: I now know the final answer\n"
+                  "Final Answer: Your CPU usage is low. Memory usage is at forty percent. "
+                  "Disk space is fine and nothing needs attention right now.")
+        spoken = []
+        with FakeOllamaServer([answer], token_delay=0.02) as server:
+            llm = OllamaLLM(model="phi3:3.8b", base_url=server.url)
+            speaker = FinalAnswerSpeaker(lambda sentence: spoken.append((sentence, time.perf_counter())))
+            start = time.perf_counter()
+            output = llm.invoke("What is my system status?", config={"callbacks": [speaker]})
+            finished = time.perf_counter()
+        self.assertEqual(output, answer)
+        self.assertEqual([s for s, _ in spoken], [
+            "Your CPU usage is low.",
+            "Memory usage is at forty percent.",
+            "Disk space is fine and nothing needs attention right now."
+        ])
+        first_spoken_at = spoken[0][1] - start
+        self.assertLess(first_spoken_at, (finished - start) / 2)
+
+    def test_ignores_intermediate_steps(self):
+        """Test that thoughts and actions are not spoken."""
+        spoken = []
+        with FakeOllamaServer(["Thought: check CPU.\nAction: cpu_usage\nAction Input: now"]) as server:
+            llm = OllamaLLM(model="phi3:3.8b", base_url=server.url)
+            llm.invoke("How busy is my CPU?", config={"callbacks": [FinalAnswerSpeaker(spoken.append)]})
+        self.assertEqual(spoken, [])
+
+class TestPromptPrefixReuse(unittest.TestCase):
+    def setUp(self):
+        self.tools = [
+            Tool(name="cpu_usage", func=lambda _: "CPU usage: 12%", description="Get current CPU usage percentage"),
+            Tool(name="memory_usage", func=lambda _: "Memory usage: 40%", description="Get current memory usage")
+        ]
+        self.prefix = PROMPT_PREFIX.format(tools=render_text_description(self.tools))
+
+    def test_prompts_share_static_prefix(self):
+        """Test that ReAct steps and planner calls all start with the same bytes and keep the model loaded."""
+        responses = [
+            "Thought: check CPU.\nAction: cpu_usage\nAction Input: now",
+            "Thought: I now know the final answer\nFinal Answer: CPU usage is 12%.",
+            '[{"tool": "memory_usage", "input": ""}]',
+            "Thought: I now know the final answer\nFinal Answer: Memory usage is 40%."
+        ]
+        timing = LLMTimingHandler()
+        with FakeOllamaServer(responses) as server:
+            llm = OllamaLLM(model="phi3:3.8b", base_url=server.url, keep_alive="30m", num_ctx=4096, callbacks=[timing])
+            executor = AgentExecutor(agent=create_react_agent(llm, self.tools, react_prompt), tools=self.tools)
+            executor.invoke({"input": "How busy is my CPU?"})
+            llm.invoke(plan_prompt.format(tools=render_text_description(self.tools), input="Check memory and CPU"))
+            executor.invoke({"input": "How much memory is used?"})
+        bodies = [r["body"] for r in server.requests]
+        self.assertEqual(len(bodies), 4)
+        for body in bodies:
+            self.assertTrue(body["prompt"].startswith(self.prefix))
+            self.assertEqual(body["keep_alive"], "30m")
+            self.assertEqual(body["options"]["num_ctx"], 4096)
+        # Only the first call evaluates the tool descriptions
+        prefix_words = len(self.prefix.split())
+        counts = [call["prompt_eval_count"] for call in timing.calls]
+        totals = [len(body["prompt"].split()) for body in bodies]
+        self.assertEqual(counts[0], totals[0])
+        for count, total in zip(counts[1:], totals[1:]):
+            self.assertLessEqual(count, total - prefix_words)
+
+    def test_timing_handler_reports_prompt_and_generation(self):
+        """Test that prompt-eval and generation times are recorded per call."""
+        timing = LLMTimingHandler()
+        with FakeOllamaServer(["Final Answer: OK then."], token_delay=0.01, prompt_token_delay=0.001) as server:
+            llm = OllamaLLM(model="phi3:3.8b", base_url=server.url, callbacks=[timing])
+            llm.invoke("one two three four five")
+        self.assertEqual(len(timing.calls), 1)
+        call = timing.calls[0]
+        self.assertEqual(call["prompt_eval_count"], 5)
+        self.assertEqual(call["eval_count"], 4)
+        self.assertGreater(call["prompt_eval_ms"], 0)
+        self.assertGreater(call["eval_ms"], 0)
+        self.assertLessEqual(call["first_token_ms"], call["total_ms"])
+        self.assertEqual(timing.get_stats()["calls"], 1)
+
+class TestToolRecorder(unittest.TestCase):
+    def test_records_each_tool_once(self):
+        """Test that the tools run for a request are collected in order."""
+        recorder = ToolRecorder()
+        self.assertIsNone(recorder.source_tool)
+        cpu = Tool(name="cpu_usage", func=lambda _: "5%", description="CPU usage")
+        disk = Tool(name="disk_usage", func=lambda _: "40%", description="Disk usage")
+        for tool in [cpu, disk, cpu]:
+            tool.run("", callbacks=[recorder])
+        self.assertEqual(recorder.source_tool, "cpu_usage,disk_usage")
+
+class TestConcurrentPlanExecution(unittest.TestCase):
+    def test_read_only_steps_overlap(self):
+        """Test that consecutive read-only steps run together and other steps keep their order."""
+        spans = {}
+
+        def stub(name):
+            def run(query):
+                start = time.perf_counter()
+                time.sleep(0.2)
+                spans[name] = (start, time.perf_counter())
+                return f"{name} done"
+            return Tool(name=name, func=run, description=f"Stub {name}")
+
+        tools = {name: stub(name) for name in ["cpu_usage", "memory_usage", "mouse_move", "disk_usage"]}
+        steps = [{"tool": name, "input": ""} for name in tools]
+        with patch.object(agent, "tools_by_name", tools), \
+                patch.object(agent, "CONCURRENT_TOOLS", {"cpu_usage", "memory_usage", "disk_usage"}):
+            start = time.perf_counter()
+            output = asyncio.run(agent.aexecute_plan(steps))
+            elapsed = time.perf_counter() - start
+        self.assertEqual(output.splitlines(), [f"{name} done" for name in tools])
+        self.assertLess(spans["memory_usage"][0], spans["cpu_usage"][1])
+        self.assertGreaterEqual(spans["mouse_move"][0], max(spans["cpu_usage"][1], spans["memory_usage"][1]))
+        self.assertGreaterEqual(spans["disk_usage"][0], spans["mouse_move"][1])
+        self.assertLess(elapsed, 0.75)
+
+if __name__ == '__main__':
+    unittest.main()
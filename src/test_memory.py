@@ -5,6 +5,8 @@ print("Storing sample memories...")
 memory_system.store_memory("User prefers Python for coding.", {"type": "preference", "topic": "coding"})
 memory_system.store_memory("User asked about machine learning basics.", {"type": "query", "topic": "ML"})
 memory_system.store_interaction("What is ChromaDB?", "ChromaDB is a vector database for embeddings.")
+# Interactions are written in the background
+memory_system.flush()
 
 # Test retrieving
 print("\nRetrieving relevant memories for 'coding preferences'...")
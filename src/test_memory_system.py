@@ -0,0 +1,422 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+import numpy as np
+from memory import MemorySystem, make_metadata, memory_filter
+from embedding_cache import EmbeddingCache
+from retrieval import LexicalIndex, estimate_tokens
+from compaction import compact, extractive_summary
+from vector_store import NumpyVectorStore
+
+def hashing_embedding(text: str):
+    vector = np.zeros(64, dtype=np.float32)
+    for word in text.lower().split():
+        vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % 64] += 1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+class HashingMemorySystem(MemorySystem):
+    """MemorySystem with a small deterministic embedder, so no model download is needed."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.encode_calls = []
+
+    def _encode(self, texts):
+        self.encode_calls.append(len(texts))
+        return [hashing_embedding(text) for text in texts]
+
+class MemoryTestCase(unittest.TestCase):
+    backend = "chroma"
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.memory = HashingMemorySystem(self.directory, backend=self.backend)
+
+    def tearDown(self):
+        self.memory.close()
+        self.memory = None
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+class TestStoreMemory(MemoryTestCase):
+    def test_ids_are_unique_without_reading_the_collection(self):
+        """Test that writes never load the collection to pick an ID."""
+        with patch.object(type(self.memory.collection), "get", side_effect=AssertionError("collection.get called")):
+            ids = [self.memory.store_memory(f"memory {i}", {"type": "note"}) for i in range(20)]
+        self.assertEqual(len(set(ids)), 20)
+        self.assertEqual(self.memory.collection.count(), 20)
+
+    def test_no_collision_after_delete(self):
+        """Test that deleting a memory does not make the next ID collide."""
+        first = self.memory.store_memory("first memory")
+        second = self.memory.store_memory("second memory")
+        self.memory.collection.delete(ids=[first])
+        third = self.memory.store_memory("third memory")
+        self.assertNotEqual(third, second)
+        self.assertEqual(sorted(self.memory.get_all_memories()["documents"]), ["second memory", "third memory"])
+
+class TestMemoryIngestor(MemoryTestCase):
+    def test_batches_writes(self):
+        """Test that queued memories are embedded and written in batches."""
+        self.memory.ingestor.batch_size = 10
+        for i in range(25):
+            self.memory.store_interaction(f"question {i}", f"answer {i}")
+        self.assertTrue(self.memory.flush(timeout=10))
+        self.assertEqual(self.memory.collection.count(), 25)
+        self.assertLessEqual(len(self.memory.encode_calls), 3)
+        self.assertEqual(self.memory.ingestor.get_stats()["written"], 25)
+
+    def test_submit_does_not_wait_for_embedding(self):
+        """Test that submit returns while the batch is still being collected."""
+        self.memory.ingestor.flush_interval = 0.5
+        start = time.perf_counter()
+        id = self.memory.store_memory_later("remember this", {"type": "note"})
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertEqual(self.memory.collection.count(), 0)
+        time.sleep(1.0)
+        self.assertEqual(self.memory.collection.get(ids=[id])["documents"], ["remember this"])
+
+    def test_stop_writes_pending(self):
+        """Test that stopping the ingestor writes what is still queued."""
+        self.memory.ingestor.flush_interval = 60
+        self.memory.store_memory_later("queued at shutdown")
+        self.memory.ingestor.stop()
+        self.assertEqual(self.memory.collection.count(), 1)
+
+    def test_bulk_store(self):
+        """Test that store_memories writes a batch with one encode call."""
+        ids = self.memory.store_memories([f"memory {i}" for i in range(100)], [{"type": "note"}] * 100)
+        self.assertEqual(len(set(ids)), 100)
+        self.assertEqual(self.memory.encode_calls, [100])
+        self.assertEqual(self.memory.collection.count(), 100)
+
+class TestEmbeddingCache(MemoryTestCase):
+    def test_repeated_texts_are_encoded_once(self):
+        """Test that repeated queries reuse the cached embedding."""
+        first = self.memory.embed_text("what is my cpu usage")
+        for _ in range(3):
+            self.assertEqual(self.memory.embed_text("what is my cpu usage"), first)
+        self.memory.embed_texts(["a new text", "what is my cpu usage", "a new text"])
+        self.assertEqual(self.memory.encode_calls, [1, 1])
+        stats = self.memory.get_embedding_stats()
+        self.assertEqual(stats["misses"], 3)
+        self.assertEqual(stats["hits"], 4)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used embedding is evicted."""
+        cache = EmbeddingCache(max_entries=2)
+        cache.put("a", [1.0, 0.0])
+        cache.put("b", [0.0, 1.0])
+        cache.get("a")
+        cache.put("c", [1.0, 1.0])
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+
+    def test_disk_tier_survives_restart(self):
+        """Test that a new cache on the same path serves embeddings from disk."""
+        path = f"{self.directory}/cache"
+        cache = EmbeddingCache(max_entries=10, namespace="model", disk_path=path, disk_capacity=4)
+        cache.put_many(["one", "two"], [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+        cache.close()
+        reopened = EmbeddingCache(max_entries=10, namespace="model", disk_path=path)
+        np.testing.assert_array_equal(reopened.get("two"), [4.0, 5.0, 6.0])
+        self.assertEqual(reopened.get_stats()["disk_hits"], 1)
+        self.assertIsNone(EmbeddingCache(namespace="other model", disk_path=path).get("two"))
+        reopened.close()
+
+    def test_disk_tier_overwrites_oldest(self):
+        """Test that a full disk tier reuses the oldest row, also after a restart."""
+        path = f"{self.directory}/cache"
+        cache = EmbeddingCache(max_entries=1, disk_path=path, disk_capacity=2)
+        cache.put_many(["a", "b", "c"], [[1.0], [2.0], [3.0]])
+        cache.close()
+        reopened = EmbeddingCache(max_entries=1, disk_path=path)
+        reopened.put("d", [4.0])
+        self.assertIsNone(reopened.get("a"))
+        self.assertIsNone(reopened.get("b"))
+        np.testing.assert_array_equal(reopened.get("c"), [3.0])
+        np.testing.assert_array_equal(reopened.get("d"), [4.0])
+        reopened.close()
+
+class TestHybridRetriever(MemoryTestCase):
+    def test_bm25_prefers_rare_terms(self):
+        """Test that a rare query term outweighs a common one."""
+        index = LexicalIndex()
+        index.add(["a", "b", "c"], ["open the browser", "open the terminal", "open the zephyr dashboard"])
+        results = index.search("open zephyr")
+        self.assertEqual(results[0][0], "c")
+        index.remove(["c"])
+        self.assertNotIn("c", [id for id, _ in index.search("open zephyr")])
+
+    def test_removed_rows_leave_document_frequency(self):
+        """Test that common terms keep a positive weight after most memories are removed."""
+        index = LexicalIndex()
+        index.add([str(i) for i in range(20)], [f"open the door {i}" for i in range(20)])
+        index.add(["z"], ["open the zephyr dashboard"])
+        index.remove([str(i) for i in range(19)])
+        results = index.search("open the zephyr")
+        self.assertEqual([id for id, _ in results], ["z", "19"])
+
+    def test_exact_term_found_among_similar_memories(self):
+        """Test that the lexical score finds a memory the vector score ranks poorly."""
+        texts = [f"User: what is the wifi password for office {i}\nAgent: it is code{i}" for i in range(30)]
+        self.memory.store_memories(texts)
+        results = self.memory.retriever.search("password code17", n_results=1)
+        self.assertEqual(results[0]["document"], texts[17])
+
+    def test_recent_memory_wins_a_tie(self):
+        """Test that of two equally relevant memories the newer one ranks first."""
+        now = time.time()
+        self.memory.store_memories(["User: my favourite editor\nAgent: vim", "User: my favourite editor\nAgent: emacs"],
+                                   [{"timestamp": now - 90 * 86400}, {"timestamp": now - 86400}])
+        results = self.memory.retriever.search("favourite editor", n_results=2)
+        self.assertTrue(results[0]["document"].endswith("emacs"))
+        self.assertGreater(results[0]["recency"], results[1]["recency"])
+
+    def test_index_follows_writes_after_loading(self):
+        """Test that memories stored before and after the first search are both indexed."""
+        self.memory.store_memory("the zephyr project uses postgres")
+        self.assertIn("zephyr", self.memory.get_context_for_query("zephyr database"))
+        self.memory.store_interaction("what port does kestrel use", "kestrel listens on 8443")
+        self.memory.flush()
+        self.assertIn("8443", self.memory.get_context_for_query("kestrel port"))
+        reopened = HashingMemorySystem(self.directory, disk_cache=False, backend=self.backend)
+        self.assertEqual(len(reopened.retriever.search("kestrel")), 2)
+        reopened.close()
+
+    def test_context_respects_token_budget(self):
+        """Test that the context block stays within the token budget."""
+        self.memory.store_memories([f"note {i} about the deployment " + "detail " * 20 for i in range(10)])
+        context = self.memory.get_context_for_query("deployment", max_tokens=100)
+        self.assertTrue(context.startswith("Relevant past interactions:"))
+        self.assertLessEqual(estimate_tokens(context), 100)
+        self.assertEqual(self.memory.get_context_for_query("deployment", max_tokens=10), "")
+
+    def test_context_second_argument_is_result_count(self):
+        """Test that a positional second argument still limits the number of memories."""
+        self.memory.store_memories([f"note {i} about the deployment" for i in range(10)])
+        context = self.memory.get_context_for_query("deployment", 2)
+        self.assertEqual(context.count("- note"), 2)
+        with self.assertRaises(TypeError):
+            self.memory.get_context_for_query("deployment", 2, 100)
+
+class TestCompaction(MemoryTestCase):
+    def store(self, texts, days_ago):
+        now = time.time()
+        return self.memory.store_memories(texts, [{"type": "interaction", "timestamp": now - days * 86400} for days in days_ago])
+
+    def test_old_clusters_are_summarized(self):
+        """Test that a cluster of old interactions becomes one summary and recent ones stay."""
+        old = self.store([f"User: cpu usage check {i}\nAgent: cpu usage is {i}%" for i in range(5)], [30 + i for i in range(5)])
+        recent = self.store([f"User: cpu usage check {i}\nAgent: cpu usage is {i}%" for i in range(5, 8)], [1, 1, 1])
+        report = compact(self.memory, similarity=0.5)
+        self.assertEqual(report["summaries"], 1)
+        self.assertEqual(report["removed"], 5)
+        remaining = self.memory.get_all_memories()
+        self.assertEqual(len(remaining["ids"]), 4)
+        self.assertTrue(set(recent) < set(remaining["ids"]))
+        summary = self.memory.collection.get(where={"type": "summary"})
+        self.assertEqual(summary["metadatas"][0]["summarized"], 5)
+        self.assertNotIn(old[0], self.memory.retriever.index)
+        # Summaries are not compacted again
+        self.assertEqual(compact(self.memory, similarity=0.5)["removed"], 0)
+
+    def test_large_clusters_lose_no_exchange(self):
+        """Test that every exchange of a big old cluster survives in a summary, one window at a time."""
+        self.store([f"User: cpu usage check {i}\nAgent: cpu usage is {i}%" for i in range(12)], [30 + i for i in range(12)])
+        report = compact(self.memory, similarity=0.5, window=4)
+        self.assertEqual(report["scanned"], 12)
+        self.assertEqual((report["count_before"], report["count_after"]), (12, report["summaries"]))
+        self.assertGreater(report["query_seconds_before"], 0)
+        summaries = " ".join(self.memory.collection.get(where={"type": "summary"})["documents"])
+        for i in range(12):
+            self.assertIn(f"cpu usage is {i}%", summaries)
+
+    def test_near_duplicates_keep_the_newest(self):
+        """Test that duplicates in a small cluster are removed without summarizing."""
+        older, newer = self.store(["User: what is my name\nAgent: Sam"] * 2, [40, 20])
+        report = compact(self.memory)
+        self.assertEqual((report["duplicates"], report["summaries"]), (1, 0))
+        self.assertEqual(self.memory.get_all_memories()["ids"], [newer])
+
+    def test_duplicates_across_clusters_keep_one(self):
+        """Test that near-identical exchanges collapse to one however many clusters they would fill."""
+        ids = self.store(["User: what is my name\nAgent: Sam"] * 20, [30 + i for i in range(20)])
+        report = compact(self.memory)
+        self.assertEqual((report["duplicates"], report["summaries"]), (19, 0))
+        self.assertEqual(self.memory.get_all_memories()["ids"], [ids[0]])
+
+    def test_extractive_summary(self):
+        """Test that the stub summarizer lists distinct exchanges and counts the rest."""
+        texts = [f"User: q{i}\nAgent: a{i}" for i in range(7)] + ["User: q0\nAgent: a0"]
+        summary = extractive_summary(texts)
+        self.assertTrue(summary.startswith("Summary of 8 past interactions: q0 -> a0; q1 -> a1"))
+        self.assertTrue(summary.endswith("and 2 more"))
+
+class TestMemoryQueries(MemoryTestCase):
+    def setUp(self):
+        super().setUp()
+        now = time.time()
+        self.memory.store_memories(
+            ["User prefers dark mode", "User: cpu?\nAgent: 5%", "User: cpu?\nAgent: 90%", "Meeting notes about the cpu upgrade"],
+            [{"type": "preference", "timestamp": now - 86400},
+             {"type": "interaction", "timestamp": now - 7200, "source_tool": "cpu_usage", "session": "old"},
+             {"type": "interaction", "timestamp": now - 60, "source_tool": "cpu_usage"},
+             {"timestamp": now - 30}])
+
+    def test_typed_metadata(self):
+        """Test that defaults are filled in and mistyped fields are rejected."""
+        metadata = make_metadata({"timestamp": 5, "source_tool": None}, "session1", now=10.0)
+        self.assertEqual(metadata, {"timestamp": 5.0, "type": "note", "session": "session1"})
+        with self.assertRaises(TypeError):
+            make_metadata({"timestamp": "yesterday"}, "session1")
+        self.assertEqual(memory_filter(type=["a", "b"]), {"type": {"$in": ["a", "b"]}})
+
+    def test_filters(self):
+        """Test type, session, source tool and time-window filters, with and without a query."""
+        documents = lambda results: [result["document"] for result in results]
+        self.assertEqual(documents(self.memory.search_memories(type="preference")), ["User prefers dark mode"])
+        self.assertEqual(documents(self.memory.search_memories(within=3600)),
+                         ["Meeting notes about the cpu upgrade", "User: cpu?\nAgent: 90%"])
+        self.assertEqual(documents(self.memory.search_memories("cpu", type="interaction", session=self.memory.session)),
+                         ["User: cpu?\nAgent: 90%"])
+        self.assertEqual(len(self.memory.search_memories("cpu", source_tool=["cpu_usage", "disk_usage"], n_results=10)), 2)
+        self.assertEqual(documents(self.memory.search_memories(since=time.time() - 90000, until=time.time() - 3600)),
+                         ["User: cpu?\nAgent: 5%", "User prefers dark mode"])
+        or_filter = {"$or": [{"type": "preference"}, {"session": {"$ne": self.memory.session}}]}
+        self.assertEqual(len(self.memory.search_memories(where=or_filter)), 2)
+
+    def test_filtered_context(self):
+        """Test that the hybrid retriever honours a filter, also for lexical matches."""
+        context = self.memory.get_context_for_query("cpu", where={"type": "interaction"})
+        self.assertIn("90%", context)
+        self.assertNotIn("Meeting notes", context)
+
+    def test_interaction_source_tool(self):
+        """Test that interactions record the tool that answered them."""
+        self.memory.store_interaction("disk?", "40% used", source_tool="disk_usage")
+        self.memory.flush()
+        [result] = self.memory.search_memories(source_tool="disk_usage")
+        self.assertEqual(result["metadata"]["session"], self.memory.session)
+
+class TestMemoryQueriesNumpy(TestMemoryQueries):
+    backend = "numpy"
+
+class TestStoreMemoryNumpy(TestStoreMemory):
+    backend = "numpy"
+
+class TestMemoryIngestorNumpy(TestMemoryIngestor):
+    backend = "numpy"
+
+class TestHybridRetrieverNumpy(TestHybridRetriever):
+    backend = "numpy"
+
+class TestCompactionNumpy(TestCompaction):
+    backend = "numpy"
+
+class TestNumpyVectorStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.vectors = rng.standard_normal((1500, 32)).astype(np.float32)
+        self.ids = [f"id{i}" for i in range(1500)]
+        self.metadatas = [{"type": "note" if i % 3 else "preference", "timestamp": float(i)} for i in range(1500)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def fill(self, quantize=False):
+        store = NumpyVectorStore(self.directory, quantize=quantize)
+        for start in range(0, 1500, 500):
+            end = start + 500
+            store.add(ids=self.ids[start:end], embeddings=self.vectors[start:end], metadatas=self.metadatas[start:end],
+                      documents=[f"doc {i}" for i in range(start, end)])
+        return store
+
+    def test_query_is_exact(self):
+        """Test that the top results match a brute-force search."""
+        store = self.fill()
+        unit = self.vectors / np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        expected = np.argsort(-(unit @ unit[7]))[:5]
+        result = store.query(query_embeddings=[self.vectors[7]], n_results=5)
+        self.assertEqual(result["ids"][0], [self.ids[i] for i in expected])
+        self.assertAlmostEqual(result["distances"][0][0], 0.0, places=5)
+        store.close()
+
+    def test_int8_keeps_nearest_neighbours(self):
+        """Test that the quantized store finds almost the same neighbours."""
+        exact, quantized = self.fill(), None
+        directory, self.directory = self.directory, tempfile.mkdtemp()
+        try:
+            quantized = self.fill(quantize=True)
+            overlap = 0
+            for query in self.vectors[:20]:
+                a = exact.query(query_embeddings=[query], n_results=10)["ids"][0]
+                b = quantized.query(query_embeddings=[query], n_results=10)["ids"][0]
+                overlap += len(set(a) & set(b))
+            self.assertGreaterEqual(overlap / 200, 0.9)
+        finally:
+            quantized.close()
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = directory
+            exact.close()
+
+    def test_reopen_after_delete_and_vacuum(self):
+        """Test that additions and deletions survive a restart, and vacuum keeps the live rows."""
+        store = self.fill(quantize=True)
+        store.delete(ids=self.ids[:100])
+        store.delete(where={"type": "preference"})
+        store.close()
+        reopened = NumpyVectorStore(self.directory)
+        self.assertTrue(reopened.quantize)
+        self.assertEqual(reopened.count(), 934)
+        self.assertEqual(reopened.get(ids=["id0", "id101"])["ids"], ["id101"])
+        reopened.vacuum()
+        self.assertEqual(reopened.count(), 934)
+        result = reopened.query(query_embeddings=[self.vectors[101]], n_results=1, where={"timestamp": {"$gte": 100}})
+        self.assertEqual(result["ids"][0], ["id101"])
+        self.assertEqual(reopened.get(where={"timestamp": {"$lt": 105}}, include=["metadatas"])["ids"], ["id100", "id101", "id103", "id104"])
+        reopened.close()
+
+    def test_vacuum_copies_quantized_rows(self):
+        """Test that vacuum keeps int8 rows and scales exactly as they were."""
+        store = self.fill(quantize=True)
+        store.delete(ids=self.ids[:100])
+        before = store.get(ids=self.ids[100:], include=["embeddings"])["embeddings"]
+        store.vacuum()
+        after = store.get(ids=self.ids[100:], include=["embeddings"])["embeddings"]
+        np.testing.assert_array_equal(after, before)
+        store.close()
+
+    def test_reopen_finishes_interrupted_vacuum(self):
+        """Test that a vacuum cut short after committing is completed on open."""
+        store = self.fill(quantize=True)
+        store.delete(ids=self.ids[:100])
+        before = store.get(ids=self.ids[100:], include=["embeddings"])["embeddings"]
+        with patch.object(NumpyVectorStore, "_finish_vacuum", side_effect=RuntimeError("crash")):
+            with self.assertRaises(RuntimeError):
+                store.vacuum()
+        reopened = NumpyVectorStore(self.directory)
+        self.assertEqual(reopened.count(), 1400)
+        self.assertEqual(reopened.get(ids=["id0", "id100"])["ids"], ["id100"])
+        np.testing.assert_array_equal(reopened.get(ids=self.ids[100:], include=["embeddings"])["embeddings"], before)
+        self.assertFalse([name for name in os.listdir(self.directory) if "vacuum" in name])
+        reopened.close()
+
+    def test_reopen_discards_uncommitted_vacuum(self):
+        """Test that files left by a vacuum that never committed are ignored."""
+        store = self.fill()
+        store.close()
+        with open(os.path.join(self.directory, "records.jsonl.vacuum"), "w", encoding="utf-8") as f:
+            f.write('{"id": "stale"')
+        reopened = NumpyVectorStore(self.directory)
+        self.assertEqual(reopened.count(), 1500)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "records.jsonl.vacuum")))
+        reopened.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+from langchain.agents import AgentExecutor, create_react_agent
+from langchain.tools import Tool
+from langchain_ollama import OllamaLLM
+import agent
+from fake_ollama import FakeOllamaServer
+from prompts import react_prompt
+from response_cache import ResponseCache
+
+VOCABULARY = ["weather", "time", "joke", "capital", "france", "tell", "me", "a", "what", "is", "the"]
+
+def bag_of_words(text):
+    """Tiny deterministic embedding for tests."""
+    words = text.lower().replace("?", "").split()
+    return [float(words.count(w)) for w in VOCABULARY]
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResponseCache(bag_of_words, threshold=0.9, ttl=60, max_entries=2, clock=self.clock)
+
+    def test_hit_on_reworded_query(self):
+        """Test that a normalized or near-identical query hits the cache."""
+        self.cache.put("What is the capital of France?", "Paris.")
+        self.assertEqual(self.cache.get("Jarvis, what is the capital of France"), "Paris.")
+        self.assertIsNone(self.cache.get("tell me a joke"))
+        stats = self.cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_ttl_expiry(self):
+        """Test that entries older than the TTL are not returned."""
+        self.cache.put("tell me a joke", "Knock knock.")
+        self.clock.now = 61
+        self.assertIsNone(self.cache.get("tell me a joke"))
+        self.assertEqual(self.cache.get_stats()["entries"], 0)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        self.cache.put("tell me a joke", "Knock knock.")
+        self.cache.put("what is the time", "Noon.")
+        self.cache.get("tell me a joke")
+        self.cache.put("what is the weather", "Sunny.")
+        self.assertIsNone(self.cache.get("what is the time"))
+        self.assertEqual(self.cache.get("tell me a joke"), "Knock knock.")
+
+    def test_invalidate_empty_cache_skips_embedding(self):
+        """Test that invalidating an empty cache does not load the embedding model."""
+        def embed(text):
+            raise AssertionError("embedded with nothing cached")
+        self.assertEqual(ResponseCache(embed).invalidate("what is the weather"), 0)
+
+    def test_invalidate_similar(self):
+        """Test that a correction removes matching entries only."""
+        self.cache.put("what is the weather", "Rainy.")
+        self.cache.put("tell me a joke", "Knock knock.")
+        self.assertEqual(self.cache.invalidate("What is the weather?"), 1)
+        self.assertIsNone(self.cache.get("what is the weather"))
+        self.assertEqual(self.cache.get("tell me a joke"), "Knock knock.")
+
+def fake_phi3(prompt):
+    """Calls cpu_usage for CPU questions and placeholder_tool otherwise, then answers."""
+    task = prompt.rsplit("Current task:", 1)[1]
+    if "Observation:" in task:
+        return "Thought: I now know the final answer\nFinal Answer: Done."
+    tool = "cpu_usage" if "cpu" in task.lower() else "placeholder_tool"
+    return f"Thought: I should use {tool}.\nAction: {tool}\nAction Input: now"
+
+class TestAgentAnswerCaching(unittest.TestCase):
+    """act_cached against stub tools and a fake Ollama server."""
+
+    def setUp(self):
+        self.server = FakeOllamaServer(responder=fake_phi3)
+        self.server.start()
+        tools = [Tool(name=name, func=lambda query: "ok", description=f"Stub {name}") for name in ["cpu_usage", "placeholder_tool"]]
+        llm = OllamaLLM(model="phi3:3.8b", base_url=self.server.url)
+        executor = AgentExecutor(agent=create_react_agent(llm, tools, react_prompt), tools=tools, return_intermediate_steps=True)
+        self.cache = ResponseCache(bag_of_words)
+        self.patches = [patch.object(agent, "agent_executor", executor), patch.object(agent, "response_cache", self.cache)]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        self.server.stop()
+
+    def test_volatile_tool_answers_are_not_cached(self):
+        """Test that an answer which used a monitoring tool is recomputed every time."""
+        self.assertIn("cpu_usage", agent.UNCACHEABLE_TOOLS)
+        agent.act_cached("what is the cpu time")
+        self.assertIsNone(self.cache.get("what is the cpu time"))
+        agent.act_cached("what is the cpu time")
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_other_answers_are_cached(self):
+        """Test that an answer from other tools is served from the cache the second time."""
+        self.assertEqual(agent.act_cached("tell me a joke"), "Done.")
+        self.assertEqual(agent.act_cached("tell me a joke"), "Done.")
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.cache.get_stats()["entries"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
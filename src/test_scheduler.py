@@ -0,0 +1,193 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+import wave
+import voice
+from voice import WavFileSource
+from scheduler import AgentRequest, RequestScheduler
+
+class TestRequestScheduler(unittest.TestCase):
+    def run_scenario(self, scheduler, scenario):
+        async def main():
+            task = asyncio.create_task(scheduler.run())
+            await asyncio.sleep(0)
+            try:
+                await scenario()
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        asyncio.run(main())
+
+    def test_runs_one_request_at_a_time(self):
+        """Test that queued requests never overlap and are timed per stage."""
+        active = []
+        overlaps = []
+
+        async def handler(request):
+            active.append(request.id)
+            overlaps.append(len(active))
+            with request.stage("act"):
+                await asyncio.sleep(0.05)
+            active.remove(request.id)
+            return request.payload
+
+        scheduler = RequestScheduler(handler, max_pending=4, dedupe_window=0, preempt=False)
+
+        async def scenario():
+            for i in range(3):
+                scheduler.submit("hotkey", i)
+            await asyncio.sleep(0.3)
+
+        self.run_scenario(scheduler, scenario)
+        self.assertEqual(max(overlaps), 1)
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["completed"], 3)
+        self.assertEqual([r.result for r in scheduler.history], [0, 1, 2])
+        self.assertGreater(stats["mean_stage_seconds"]["act"], 0.04)
+
+    def test_repeated_triggers_are_deduplicated(self):
+        """Test that a burst of hotkey presses starts a single request."""
+        handled = []
+
+        async def handler(request):
+            handled.append(request.id)
+            await asyncio.sleep(0.05)
+
+        scheduler = RequestScheduler(handler, dedupe_window=1.0)
+
+        async def scenario():
+            for _ in range(5):
+                scheduler.submit("hotkey")
+            await asyncio.sleep(0.2)
+
+        self.run_scenario(scheduler, scenario)
+        self.assertEqual(len(handled), 1)
+        self.assertEqual(scheduler.get_stats()["deduplicated"], 4)
+
+    def test_newer_request_cancels_running_one(self):
+        """Test that a newer trigger cancels the running request and signals its threads."""
+        events = {}
+
+        async def handler(request):
+            events[request.id] = request.cancel_event
+            await asyncio.sleep(0.05 if request.payload == "second" else 10)
+            return request.payload
+
+        scheduler = RequestScheduler(handler, dedupe_window=0)
+
+        async def scenario():
+            scheduler.submit("hotkey", "first")
+            await asyncio.sleep(0.05)
+            scheduler.submit("wake", "second")
+            await asyncio.sleep(0.2)
+
+        self.run_scenario(scheduler, scenario)
+        statuses = [(r.payload, r.status) for r in scheduler.history]
+        self.assertEqual(statuses, [("first", "cancelled"), ("second", "completed")])
+        self.assertTrue(events[1].is_set())
+        self.assertFalse(events[2].is_set())
+
+    def test_preempted_recording_thread_stops(self):
+        """Test that preempting a request stops the command recording its worker thread runs."""
+        tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmpdir.name, 'silence.wav')
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(16000)
+            wf.writeframes(bytes(2 * 16000))
+        capture = voice.set_audio_source(WavFileSource(path, realtime=True, loop=True))
+        recordings = {}
+
+        def record(request):
+            audio, sr = voice.record_command_audio(30, start=capture.position, cancel_event=request.cancel_event)
+            recordings[request.payload] = (len(audio) / sr, time.monotonic())
+
+        async def handler(request):
+            if request.payload == "first":
+                await asyncio.to_thread(record, request)
+            return request.payload
+
+        scheduler = RequestScheduler(handler, dedupe_window=0)
+        preempted = []
+
+        async def scenario():
+            scheduler.submit("hotkey", "first")
+            await asyncio.sleep(0.3)
+            preempted.append(time.monotonic())
+            scheduler.submit("wake", "second")
+            await asyncio.sleep(1.0)
+
+        try:
+            self.run_scenario(scheduler, scenario)
+        finally:
+            capture.stop()
+            voice._audio_capture = None
+            tmpdir.cleanup()
+        seconds, finished = recordings["first"]
+        self.assertLess(finished - preempted[0], 0.5)
+        self.assertLess(seconds, 1.0)
+        self.assertEqual([r.status for r in scheduler.history], ["cancelled", "completed"])
+
+    def test_bounded_queue_drops_oldest(self):
+        """Test that the pending queue keeps only the newest requests."""
+        async def handler(request):
+            await asyncio.sleep(0.02)
+            return request.payload
+
+        scheduler = RequestScheduler(handler, max_pending=2, dedupe_window=0, preempt=False)
+
+        async def scenario():
+            for i in range(5):
+                scheduler.submit("hotkey", i)
+            await asyncio.sleep(0.2)
+
+        self.run_scenario(scheduler, scenario)
+        completed = [r.payload for r in scheduler.history if r.status == "completed"]
+        self.assertEqual(completed, [3, 4])
+        self.assertEqual(scheduler.get_stats()["dropped"], 3)
+
+    def test_submit_from_thread_does_not_block(self):
+        """Test that submitting from another thread returns at once while a request runs."""
+        async def handler(request):
+            await asyncio.sleep(0.3)
+
+        scheduler = RequestScheduler(handler, dedupe_window=0, preempt=False)
+        durations = []
+
+        def press():
+            start = time.perf_counter()
+            scheduler.submit("hotkey")
+            durations.append(time.perf_counter() - start)
+
+        async def scenario():
+            scheduler.submit("hotkey")
+            await asyncio.sleep(0.05)
+            thread = threading.Thread(target=press)
+            thread.start()
+            await asyncio.to_thread(thread.join)
+            await asyncio.sleep(0.7)
+
+        self.run_scenario(scheduler, scenario)
+        self.assertLess(durations[0], 0.05)
+        self.assertEqual(scheduler.get_stats()["completed"], 2)
+
+    def test_submit_when_not_running(self):
+        """Test that submit reports False before the scheduler runs."""
+        scheduler = RequestScheduler(lambda request: asyncio.sleep(0))
+        self.assertFalse(scheduler.submit("hotkey"))
+
+    def test_stage_timing(self):
+        """Test that repeated stages accumulate."""
+        request = AgentRequest(1, "hotkey", None, time.monotonic())
+        with request.stage("act"):
+            time.sleep(0.01)
+        with request.stage("act"):
+            time.sleep(0.01)
+        self.assertGreaterEqual(request.stages["act"], 0.02)
+
+if __name__ == '__main__':
+    unittest.main()
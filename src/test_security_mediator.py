@@ -1,3 +1,5 @@
+import asyncio
+import time
 import unittest
 from unittest.mock import patch, MagicMock
 from security_mediator import SecurityMediator
@@ -88,5 +90,41 @@ class TestSecurityMediator(unittest.TestCase):
         self.assertEqual(result, "Action rejected by user.")
         mock_tool.assert_not_called()
 
+class TestAsyncExecuteTool(unittest.TestCase):
+    def setUp(self):
+        self.mediator = SecurityMediator(max_workers=4)
+
+    def test_blocking_tools_run_concurrently(self):
+        """Test that blocking tools awaited together overlap on the thread pool."""
+        def slow_tool(query):
+            time.sleep(0.2)
+            return f"done {query}"
+
+        async def run_all():
+            return await asyncio.gather(*(self.mediator.aexecute_tool(slow_tool, "cpu_usage", str(i)) for i in range(3)))
+
+        start = time.perf_counter()
+        results = asyncio.run(run_all())
+        self.assertEqual(results, ["done 0", "done 1", "done 2"])
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_policy_violation_blocked(self):
+        """Test that the async path applies the same policies."""
+        mock_tool = MagicMock(return_value="deleted")
+        result = asyncio.run(self.mediator.aexecute_tool(mock_tool, "read_file", {"path": "C:/Windows/system32"}))
+        self.assertEqual(result, "Policy violation: Action blocked.")
+        mock_tool.assert_not_called()
+
+    def test_coroutine_tool_and_failure(self):
+        """Test that coroutine tools are awaited and tool errors are reported."""
+        async def async_tool(query):
+            return f"async {query}"
+
+        def failing_tool(query):
+            raise ValueError("boom")
+
+        self.assertEqual(asyncio.run(self.mediator.aexecute_tool(async_tool, "cpu_usage", "x")), "async x")
+        self.assertEqual(asyncio.run(self.mediator.aexecute_tool(failing_tool, "cpu_usage", "x")), "Tool execution failed: boom")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -1,5 +1,5 @@
 import numpy as np
-from voice import test_enroll, test_verify, transcribe_audio, speak
+from voice import test_enroll, test_verify, transcribe_audio, speak, SPEECH_WAIT_TIMEOUT
 
 # Create dummy audio for testing
 audio = np.random.randn(80000).astype(np.float32)
@@ -23,6 +23,6 @@ print(f"Transcription: {transcription}")
 
 print("Testing TTS with sample text...")
 sample_text = "Hello, this is a test of the text-to-speech system."
-speak(sample_text)
+speak(sample_text).wait(SPEECH_WAIT_TIMEOUT)
 
 print("Test completed.")
\ No newline at end of file
@@ -0,0 +1,431 @@
+import os
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+import wave
+import numpy as np
+from unittest.mock import patch, MagicMock
+import voice
+import agent
+from agent import ContextPrefetcher
+from voice import STTModelRegistry, AudioRingBuffer, AudioCapture, WavFileSource, WakeWordDetector, SpeechEndpointer, VoiceprintStore, StreamingTranscriber, SpeechQueue
+
+def write_wav(path, samples, rate=16000):
+    """Write int16 samples to a mono WAV file."""
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(samples.astype(np.int16).tobytes())
+
+class TestSTTModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = STTModelRegistry()
+
+    @patch('voice.whisper.load_model')
+    def test_whisper_loaded_once(self, mock_load):
+        """Test that Whisper is loaded once and then reused."""
+        mock_load.return_value = MagicMock()
+        first = self.registry.get_whisper()
+        second = self.registry.get_whisper()
+        self.assertIs(first, second)
+        mock_load.assert_called_once_with(self.registry.whisper_model_name)
+        self.assertIn('whisper', self.registry.get_stats()['load_times'])
+
+    @patch('voice.vosk.Model')
+    @patch('voice.whisper.load_model')
+    def test_preload_and_release(self, mock_load, mock_vosk):
+        """Test background preload and explicit release."""
+        self.registry.preload().join()
+        self.assertTrue(self.registry.is_loaded('whisper'))
+        self.assertTrue(self.registry.is_loaded('vosk'))
+        self.registry.release('whisper')
+        self.assertFalse(self.registry.is_loaded('whisper'))
+        self.assertTrue(self.registry.is_loaded('vosk'))
+
+    @patch('voice.psutil.virtual_memory')
+    @patch('voice.whisper.load_model')
+    def test_release_under_memory_pressure(self, mock_load, mock_memory):
+        """Test that Whisper is released only when RAM usage is high."""
+        self.registry.get_whisper()
+        mock_memory.return_value = MagicMock(percent=50)
+        self.assertFalse(self.registry.release_if_memory_pressure())
+        mock_memory.return_value = MagicMock(percent=95)
+        self.assertTrue(self.registry.release_if_memory_pressure())
+        self.assertFalse(self.registry.is_loaded('whisper'))
+
+    def test_inference_timing(self):
+        """Test that timed() records inference durations."""
+        with self.registry.timed('whisper'):
+            pass
+        stats = self.registry.get_stats()['inference']['whisper']
+        self.assertEqual(stats['count'], 1)
+
+class TestAudioCapture(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.samples = (np.arange(16000 * 2) % 2000 - 1000).astype(np.int16)
+        self.wav_path = os.path.join(self.tmpdir.name, 'replay.wav')
+        write_wav(self.wav_path, self.samples)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_ring_buffer_wraparound_view(self):
+        """Test that windows spanning the wrap point come back contiguous and uncopied."""
+        ring = AudioRingBuffer(10)
+        ring.write(np.arange(8, dtype=np.int16))
+        ring.write(np.arange(8, 14, dtype=np.int16))
+        window = ring.view(6, 14)
+        np.testing.assert_array_equal(window, np.arange(6, 14))
+        self.assertTrue(np.shares_memory(window, ring._data))
+        with self.assertRaises(ValueError):
+            ring.view(0, 5)  # Already overwritten
+
+    def test_capture_replays_wav(self):
+        """Test that consecutive readers see the WAV file without gaps."""
+        capture = AudioCapture(WavFileSource(self.wav_path), buffer_seconds=5)
+        reader = capture.reader(0)
+        capture.start()
+        first = reader.read(12000, timeout=5)
+        second = capture.reader(reader.position).read(20000, timeout=5)
+        capture.stop()
+        np.testing.assert_array_equal(np.concatenate([first, second]), self.samples)
+
+    def test_record_audio_from_shared_capture(self):
+        """Test record_audio against a replayed WAV source."""
+        voice.set_audio_source(WavFileSource(self.wav_path, realtime=True, tail_silence=1.0))
+        try:
+            audio, sr = voice.record_audio(0.5)
+        finally:
+            voice.get_audio_capture().stop()
+            voice._audio_capture = None
+        self.assertEqual(sr, 16000)
+        self.assertEqual(len(audio), 8000)
+        self.assertEqual(audio.dtype, np.float32)
+
+class TestWakeWordDetector(unittest.TestCase):
+    @patch('voice.vosk.KaldiRecognizer')
+    def test_partial_result_detection(self, mock_recognizer_cls):
+        """Test that the wake word is spotted from partial results and the recognizer is reused."""
+        rec = mock_recognizer_cls.return_value
+        rec.AcceptWaveform.return_value = False
+        rec.PartialResult.side_effect = ['{"partial": ""}', '{"partial": "[unk]"}', '{"partial": "jarvis"}']
+        tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmpdir.name, 'wake.wav')
+        write_wav(path, np.zeros(16000, dtype=np.int16))
+        capture = AudioCapture(WavFileSource(path, realtime=True), buffer_seconds=2)
+        detector = WakeWordDetector(model=MagicMock())
+        capture.start()
+        position = detector.listen(capture, timeout=5)
+        capture.stop()
+        tmpdir.cleanup()
+        self.assertIsNotNone(position)
+        self.assertEqual(rec.PartialResult.call_count, 3)
+        self.assertEqual(detector.last_detection_position, position)
+        mock_recognizer_cls.assert_called_once()
+        rec.Reset.assert_called()
+
+class TestStreamingTranscriber(unittest.TestCase):
+    @patch('voice.vosk.KaldiRecognizer')
+    def test_reports_changed_hypotheses(self, mock_recognizer_cls):
+        """Test that partial and finalized segments are reported as one growing hypothesis."""
+        rec = mock_recognizer_cls.return_value
+        rec.AcceptWaveform.side_effect = [False, False, True, False]
+        rec.PartialResult.side_effect = ['{"partial": "open"}', '{"partial": "open"}', '{"partial": "the"}']
+        rec.Result.return_value = '{"text": "open notepad"}'
+        partials = []
+        transcriber = StreamingTranscriber(model=MagicMock())
+        transcriber.reset(partials.append)
+        for _ in range(4):
+            transcriber.accept(b'\x00' * 960)
+        self.assertEqual(partials, ['open', 'open notepad', 'open notepad the'])
+
+class StubMemory:
+    """Stand-in for the memory system that records each context lookup."""
+    def __init__(self, failing=()):
+        self.failing = failing
+        self.queries = []
+
+    def get_context_for_query(self, query):
+        self.queries.append(query)
+        if query in self.failing:
+            raise RuntimeError("collection unavailable")
+        return f"context for {query}"
+
+class TestContextPrefetcher(unittest.TestCase):
+    def prefetch(self, memory, partial, final):
+        prefetcher = ContextPrefetcher()
+        try:
+            with patch.object(agent, 'memory_system', memory):
+                prefetcher.on_partial(partial)
+                return prefetcher.context_for(final)
+        finally:
+            prefetcher.close()
+
+    def test_reuses_prefetch_for_similar_transcript(self):
+        """Test that a close final transcript reuses the context fetched for the partial one."""
+        memory = StubMemory()
+        context = self.prefetch(memory, "what is the weather in paris", "What is the weather in Paris?")
+        self.assertEqual(context, "context for what is the weather in paris")
+        self.assertEqual(memory.queries, ["what is the weather in paris"])
+
+    def test_refetches_for_different_transcript(self):
+        """Test that a final transcript unlike the partial one gets a fresh lookup."""
+        memory = StubMemory()
+        context = self.prefetch(memory, "open", "Take a screenshot of my desktop.")
+        self.assertEqual(context, "context for Take a screenshot of my desktop.")
+        self.assertEqual(memory.queries, ["open", "Take a screenshot of my desktop."])
+
+    def test_failed_prefetch_falls_back(self):
+        """Test that a prefetch that raised is replaced by a fresh lookup."""
+        memory = StubMemory(failing=("what is the weather",))
+        context = self.prefetch(memory, "what is the weather", "What is the weather?")
+        self.assertEqual(context, "context for What is the weather?")
+        self.assertEqual(memory.queries, ["what is the weather", "What is the weather?"])
+
+class EnergyVad:
+    """Stand-in for webrtcvad that treats loud frames as speech."""
+    def is_speech(self, frame, rate):
+        return np.abs(np.frombuffer(frame, dtype=np.int16)).max() > 1000
+
+class TestApplyVad(unittest.TestCase):
+    @patch('voice.webrtcvad.Vad', return_value=EnergyVad())
+    def test_keeps_only_speech_frames(self, mock_vad):
+        """Test that apply_vad returns exactly the frames marked as speech."""
+        audio = np.zeros(480 * 10 + 1, dtype=np.float32)
+        audio[480 * 3:480 * 6] = 0.5
+        speech = voice.apply_vad(audio)
+        self.assertEqual(speech.dtype, np.float32)
+        np.testing.assert_array_equal(speech, np.full(480 * 3, 0.5, dtype=np.float32))
+
+    def test_short_input(self):
+        """Test that clips shorter than one frame yield no speech."""
+        self.assertEqual(len(voice.apply_vad(np.zeros(100, dtype=np.float32))), 0)
+
+class TestSpeechEndpointer(unittest.TestCase):
+    def setUp(self):
+        silence = np.zeros(16000, dtype=np.int16)
+        speech = np.full(16000, 5000, dtype=np.int16)
+        self.command = np.concatenate([silence[:4800], speech, silence, silence, silence])  # 0.3s + 1s speech + 3s
+
+    def test_stops_after_hangover(self):
+        """Test that capture ends shortly after speech stops, well before the max duration."""
+        endpointer = SpeechEndpointer(hangover_ms=300, max_duration=5, vad=EnergyVad())
+        end = endpointer.find_endpoint(self.command)
+        self.assertAlmostEqual(end / 16000, 1.6, delta=0.06)
+        self.assertTrue(endpointer.speech_started)
+
+    def test_max_duration_without_speech(self):
+        """Test that silence alone runs until the max duration."""
+        endpointer = SpeechEndpointer(hangover_ms=300, max_duration=2, vad=EnergyVad())
+        end = endpointer.find_endpoint(np.zeros(16000 * 4, dtype=np.int16))
+        self.assertAlmostEqual(end / 16000, 2.0, delta=0.03)
+        self.assertFalse(endpointer.speech_started)
+
+    @patch('voice.webrtcvad.Vad', return_value=EnergyVad())
+    def test_record_command_audio_endpointed(self, mock_vad):
+        """Test that record_command_audio returns only up to the endpoint."""
+        tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmpdir.name, 'command.wav')
+        write_wav(path, self.command)
+        capture = voice.set_audio_source(WavFileSource(path))
+        try:
+            audio, sr = voice.record_command_audio(5, start=0, hangover_ms=300)
+        finally:
+            capture.stop()
+            voice._audio_capture = None
+            tmpdir.cleanup()
+        self.assertLess(len(audio) / sr, 1.7)
+        self.assertGreater(len(audio) / sr, 1.3)
+
+class TestVoiceprintStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'voiceprints.npz')
+        self.store = VoiceprintStore(self.path)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_scores_against_all_speakers(self):
+        """Test that the best-matching enrolled speaker is returned."""
+        self.store.enroll('alice', np.eye(13)[0])
+        self.store.enroll('bob', np.eye(13)[1])
+        speaker, similarity = self.store.score(np.eye(13)[1] * 3 + 0.01)
+        self.assertEqual(speaker, 'bob')
+        self.assertGreater(similarity, 0.99)
+        self.assertEqual(self.store.voiceprints.shape, (2, 13))
+
+    def test_persists_without_pickle(self):
+        """Test that another store instance loads the file with pickling disabled."""
+        self.store.enroll('alice', np.arange(13))
+        with np.load(self.path, allow_pickle=False) as data:
+            self.assertEqual(list(data['names']), ['alice'])
+        self.assertEqual(VoiceprintStore(self.path).speakers(), ['alice'])
+
+    def test_reloads_when_file_changes(self):
+        """Test that the cache picks up enrollments written by another instance."""
+        self.assertEqual(self.store.speakers(), [])
+        other = VoiceprintStore(self.path)
+        other.enroll('carol', np.arange(13))
+        os.utime(self.path, ns=(0, 10 ** 18))
+        self.assertEqual(self.store.speakers(), ['carol'])
+        self.store.remove('carol')
+        self.assertEqual(self.store.score(np.arange(13)), (None, 0.0))
+
+    def test_imports_legacy_pickle_only_on_request(self):
+        """Test that a pickled voiceprint is ignored until explicitly imported."""
+        legacy_path = os.path.join(self.tmpdir.name, 'voiceprint.pkl')
+        with open(legacy_path, 'wb') as f:
+            pickle.dump(np.arange(13, dtype=np.float64), f)
+        self.assertEqual(self.store.speakers(), [])
+        with patch('voice.voiceprint_store', self.store):
+            voice.import_legacy_voiceprint(legacy_path)
+        self.assertEqual(VoiceprintStore(self.path).score(np.arange(13))[0], voice.DEFAULT_SPEAKER)
+
+class TestVerifyAndTranscribe(unittest.TestCase):
+    def test_runs_concurrently(self):
+        """Test that verification and transcription overlap."""
+        def slow_verify(audio, sr):
+            time.sleep(0.3)
+            return True
+        def slow_transcribe(audio, sr, stop_event):
+            time.sleep(0.3)
+            return "open notepad"
+        start = time.perf_counter()
+        result = voice.verify_and_transcribe(None, 16000, verify=slow_verify, transcribe=slow_transcribe)
+        self.assertEqual(result, "open notepad")
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_discards_transcript_when_not_verified(self):
+        """Test that an unverified speaker gets no transcript and the transcriber is told to stop."""
+        finish = threading.Event()
+        stop_events = []
+        def transcribe(audio, sr, stop_event):
+            stop_events.append(stop_event)
+            finish.wait(5)  # Still running when verification returns
+            return "delete everything"
+        def verify(audio, sr):
+            while not stop_events:
+                time.sleep(0.01)
+            return False
+        result = voice.verify_and_transcribe(None, 16000, verify=verify, transcribe=transcribe)
+        finish.set()
+        self.assertIsNone(result)
+        self.assertTrue(stop_events[0].is_set())
+
+    def test_returns_when_cancelled_during_transcription(self):
+        """Test that a cancelled request stops waiting for a transcription in progress."""
+        cancel_event = threading.Event()
+        def slow_transcribe(audio, sr, stop_event):
+            stop_event.wait(5)
+            return "open notepad"
+        threading.Timer(0.2, cancel_event.set).start()
+        start = time.perf_counter()
+        result = voice.verify_and_transcribe(None, 16000, verify=lambda a, sr: True, transcribe=slow_transcribe, cancel_event=cancel_event)
+        self.assertIsNone(result)
+        self.assertLess(time.perf_counter() - start, 1)
+
+    @patch('voice.stt_models')
+    def test_transcribe_skips_decoding_once_stopped(self, mock_models):
+        """Test that Whisper is not run for audio that was already rejected."""
+        stop_event = threading.Event()
+        stop_event.set()
+        self.assertIsNone(voice.transcribe_audio(np.zeros(16000, dtype=np.float32), 16000, stop_event))
+        mock_models.get_whisper.return_value.transcribe.assert_not_called()
+
+class StubEngine:
+    """Stand-in for a pyttsx3 engine that records what it was asked to say.
+
+    Like pyttsx3, it fires 'started-word' callbacks from inside runAndWait(),
+    and records which threads called stop().
+    """
+    def __init__(self, duration=0.05, word_interval=0.01):
+        self.duration = duration
+        self.word_interval = word_interval
+        self.spoken = []
+        self.stop_threads = []
+        self._callbacks = []
+        self._stopped = False
+        self._text = None
+
+    def connect(self, topic, callback):
+        if topic == 'started-word':
+            self._callbacks.append(callback)
+
+    def say(self, text):
+        self._text = text
+
+    def runAndWait(self):
+        self._stopped = False
+        deadline = time.monotonic() + self.duration
+        location = 0
+        while time.monotonic() < deadline:
+            for callback in self._callbacks:
+                callback(None, location, 1)
+            if self._stopped:
+                return
+            location += 1
+            time.sleep(self.word_interval)
+        self.spoken.append(self._text)
+
+    def stop(self):
+        self.stop_threads.append(threading.current_thread())
+        self._stopped = True
+
+class TestSpeechQueue(unittest.TestCase):
+    def setUp(self):
+        self.engine = StubEngine()
+        self.queue = SpeechQueue(engine_factory=lambda: self.engine)
+
+    def tearDown(self):
+        self.queue.stop()
+
+    def test_answers_before_alerts_and_merges_duplicates(self):
+        """Test priority ordering and merging of repeated alerts."""
+        first = self.queue.say("Working on it.")
+        self.queue.say("High CPU usage detected: 85%", voice.PRIORITY_ALERT, key="High CPU usage detected")
+        self.queue.say("High CPU usage detected: 90%", voice.PRIORITY_ALERT, key="High CPU usage detected")
+        self.queue.say("Here is your answer.")
+        first.wait(1)
+        self.assertTrue(self.queue.drain(2))
+        self.assertEqual(self.engine.spoken, ["Working on it.", "Here is your answer.", "High CPU usage detected: 90%"])
+
+    def test_missing_engine_releases_waiters(self):
+        """Test that speech completes without an engine instead of blocking forever."""
+        def broken_engine():
+            raise RuntimeError("eSpeak not installed")
+        queue = SpeechQueue(engine_factory=broken_engine)
+        self.assertTrue(queue.say("hello").wait(3))
+        queue.thread.join(1)
+        self.assertFalse(queue.running)
+        self.assertTrue(queue.say("still there?").wait(0.1))
+        self.assertTrue(queue.drain(0.1))
+
+    def test_say_does_not_block(self):
+        """Test that queuing speech returns before it is spoken."""
+        self.engine.duration = 0.5
+        start = time.perf_counter()
+        request = self.queue.say("A long answer.")
+        self.assertLess(time.perf_counter() - start, 0.1)
+        self.assertTrue(request.wait(2))
+
+    def test_cancel_interrupts_speech(self):
+        """Test barge-in: the current utterance stops and queued speech is dropped."""
+        self.engine.duration = 5
+        current = self.queue.say("This will be interrupted.")
+        queued = self.queue.say("This will never be said.")
+        while not self.queue.is_speaking():
+            time.sleep(0.01)
+        self.queue.cancel()
+        self.assertTrue(current.wait(1))
+        self.assertTrue(queued.cancelled)
+        self.assertEqual(self.engine.spoken, [])
+        # The engine is only stopped from the worker thread
+        self.assertEqual(self.engine.stop_threads, [self.queue.thread])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,421 @@
+"""In-process vector store backed by NumPy.
+
+`NumpyVectorStore` implements the part of Chroma's Collection API that
+MemorySystem uses (add, get, query, delete, count, with the same argument
+names and result shapes), so either can serve as `MemorySystem.collection`.
+
+Embeddings are normalized and kept in a memory-mapped matrix,
+`vectors.npy`: float32, or int8 with a per-row scale in `scales.npy` when
+`quantize` is set. IDs, documents and metadata are appended to
+`records.jsonl`, which is replayed on open. Search is exact: one
+matrix-vector product and `argpartition`.
+
+`vacuum` writes the live rows to new files next to the old ones and swaps
+them in under a commit marker; a store opened after a crash mid-vacuum
+finishes the swap if the marker was written and discards it otherwise.
+
+`where` filters are evaluated before any scoring. Conditions on the typed
+metadata fields use column indexes: a float array for "timestamp" and
+value-to-rows postings for "type", "session" and "source_tool"; anything
+else is checked row by row.
+"""
+import json
+import operator
+import os
+import threading
+from array import array
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+INITIAL_CAPACITY = 1024
+# Rows widened from int8 to float32 at a time during a query
+QUERY_BLOCK = 8192
+# Filters matching less than 1/GATHER_FRACTION of the rows score only those rows
+GATHER_FRACTION = 4
+INCLUDE_DEFAULT = ["documents", "metadatas"]
+STORE_FILES = ("vectors.npy", "scales.npy", "records.jsonl")
+VACUUM_SUFFIX = ".vacuum"
+VACUUM_MARKER = "vacuum.commit"
+NUMERIC_COLUMNS = ("timestamp",)
+CATEGORY_COLUMNS = ("type", "session", "source_tool")
+NUMERIC_OPERATORS = {"$eq": operator.eq, "$ne": operator.ne, "$gt": operator.gt, "$gte": operator.ge,
+                     "$lt": operator.lt, "$lte": operator.le}
+
+def matches(metadata: Optional[Dict[str, Any]], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma-style `where` filter against one metadata dict."""
+    if not where:
+        return True
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(metadata, clause) for clause in condition):
+                return False
+        else:
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            for operator, operand in condition.items():
+                if not compare(value, operator, operand):
+                    return False
+    return True
+
+def compare(value: Any, operator: str, operand: Any) -> bool:
+    if operator == "$eq":
+        return value == operand
+    if operator == "$ne":
+        return value != operand
+    if operator == "$in":
+        return value in operand
+    if operator == "$nin":
+        return value not in operand
+    if value is None:
+        return False
+    if operator == "$gt":
+        return value > operand
+    if operator == "$gte":
+        return value >= operand
+    if operator == "$lt":
+        return value < operand
+    if operator == "$lte":
+        return value <= operand
+    raise ValueError(f"Unsupported where operator: {operator}")
+
+class NumpyVectorStore:
+    """Exact nearest-neighbour search over a memory-mapped embedding matrix."""
+
+    def __init__(self, path: str, quantize: bool = False):
+        self.path = path
+        self.quantize = quantize
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._ids: List[str] = []
+        self._documents: List[Optional[str]] = []
+        self._metadatas: List[Optional[Dict[str, Any]]] = []
+        self._rows: Dict[str, int] = {}
+        self._vectors = None
+        self._scales = None
+        self._live = None
+        self._reset_columns()
+        self._finish_vacuum()
+        self._load()
+        self._log = open(os.path.join(path, "records.jsonl"), "a", encoding="utf-8")
+
+    def _finish_vacuum(self) -> None:
+        """Complete a vacuum that committed before a crash, or discard one that did not."""
+        marker = os.path.join(self.path, VACUUM_MARKER)
+        committed = os.path.exists(marker)
+        for name in STORE_FILES:
+            temporary = os.path.join(self.path, name + VACUUM_SUFFIX)
+            if os.path.exists(temporary):
+                if committed:
+                    os.replace(temporary, os.path.join(self.path, name))
+                else:
+                    os.remove(temporary)
+        if committed:
+            os.remove(marker)
+
+    def _load(self) -> None:
+        vectors_path = os.path.join(self.path, "vectors.npy")
+        if os.path.exists(vectors_path):
+            self._vectors = np.load(vectors_path, mmap_mode="r+")
+            self.quantize = self._vectors.dtype == np.int8
+            if self.quantize:
+                self._scales = np.load(os.path.join(self.path, "scales.npy"), mmap_mode="r+")
+        records_path = os.path.join(self.path, "records.jsonl")
+        if not os.path.exists(records_path):
+            return
+        with open(records_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # A write cut short by a crash; later lines cannot exist
+                if "delete" in record:
+                    for id in record["delete"]:
+                        row = self._rows.pop(id, None)
+                        if row is not None:
+                            self._ids[row] = self._documents[row] = self._metadatas[row] = None
+                    continue
+                self._index_columns(len(self._ids), record.get("metadata"))
+                self._rows[record["id"]] = len(self._ids)
+                self._ids.append(record["id"])
+                self._documents.append(record.get("document"))
+                self._metadatas.append(record.get("metadata"))
+
+    def _allocate(self, rows: int, dim: int) -> None:
+        """Make room for `rows` rows, doubling the files' capacity as needed."""
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if rows <= capacity:
+            return
+        new_capacity = max(INITIAL_CAPACITY, capacity)
+        while new_capacity < rows:
+            new_capacity *= 2
+        arrays = [("vectors.npy", np.int8 if self.quantize else np.float32, (new_capacity, dim), self._vectors)]
+        if self.quantize:
+            arrays.append(("scales.npy", np.float32, (new_capacity,), self._scales))
+        grown = []
+        for name, dtype, shape, old in arrays:
+            final = os.path.join(self.path, name)
+            temporary = final + ".tmp"
+            array = np.lib.format.open_memmap(temporary, mode="w+", dtype=dtype, shape=shape)
+            if old is not None:
+                array[:capacity] = old
+            array.flush()
+            del array
+            os.replace(temporary, final)
+            grown.append(np.load(final, mmap_mode="r+"))
+        self._vectors = grown[0]
+        if self.quantize:
+            self._scales = grown[1]
+
+    def count(self) -> int:
+        return len(self._rows)
+
+    def add(self, ids: Sequence[str], embeddings, metadatas: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+            documents: Optional[Sequence[str]] = None) -> None:
+        """Add embeddings with their documents and metadata. IDs that already exist are skipped."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        embeddings = embeddings / np.where(norms, norms, 1)
+        metadatas = metadatas or [None] * len(ids)
+        documents = documents or [None] * len(ids)
+        with self._lock:
+            new = [i for i, id in enumerate(ids) if id not in self._rows]
+            if not new:
+                return
+            start = len(self._ids)
+            self._allocate(start + len(new), embeddings.shape[1])
+            rows = slice(start, start + len(new))
+            if self.quantize:
+                scales = np.abs(embeddings[new]).max(axis=1) / 127
+                scales[scales == 0] = 1
+                self._vectors[rows] = np.round(embeddings[new] / scales[:, None]).astype(np.int8)
+                self._scales[rows] = scales
+                self._scales.flush()
+            else:
+                self._vectors[rows] = embeddings[new]
+            # Vectors reach the file before the records that refer to them
+            self._vectors.flush()
+            lines = []
+            for i in new:
+                self._index_columns(len(self._ids), metadatas[i])
+                self._rows[ids[i]] = len(self._ids)
+                self._ids.append(ids[i])
+                self._documents.append(documents[i])
+                self._metadatas.append(metadatas[i])
+                lines.append(json.dumps({"id": ids[i], "document": documents[i], "metadata": metadatas[i]}) + "\n")
+            self._live = None
+            self._log.write("".join(lines))
+            self._log.flush()
+
+    def _embedding(self, rows) -> np.ndarray:
+        if self._vectors is None:
+            return np.empty((0, 0), dtype=np.float32)
+        if self.quantize:
+            return self._vectors[rows].astype(np.float32) * self._scales[rows][..., None]
+        return np.array(self._vectors[rows])
+
+    def _reset_columns(self) -> None:
+        # NaN where a memory has no value
+        self._numeric = {name: array("d") for name in NUMERIC_COLUMNS}
+        self._numeric_arrays: Dict[str, np.ndarray] = {}
+        self._categories: Dict[str, Dict[Any, List[int]]] = {name: {} for name in CATEGORY_COLUMNS}
+
+    def _index_columns(self, row: int, metadata: Optional[Dict[str, Any]]) -> None:
+        metadata = metadata or {}
+        for name, column in self._numeric.items():
+            value = metadata.get(name)
+            column.append(float(value) if isinstance(value, (int, float)) else float("nan"))
+            self._numeric_arrays.pop(name, None)
+        for name, postings in self._categories.items():
+            value = metadata.get(name)
+            if value is not None:
+                postings.setdefault(value, []).append(row)
+
+    def _field_mask(self, field: str, condition: Any) -> np.ndarray:
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        total = len(self._ids)
+        if field in self._numeric and all(op in NUMERIC_OPERATORS and isinstance(operand, (int, float)) for op, operand in condition.items()):
+            column = self._numeric_arrays.get(field)
+            if column is None:
+                column = self._numeric_arrays[field] = np.array(self._numeric[field], dtype=np.float64)
+            mask = np.ones(total, dtype=bool)
+            for op, operand in condition.items():
+                mask &= NUMERIC_OPERATORS[op](column, operand)
+            return mask
+        if field in self._categories and all(op in ("$eq", "$in") for op in condition):
+            mask = np.ones(total, dtype=bool)
+            for op, operand in condition.items():
+                matched = np.zeros(total, dtype=bool)
+                for value in ([operand] if op == "$eq" else operand):
+                    rows = self._categories[field].get(value)
+                    if rows:
+                        matched[rows] = True
+                mask &= matched
+            return mask
+        return np.fromiter((matches(metadata, {field: condition}) for metadata in self._metadatas), dtype=bool, count=total)
+
+    def _mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Rows matching `where`, as a boolean mask over all rows including deleted ones."""
+        mask = np.ones(len(self._ids), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for clause in condition:
+                    mask &= self._mask(clause)
+            elif key == "$or":
+                matched = np.zeros(len(self._ids), dtype=bool)
+                for clause in condition:
+                    matched |= self._mask(clause)
+                mask &= matched
+            else:
+                mask &= self._field_mask(key, condition)
+        return mask
+
+    def _select(self, ids: Optional[Sequence[str]], where: Optional[Dict[str, Any]]) -> np.ndarray:
+        if ids is not None:
+            rows = np.array([self._rows[id] for id in ids if id in self._rows], dtype=np.int64)
+            return rows[self._mask(where)[rows]] if where and len(rows) else rows
+        if not where:
+            return self._live_rows()
+        alive = np.zeros(len(self._ids), dtype=bool)
+        alive[self._live_rows()] = True
+        return np.flatnonzero(self._mask(where) & alive)
+
+    def _result(self, rows: Sequence[int], include: Sequence[str]) -> Dict[str, Any]:
+        return {
+            "ids": [self._ids[row] for row in rows],
+            "documents": [self._documents[row] for row in rows] if "documents" in include else None,
+            "metadatas": [self._metadatas[row] for row in rows] if "metadatas" in include else None,
+            "embeddings": self._embedding(rows) if "embeddings" in include else None
+        }
+
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Sequence[str] = INCLUDE_DEFAULT) -> Dict[str, Any]:
+        with self._lock:
+            rows = self._select(ids, where)
+            start = offset or 0
+            rows = rows[start:start + limit if limit is not None else None]
+            return self._result(rows, include)
+
+    def _live_rows(self) -> np.ndarray:
+        if self._live is None:
+            self._live = np.array([row for row, id in enumerate(self._ids) if id is not None], dtype=np.int64)
+        return self._live
+
+    def _scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of `query` with the given rows."""
+        total = len(self._ids)
+        if len(rows) * GATHER_FRACTION < total:
+            # A selective filter: copy out just those rows
+            return self._similarity(self._vectors[rows], self._scales[rows] if self.quantize else None, query)
+        # Otherwise one product over the contiguous block is cheaper than a gather
+        scores = self._similarity(self._vectors[:total], self._scales[:total] if self.quantize else None, query)
+        return scores if len(rows) == total else scores[rows]
+
+    def _similarity(self, vectors: np.ndarray, scales: Optional[np.ndarray], query: np.ndarray) -> np.ndarray:
+        if scales is None:
+            return vectors @ query
+        # int8 rows are widened block by block instead of copying the whole matrix to float32
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), QUERY_BLOCK):
+            block = vectors[start:start + QUERY_BLOCK]
+            scores[start:start + QUERY_BLOCK] = block.astype(np.float32) @ query
+        return scores * scales
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Sequence[str] = INCLUDE_DEFAULT + ["distances"]) -> Dict[str, Any]:
+        """Exact top-k search. Distances are squared L2 between normalized vectors, like Chroma's default space."""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        results = {key: [] for key in ["ids", "documents", "metadatas", "embeddings", "distances"]}
+        with self._lock:
+            rows = self._select(None, where)
+            for query in queries:
+                k = min(n_results, len(rows))
+                if k:
+                    scores = self._scores(rows, query)
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    top = top[np.argsort(-scores[top])]
+                    similarities, top = scores[top], rows[top].tolist()
+                else:
+                    similarities, top = np.empty(0), []
+                result = self._result(top, include)
+                for key in ["ids", "documents", "metadatas", "embeddings"]:
+                    results[key].append(result[key])
+                results["distances"].append((2 - 2 * similarities).tolist())
+        for key in ["documents", "metadatas", "embeddings", "distances"]:
+            if key not in include:
+                results[key] = None
+        return results
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        """Delete by ID and/or filter. Rows stay in the files until `vacuum`."""
+        with self._lock:
+            rows = self._select(ids, where)
+            deleted = [self._ids[row] for row in rows]
+            for row, id in zip(rows, deleted):
+                del self._rows[id]
+                self._ids[row] = None
+                self._documents[row] = None
+                self._metadatas[row] = None
+            self._live = None
+            if deleted:
+                self._log.write(json.dumps({"delete": deleted}) + "\n")
+                self._log.flush()
+
+    def vacuum(self) -> None:
+        """Rewrite the files without deleted rows.
+
+        The lock is held throughout, so readers wait rather than see a
+        partial store. int8 rows and their scales are copied unchanged.
+        """
+        with self._lock:
+            rows = self._live_rows()
+            had_vectors = self._vectors is not None
+            arrays, old = [], None
+            if self._vectors is not None:
+                arrays.append(("vectors.npy", self._vectors))
+                if self.quantize:
+                    arrays.append(("scales.npy", self._scales))
+            for name, old in arrays:
+                shape = (max(INITIAL_CAPACITY, len(rows)),) + old.shape[1:]
+                array = np.lib.format.open_memmap(os.path.join(self.path, name + VACUUM_SUFFIX), mode="w+", dtype=old.dtype, shape=shape)
+                for start in range(0, len(rows), QUERY_BLOCK):
+                    block = rows[start:start + QUERY_BLOCK]
+                    array[start:start + len(block)] = old[block]
+                array.flush()
+                del array
+            with open(os.path.join(self.path, "records.jsonl" + VACUUM_SUFFIX), "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({"id": self._ids[row], "document": self._documents[row], "metadata": self._metadatas[row]}) + "\n")
+            # From here on a crash is rolled forward by _finish_vacuum
+            open(os.path.join(self.path, VACUUM_MARKER), "w").close()
+            self._log.close()
+            # Drop every map of the old files before replacing them
+            del arrays, old
+            self._vectors = self._scales = None
+            self._finish_vacuum()
+
+            self._ids = [self._ids[row] for row in rows]
+            self._documents = [self._documents[row] for row in rows]
+            self._metadatas = [self._metadatas[row] for row in rows]
+            self._rows = {id: row for row, id in enumerate(self._ids)}
+            self._reset_columns()
+            for row, metadata in enumerate(self._metadatas):
+                self._index_columns(row, metadata)
+            self._live = None
+            if had_vectors:
+                self._vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r+")
+                if self.quantize:
+                    self._scales = np.load(os.path.join(self.path, "scales.npy"), mmap_mode="r+")
+            self._log = open(os.path.join(self.path, "records.jsonl"), "a", encoding="utf-8")
+
+    def close(self) -> None:
+        with self._lock:
+            self._log.close()
+            if self._vectors is not None:
+                self._vectors.flush()
@@ -1,23 +1,26 @@
-_tts_engine = None
-
-def speak_pyttsx3(text):
-    global _tts_engine
-    if _tts_engine is None:
-        _tts_engine = pyttsx3.init()
-    _tts_engine.say(text)
-    _tts_engine.runAndWait()
-
 import pyaudio
 import webrtcvad
 import librosa
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import pickle
 import os
 import vosk
-import whisper
 import pyttsx3
+import psutil
+import threading
 import time
+import gc
+import heapq
+import itertools
+import json
+import wave
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from lazy_imports import lazy_import
+
+# Whisper pulls in torch; it is only imported once the model is first loaded
+whisper = lazy_import("whisper")
 
 # Audio settings
 FORMAT = pyaudio.paInt16
@@ -26,91 +29,679 @@ RATE = 16000
 CHUNK = 1024
 VAD_AGGRESSIVENESS = 3
 THRESHOLD = 0.7
-VOICEPRINT_PATH = 'data/voiceprint.pkl'
+VOICEPRINT_PATH = 'data/voiceprints.npz'
+LEGACY_VOICEPRINT_PATH = 'data/voiceprint.pkl'
+DEFAULT_SPEAKER = 'owner'
+N_MFCC = 13
+PIPELINE_VERIFICATION = True  # Transcribe while the speaker is being verified
+CANCEL_POLL_SECONDS = 0.1  # How often a pending transcription checks for cancellation
 
 # STT settings
 VOSK_MODEL_PATH = 'models/vosk-model-small-en-us-0.15'
 WHISPER_MODEL_NAME = 'base'
+MEMORY_PRESSURE_PERCENT = 90  # Release cached models above this RAM usage
+
+# Wake word settings
+WAKE_WORD = 'jarvis'
+WAKE_WORD_TIMEOUT = 60  # seconds
+
+# Command endpointing settings
+VAD_FRAME_MS = 30  # webrtcvad accepts 10, 20 or 30 ms frames
+VAD_HANGOVER_MS = 700  # Trailing silence that ends a command
+COMMAND_MAX_DURATION = 5  # seconds
+
+# Capture settings
+RING_BUFFER_SECONDS = 30  # Audio history kept by the capture thread
+
+class STTModelRegistry:
+    """Process-wide cache for the Whisper and Vosk models.
+
+    Models are loaded once on first use (or preloaded in the background at
+    startup) and kept warm, so each utterance only pays for decoding.
+    """
+
+    def __init__(self, whisper_model_name=WHISPER_MODEL_NAME, vosk_model_path=VOSK_MODEL_PATH):
+        self.whisper_model_name = whisper_model_name
+        self.vosk_model_path = vosk_model_path
+        self._models = {}
+        self._lock = threading.Lock()
+        self.load_times = {}
+        self.inference_times = {}
+
+    def _get(self, name, loader):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            if name not in self._models:
+                start = time.perf_counter()
+                self._models[name] = loader()
+                self.load_times[name] = time.perf_counter() - start
+                print(f"Loaded {name} model in {self.load_times[name]:.2f}s")
+            return self._models[name]
+
+    def get_whisper(self):
+        """Return the shared Whisper model, loading it if needed."""
+        return self._get('whisper', lambda: whisper.load_model(self.whisper_model_name))
+
+    def get_vosk(self):
+        """Return the shared Vosk model, loading it if needed."""
+        return self._get('vosk', lambda: vosk.Model(self.vosk_model_path))
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def preload(self, background=True):
+        """Load all models, by default on a daemon thread so startup is not blocked."""
+        if background:
+            thread = threading.Thread(target=self.preload, kwargs={'background': False}, daemon=True)
+            thread.start()
+            return thread
+        self.get_vosk()
+        self.get_whisper()
+        return None
+
+    def release(self, name=None):
+        """Drop one model (or all of them) so the memory can be reclaimed."""
+        with self._lock:
+            names = [name] if name else list(self._models)
+            for n in names:
+                self._models.pop(n, None)
+        gc.collect()
+
+    def release_if_memory_pressure(self, threshold=MEMORY_PRESSURE_PERCENT):
+        """Release Whisper, the largest model, when system RAM usage is above threshold."""
+        if psutil.virtual_memory().percent >= threshold and self.is_loaded('whisper'):
+            print("Memory pressure detected. Releasing Whisper model.")
+            self.release('whisper')
+            return True
+        return False
+
+    @contextmanager
+    def timed(self, name):
+        """Record the wall time of an inference call under the given model name."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.inference_times.setdefault(name, deque(maxlen=100)).append(time.perf_counter() - start)
+
+    def get_stats(self):
+        """Return load times and recent inference timings per model."""
+        inference = {}
+        for name, times in self.inference_times.items():
+            if times:
+                inference[name] = {
+                    'count': len(times),
+                    'last': times[-1],
+                    'mean': sum(times) / len(times)
+                }
+        return {
+            'loaded': sorted(self._models),
+            'load_times': dict(self.load_times),
+            'inference': inference
+        }
+
+# Global instance
+stt_models = STTModelRegistry()
+
+class MicrophoneSource:
+    """Audio source reading 16-bit mono PCM chunks from the default input device."""
+
+    def __init__(self, rate=RATE, chunk=CHUNK):
+        self.rate = rate
+        self.chunk = chunk
+        self._audio = None
+        self._stream = None
+
+    def open(self):
+        self._audio = pyaudio.PyAudio()
+        self._stream = self._audio.open(format=FORMAT, channels=CHANNELS, rate=self.rate, input=True, frames_per_buffer=self.chunk)
+
+    def read(self):
+        return self._stream.read(self.chunk, exception_on_overflow=False)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._audio is not None:
+            self._audio.terminate()
+            self._audio = None
+
+class WavFileSource:
+    """Audio source replaying a 16-bit mono WAV file, used for tests and benchmarks.
+
+    With realtime=True chunks are paced like a live microphone. Once the file
+    (and any trailing silence) is exhausted, read() returns b''.
+    """
+
+    def __init__(self, path, chunk=CHUNK, realtime=False, loop=False, tail_silence=0.0):
+        self.path = path
+        self.chunk = chunk
+        self.realtime = realtime
+        self.loop = loop
+        self.tail_silence = tail_silence
+        self._wav = None
+        self._silence_left = 0
+        with wave.open(path, 'rb') as wf:
+            if wf.getnchannels() != CHANNELS or wf.getsampwidth() != 2:
+                raise ValueError(f"{path}: expected 16-bit mono audio")
+            self.rate = wf.getframerate()
+
+    def open(self):
+        self._wav = wave.open(self.path, 'rb')
+        self._silence_left = int(self.rate * self.tail_silence)
+
+    def read(self):
+        if self.realtime:
+            time.sleep(self.chunk / self.rate)
+        data = self._wav.readframes(self.chunk)
+        if not data and self.loop:
+            self._wav.rewind()
+            data = self._wav.readframes(self.chunk)
+        if not data and self._silence_left > 0:
+            n = min(self.chunk, self._silence_left)
+            self._silence_left -= n
+            data = bytes(2 * n)
+        return data
+
+    def close(self):
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+class AudioRingBuffer:
+    """Preallocated int16 ring buffer addressed by absolute sample position.
+
+    Every sample is written twice (at i and i + capacity), so any window of up
+    to `capacity` samples is a single contiguous slice and can be handed out
+    as a view instead of a copy.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(2 * capacity, dtype=np.int16)
+        self.position = 0  # Total number of samples ever written
+
+    def write(self, samples):
+        n = len(samples)
+        if n > self.capacity:
+            self.position += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+        offset = self.position % self.capacity
+        first = min(n, self.capacity - offset)
+        for base in (0, self.capacity):
+            self._data[base + offset:base + offset + first] = samples[:first]
+        rest = n - first
+        if rest:
+            for base in (0, self.capacity):
+                self._data[base:base + rest] = samples[first:]
+        self.position += n
+
+    def view(self, start, end):
+        """Return a read-only view of samples [start, end)."""
+        if end > self.position or start < self.position - self.capacity or start > end:
+            raise ValueError(f"Samples [{start}, {end}) are not in the buffer")
+        offset = start % self.capacity
+        window = self._data[offset:offset + end - start]
+        window.flags.writeable = False
+        return window
+
+class AudioReader:
+    """Sequential cursor over an AudioCapture; each consumer keeps its own."""
+
+    def __init__(self, capture, start):
+        self.capture = capture
+        self.position = start
+
+    def read(self, n, timeout=None):
+        """Return the next n samples as a view, waiting for them to be captured."""
+        samples = self.capture.read(self.position, self.position + n, timeout)
+        self.position += len(samples)
+        return samples
+
+class AudioCapture:
+    """Long-lived capture thread that keeps one input stream open.
+
+    Chunks from the source are written into an AudioRingBuffer. Consumers
+    (wake word, command and confirmation recorders) read views of the buffer
+    through AudioReader cursors, so no audio is dropped between them.
+    """
+
+    def __init__(self, source=None, buffer_seconds=RING_BUFFER_SECONDS):
+        self.source = source or MicrophoneSource()
+        self.rate = self.source.rate
+        self.buffer = AudioRingBuffer(int(self.rate * buffer_seconds))
+        self.running = False
+        self.exhausted = False
+        self.thread = None
+        self._cond = threading.Condition()
+
+    @property
+    def position(self):
+        return self.buffer.position
+
+    def start(self):
+        if not self.running:
+            self.source.open()
+            self.running = True
+            self.exhausted = False
+            self.thread = threading.Thread(target=self.capture_loop)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.source.close()
+        with self._cond:
+            self._cond.notify_all()
+
+    def capture_loop(self):
+        while self.running:
+            data = self.source.read()
+            if not data:
+                with self._cond:
+                    self.exhausted = True
+                    self._cond.notify_all()
+                break
+            with self._cond:
+                self.buffer.write(np.frombuffer(data, dtype=np.int16))
+                self._cond.notify_all()
+
+    def wait_for(self, position, timeout=None):
+        """Block until `position` samples have been captured. Returns False on timeout or end of input."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.buffer.position >= position or self.exhausted or not self.running, timeout)
+            return self.buffer.position >= position
+
+    def read(self, start, end, timeout=None):
+        """Return a view of samples [start, end), truncated if the input ends or the wait times out."""
+        self.wait_for(end, timeout)
+        with self._cond:
+            end = min(end, self.buffer.position)
+            if end <= start:
+                return np.empty(0, dtype=np.int16)
+            return self.buffer.view(start, end)
+
+    def reader(self, start=None):
+        """Create a cursor starting at `start` (default: the current position)."""
+        return AudioReader(self, self.position if start is None else start)
+
+_audio_capture = None
+_audio_capture_lock = threading.Lock()
+
+def get_audio_capture():
+    """Return the shared capture thread, opening the microphone on first use."""
+    global _audio_capture
+    with _audio_capture_lock:
+        if _audio_capture is None:
+            _audio_capture = AudioCapture()
+            _audio_capture.start()
+        return _audio_capture
+
+def set_audio_source(source):
+    """Replace the shared capture with one reading from `source` (e.g. a WavFileSource)."""
+    global _audio_capture
+    with _audio_capture_lock:
+        if _audio_capture is not None:
+            _audio_capture.stop()
+        _audio_capture = AudioCapture(source)
+        _audio_capture.start()
+        return _audio_capture
+
+def to_float32(samples):
+    """Convert int16 PCM samples to float32 in [-1, 1)."""
+    return samples.astype(np.float32) / 32768.0
 
 def record_audio(duration=5):
     """Record audio for the given duration."""
-    audio = pyaudio.PyAudio()
-    stream = audio.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK)
-    frames = []
-    for _ in range(0, int(RATE / CHUNK * duration)):
-        data = stream.read(CHUNK)
-        frames.append(data)
-    stream.stop_stream()
-    stream.close()
-    audio.terminate()
-    # Convert to numpy array
-    audio_data = np.frombuffer(b''.join(frames), dtype=np.int16).astype(np.float32) / 32768.0
-    return audio_data, RATE
+    capture = get_audio_capture()
+    samples = capture.reader().read(int(capture.rate * duration), timeout=duration + 2)
+    return to_float32(samples), capture.rate
+
+class WakeWordDetector:
+    """Streaming wake-word spotter that keeps its Vosk recognizer resident.
+
+    Partial hypotheses are checked after every chunk, so detection does not
+    wait for Kaldi to finalize the utterance. The recognizer is reset rather
+    than rebuilt between listens.
+    """
+
+    def __init__(self, wake_word=WAKE_WORD, rate=RATE, model=None):
+        self.wake_word = wake_word
+        self.rate = rate
+        self._model = model
+        self._recognizer = None
+        self.last_detection_position = None
+
+    @property
+    def recognizer(self):
+        if self._recognizer is None:
+            model = self._model or stt_models.get_vosk()
+            grammar = json.dumps([self.wake_word, '[unk]'])
+            self._recognizer = vosk.KaldiRecognizer(model, self.rate, grammar)
+        return self._recognizer
+
+    def reset(self):
+        if self._recognizer is not None:
+            self._recognizer.Reset()
+
+    def accept(self, chunk):
+        """Feed one chunk of int16 PCM bytes. Returns True if the wake word was heard."""
+        rec = self.recognizer
+        if rec.AcceptWaveform(chunk):
+            text = json.loads(rec.Result()).get('text', '')
+        else:
+            text = json.loads(rec.PartialResult()).get('partial', '')
+        return self.wake_word in text.lower()
+
+    def listen(self, capture=None, timeout=WAKE_WORD_TIMEOUT, cancel_event=None):
+        """Consume live audio until the wake word is heard.
+
+        Returns the capture position right after the wake word, so the command
+        recorder can pick up the audio that has already been captured, or
+        None on timeout or once `cancel_event` (a threading.Event) is set.
+        """
+        capture = capture or get_audio_capture()
+        reader = capture.reader()
+        self.reset()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            data = reader.read(CHUNK, timeout=1)
+            if len(data) == 0:
+                if capture.exhausted:
+                    break
+                continue
+            if self.accept(data.tobytes()):
+                self.reset()
+                self.last_detection_position = reader.position
+                return reader.position
+        return None
+
+# Global instance
+wake_word_detector = WakeWordDetector()
 
 def detect_wake_word():
     """Detect wake word 'Jarvis' using VOSK."""
-    model = vosk.Model(VOSK_MODEL_PATH)
-    rec = vosk.KaldiRecognizer(model, RATE, '["jarvis"]')
-    audio = pyaudio.PyAudio()
-    stream = audio.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK)
     print("Listening for wake word 'Jarvis'...")
-    start_time = time.time()
-    while True:
-        if time.time() - start_time > 60:  # Timeout after 60 seconds
-            print("Timeout: No wake word detected.")
-            stream.stop_stream()
-            stream.close()
-            audio.terminate()
-            return False
-        data = stream.read(CHUNK)
-        if rec.AcceptWaveform(data):
-            result = rec.Result()
-            if 'jarvis' in result.lower():
-                print("Wake word detected!")
-                stream.stop_stream()
-                stream.close()
-                audio.terminate()
-                return True
-
-def record_command_audio(duration=5):
-    """Record audio for command after wake word."""
-    audio = pyaudio.PyAudio()
-    stream = audio.open(format=FORMAT, channels=CHANNELS, rate=RATE, input=True, frames_per_buffer=CHUNK)
-    frames = []
-    for _ in range(0, int(RATE / CHUNK * duration)):
-        data = stream.read(CHUNK)
-        frames.append(data)
-    stream.stop_stream()
-    stream.close()
-    audio.terminate()
-    audio_data = np.frombuffer(b''.join(frames), dtype=np.int16).astype(np.float32) / 32768.0
-    return audio_data, RATE
-
-def transcribe_audio(audio_data, sr):
-    """Transcribe audio using Whisper."""
-    model = whisper.load_model(WHISPER_MODEL_NAME)
-    result = model.transcribe(audio_data, fp16=False)
+    if wake_word_detector.listen() is None:
+        print("Timeout: No wake word detected.")
+        return False
+    print("Wake word detected!")
+    return True
+
+class StreamingTranscriber:
+    """Incremental Vosk transcription of a command while it is being spoken.
+
+    Uses the full Vosk vocabulary (not the wake-word grammar) and reports
+    every new hypothesis to `on_partial`, so downstream work can start
+    before Whisper produces the final text.
+    """
+
+    def __init__(self, rate=RATE, model=None):
+        self.rate = rate
+        self._model = model
+        self._recognizer = None
+        self.reset()
+
+    @property
+    def recognizer(self):
+        if self._recognizer is None:
+            self._recognizer = vosk.KaldiRecognizer(self._model or stt_models.get_vosk(), self.rate)
+        return self._recognizer
+
+    def reset(self, on_partial=None):
+        if self._recognizer is not None:
+            self._recognizer.Reset()
+        self.on_partial = on_partial
+        self._segments = []
+        self.text = ''
+
+    def accept(self, chunk):
+        """Feed one chunk of int16 PCM bytes and report the hypothesis if it changed."""
+        rec = self.recognizer
+        if rec.AcceptWaveform(chunk):
+            segment = json.loads(rec.Result()).get('text', '')
+            if segment:
+                self._segments.append(segment)
+            current = ''
+        else:
+            current = json.loads(rec.PartialResult()).get('partial', '')
+        text = ' '.join(self._segments + [current]).strip()
+        if text and text != self.text:
+            self.text = text
+            if self.on_partial:
+                self.on_partial(text)
+        return self.text
+
+class SpeechEndpointer:
+    """Detects the end of a spoken command with webrtcvad.
+
+    Frames of VAD_FRAME_MS are fed one at a time. The command ends once
+    speech has been heard and is followed by `hangover_ms` of silence, or
+    when `max_duration` seconds have been consumed.
+    """
+
+    def __init__(self, rate=RATE, hangover_ms=VAD_HANGOVER_MS, max_duration=COMMAND_MAX_DURATION, vad=None):
+        self.rate = rate
+        self.vad = vad or webrtcvad.Vad(VAD_AGGRESSIVENESS)
+        self.frame_length = int(rate * VAD_FRAME_MS / 1000)
+        self.hangover_frames = max(1, -(-hangover_ms // VAD_FRAME_MS))
+        self.max_frames = int(max_duration * 1000 / VAD_FRAME_MS)
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.speech_started = False
+        self.silence_run = 0
+        self.done = False
+
+    def accept(self, frame):
+        """Feed one int16 frame of `frame_length` samples. Returns True once the command has ended."""
+        self.frames += 1
+        if self.vad.is_speech(frame.tobytes(), self.rate):
+            self.speech_started = True
+            self.silence_run = 0
+        else:
+            self.silence_run += 1
+        if (self.speech_started and self.silence_run >= self.hangover_frames) or self.frames >= self.max_frames:
+            self.done = True
+        return self.done
+
+    def find_endpoint(self, samples):
+        """Run over a whole int16 clip and return the sample index where capture would stop."""
+        self.reset()
+        for end in range(self.frame_length, len(samples) + 1, self.frame_length):
+            if self.accept(samples[end - self.frame_length:end]):
+                return end
+        return len(samples)
+
+def record_command_audio(duration=COMMAND_MAX_DURATION, start=None, hangover_ms=VAD_HANGOVER_MS, on_partial=None, cancel_event=None):
+    """Record audio for command after wake word.
+
+    Recording stops as soon as the speaker goes quiet for `hangover_ms`, or
+    after `duration` seconds at most, or once `cancel_event` is set. If
+    `start` is a capture position (as returned by WakeWordDetector.listen),
+    recording begins there, so speech that followed the wake word is kept.
+    If `on_partial` is given, it is called with streaming Vosk hypotheses
+    while the command is spoken; each call uses its own recognizer.
+    """
+    capture = get_audio_capture()
+    endpointer = SpeechEndpointer(capture.rate, hangover_ms=hangover_ms, max_duration=duration)
+    transcriber = StreamingTranscriber(capture.rate) if on_partial else None
+    if transcriber:
+        transcriber.reset(on_partial)
+    reader = capture.reader(start)
+    begin = reader.position
+    while not endpointer.done:
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        frame = reader.read(endpointer.frame_length, timeout=1)
+        if len(frame) < endpointer.frame_length:
+            break
+        endpointer.accept(frame)
+        if transcriber:
+            transcriber.accept(frame.tobytes())
+    return to_float32(capture.read(begin, reader.position)), capture.rate
+
+def transcribe_audio(audio_data, sr, cancel_event=None):
+    """Transcribe audio using Whisper.
+
+    Returns None without decoding if `cancel_event` is set before decoding
+    starts. Whisper cannot be interrupted once it is decoding.
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        return None
+    model = stt_models.get_whisper()
+    if cancel_event is not None and cancel_event.is_set():
+        return None  # Cancelled while the model was loading
+    with stt_models.timed('whisper'):
+        result = model.transcribe(audio_data, fp16=False)
     return result['text']
 
 def apply_vad(audio_data, rate=RATE):
-    """Apply VAD to detect speech segments."""
+    """Apply VAD to detect speech segments.
+
+    The clip is converted to int16 once and split into 30 ms frames; speech
+    frames are then selected with a boolean mask instead of being copied
+    sample by sample.
+    """
     vad = webrtcvad.Vad(VAD_AGGRESSIVENESS)
-    frame_duration = 30  # ms
-    frame_length = int(rate * frame_duration / 1000)
-    speech_frames = []
-    for i in range(0, len(audio_data) - frame_length, frame_length):
-        frame = audio_data[i:i+frame_length]
-        frame_int16 = (frame * 32767).astype(np.int16)
-        if vad.is_speech(frame_int16.tobytes(), rate):
-            speech_frames.extend(frame)
-    return np.array(speech_frames)
+    frame_length = int(rate * VAD_FRAME_MS / 1000)
+    # Same framing as range(0, len - frame_length, frame_length)
+    n_frames = max(0, (len(audio_data) - 1) // frame_length)
+    frames = np.asarray(audio_data)[:n_frames * frame_length].reshape(n_frames, frame_length)
+    pcm = memoryview((frames * 32767).astype(np.int16).tobytes())
+    frame_bytes = 2 * frame_length
+    speech_mask = np.fromiter(
+        (vad.is_speech(pcm[i * frame_bytes:(i + 1) * frame_bytes], rate) for i in range(n_frames)),
+        dtype=bool,
+        count=n_frames
+    )
+    return frames[speech_mask].ravel()
 
 def extract_features(audio, sr):
     """Extract MFCC features and average them."""
-    mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=13)
+    mfcc = librosa.feature.mfcc(y=audio, sr=sr, n_mfcc=N_MFCC)
     return np.mean(mfcc, axis=1)
 
-def enroll_voice(num_samples=3):
+class VoiceprintStore:
+    """In-memory cache of enrolled voiceprints backed by an .npz file.
+
+    All speakers are kept as one stacked, L2-normalized matrix so an
+    utterance is scored against every speaker with a single matrix-vector
+    product. The file is only re-read when its modification time changes.
+    """
+
+    def __init__(self, path=VOICEPRINT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._set([], np.empty((0, N_MFCC), dtype=np.float32))
+
+    def _set(self, names, voiceprints):
+        norms = np.linalg.norm(voiceprints, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self.names = names
+        self.voiceprints = voiceprints
+        self._snapshot = (names, voiceprints / norms)
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Reload the store if the file changed on disk."""
+        with self._lock:
+            mtime = self._file_mtime()
+            if mtime == self._mtime:
+                return
+            if mtime is None:
+                self._set([], np.empty((0, N_MFCC), dtype=np.float32))
+            else:
+                with np.load(self.path, allow_pickle=False) as data:
+                    self._set([str(name) for name in data['names']], data['voiceprints'].astype(np.float32))
+            self._mtime = mtime
+
+    def save(self):
+        """Write all voiceprints to disk atomically."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, names=np.array(self.names, dtype=str), voiceprints=self.voiceprints)
+        os.replace(tmp_path, self.path)
+        self._mtime = self._file_mtime()
+
+    def speakers(self):
+        self.refresh()
+        return list(self.names)
+
+    def enroll(self, name, voiceprint):
+        """Add or replace the voiceprint for `name`."""
+        self.refresh()
+        with self._lock:
+            names = list(self.names)
+            voiceprints = self.voiceprints.copy()
+            vector = np.asarray(voiceprint, dtype=np.float32).reshape(1, -1)
+            if name in names:
+                voiceprints[names.index(name)] = vector
+            else:
+                names.append(name)
+                voiceprints = np.vstack([voiceprints, vector])
+            self._set(names, voiceprints)
+            self.save()
+
+    def remove(self, name):
+        self.refresh()
+        with self._lock:
+            if name in self.names:
+                keep = [i for i, n in enumerate(self.names) if n != name]
+                self._set([self.names[i] for i in keep], self.voiceprints[keep])
+                self.save()
+
+    def score(self, features):
+        """Return (speaker, cosine similarity) of the best-matching voiceprint, or (None, 0.0)."""
+        self.refresh()
+        names, normalized = self._snapshot
+        if not names:
+            return None, 0.0
+        features = np.asarray(features, dtype=np.float32)
+        norm = np.linalg.norm(features)
+        if norm == 0:
+            return None, 0.0
+        similarities = normalized @ (features / norm)
+        best = int(np.argmax(similarities))
+        return names[best], float(similarities[best])
+
+# Global instance
+voiceprint_store = VoiceprintStore()
+
+def import_legacy_voiceprint(path=LEGACY_VOICEPRINT_PATH, name=DEFAULT_SPEAKER):
+    """Import a voiceprint saved by older versions as a pickle under `name`.
+
+    Never run automatically: only run it on a file you created yourself,
+    since unpickling executes code.
+    """
+    with open(path, 'rb') as f:
+        voiceprint = pickle.load(f)
+    voiceprint_store.enroll(name, voiceprint)
+    print(f"Imported legacy voiceprint as '{name}'.")
+
+def _enroll_features(features_list, name):
+    voiceprint = np.mean(features_list, axis=0)
+    voiceprint_store.enroll(name, voiceprint)
+
+def enroll_voice(num_samples=3, name=DEFAULT_SPEAKER):
     """Enroll voice by recording multiple samples and averaging features."""
     features_list = []
     print("Starting enrollment. Speak for 5 seconds each time.")
@@ -126,45 +717,104 @@ def enroll_voice(num_samples=3):
         else:
             print("No speech detected, try again.")
     if features_list:
-        voiceprint = np.mean(features_list, axis=0)
-        os.makedirs('data', exist_ok=True)
-        with open(VOICEPRINT_PATH, 'wb') as f:
-            pickle.dump(voiceprint, f)
+        _enroll_features(features_list, name)
         print("Enrollment complete.")
     else:
         print("Enrollment failed.")
 
-def verify_speaker(audio_data, sr):
-    """Verify speaker by comparing features to stored voiceprint."""
-    if not os.path.exists(VOICEPRINT_PATH):
+def identify_speaker(audio_data, sr):
+    """Return the enrolled speaker matching the audio, or None."""
+    if not voiceprint_store.speakers():
         print("No voiceprint found. Please enroll first.")
-        return False
-    with open(VOICEPRINT_PATH, 'rb') as f:
-        voiceprint = pickle.load(f)
+        if os.path.exists(LEGACY_VOICEPRINT_PATH):
+            print(f"To keep the voiceprint in {LEGACY_VOICEPRINT_PATH}, run import_legacy_voiceprint() once.")
+        return None
     speech_audio = apply_vad(audio_data, sr)
     if len(speech_audio) == 0:
-        return False
+        return None
     features = extract_features(speech_audio, sr)
-    similarity = cosine_similarity([features], [voiceprint])[0][0]
-    return similarity > THRESHOLD
+    speaker, similarity = voiceprint_store.score(features)
+    return speaker if similarity > THRESHOLD else None
 
-def process_voice_input():
-    """Process voice input: wake word, record, verify, transcribe."""
-    if detect_wake_word():
-        audio, sr = record_command_audio(5)
-        if verify_speaker(audio, sr):
-            print("Speaker verified.")
-            transcription = transcribe_audio(audio, sr)
-            print(f"Transcribed: {transcription}")
-            return transcription
-        else:
-            print("Speaker not verified. Access denied.")
-            return None
+def verify_speaker(audio_data, sr):
+    """Verify speaker by comparing features to the enrolled voiceprints."""
+    return identify_speaker(audio_data, sr) is not None
+
+_voice_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='voice')
+
+def verify_and_transcribe(audio_data, sr, verify=None, transcribe=None, cancel_event=None):
+    """Verify the speaker and transcribe the same audio concurrently.
+
+    Transcription starts on a worker thread while the MFCC check runs in the
+    caller. Returns the transcription, or None if the speaker was not
+    verified or `cancel_event` was set before the transcription arrived.
+
+    `transcribe(audio, sr, stop_event)` is told to stop through `stop_event`
+    when verification fails, which skips it if it has not started decoding.
+    A Whisper decode already under way still runs to the end (the check is
+    much shorter than a decode, so this is the common case) and its text is
+    discarded; set PIPELINE_VERIFICATION to False to never spend that CPU
+    on a rejected speaker.
+    """
+    verify = verify or verify_speaker
+    transcribe = transcribe or transcribe_audio
+    stop_event = threading.Event()
+    future = _voice_executor.submit(transcribe, audio_data, sr, stop_event)
+    if not verify(audio_data, sr) or (cancel_event is not None and cancel_event.is_set()):
+        stop_event.set()
+        future.cancel()
+        return None
+    while True:
+        try:
+            return future.result(timeout=CANCEL_POLL_SECONDS)
+        except FutureTimeout:
+            if cancel_event is not None and cancel_event.is_set():
+                stop_event.set()
+                future.cancel()
+                return None
+
+def process_command_audio(start=None, pipelined=PIPELINE_VERIFICATION, on_partial=None, cancel_event=None):
+    """Record a command from capture position `start`, verify the speaker and transcribe.
+
+    Returns the transcription, or None if the speaker is not verified or
+    `cancel_event` was set.
+    """
+    audio, sr = record_command_audio(start=start, on_partial=on_partial, cancel_event=cancel_event)
+    if cancel_event is not None and cancel_event.is_set():
+        print("Command cancelled.")
+        return None
+    if pipelined:
+        transcription = verify_and_transcribe(audio, sr, cancel_event=cancel_event)
+    elif verify_speaker(audio, sr):
+        transcription = transcribe_audio(audio, sr, cancel_event)
+    else:
+        transcription = None
+    if transcription is not None:
+        print("Speaker verified.")
+        print(f"Transcribed: {transcription}")
+        return transcription
+    else:
+        print("Speaker not verified. Access denied.")
+        return None
+
+def process_voice_input(pipelined=PIPELINE_VERIFICATION, on_partial=None, cancel_event=None):
+    """Process voice input: wake word, record, verify, transcribe.
+
+    `on_partial` receives streaming hypotheses while the command is spoken;
+    the returned transcription is Whisper's final text for the segment.
+    Setting `cancel_event` stops waiting for the wake word and recording.
+    """
+    print("Listening for wake word 'Jarvis'...")
+    wake_position = wake_word_detector.listen(cancel_event=cancel_event)
+    if wake_position is not None:
+        print("Wake word detected!")
+        interrupt_speech()
+        return process_command_audio(wake_position, pipelined, on_partial, cancel_event)
     else:
         print("No wake word detected.")
         return None
 
-def test_enroll(audio, sr, num_samples=3):
+def test_enroll(audio, sr, num_samples=3, name=DEFAULT_SPEAKER):
     """Test enrollment with provided audio."""
     features_list = []
     count = 0
@@ -178,35 +828,190 @@ def test_enroll(audio, sr, num_samples=3):
             print("No speech detected in test audio.")
             break  # or continue, but since it's test, perhaps break
     if features_list:
-        voiceprint = np.mean(features_list, axis=0)
-        os.makedirs('data', exist_ok=True)
-        with open(VOICEPRINT_PATH, 'wb') as f:
-            pickle.dump(voiceprint, f)
+        _enroll_features(features_list, name)
         print("Test enrollment complete.")
     else:
         print("Test enrollment failed.")
 
 def test_verify(audio, sr):
     """Test verification with provided audio."""
-    if not os.path.exists(VOICEPRINT_PATH):
+    if not voiceprint_store.speakers():
         print("No voiceprint found.")
         return False
-    with open(VOICEPRINT_PATH, 'rb') as f:
-        voiceprint = pickle.load(f)
     speech_audio = apply_vad(audio, sr)
     if len(speech_audio) == 0:
         return False
     features = extract_features(speech_audio, sr)
-    similarity = cosine_similarity([features], [voiceprint])[0][0]
-    print(f"Similarity: {similarity}")
+    speaker, similarity = voiceprint_store.score(features)
+    print(f"Similarity: {similarity} ({speaker})")
     return similarity > THRESHOLD
 
-def speak_pyttsx3(text):
-    """Synthesize speech using pyttsx3."""
-    engine = pyttsx3.init()
-    engine.say(text)
-    engine.runAndWait()
+# TTS priorities (lower values are spoken first)
+PRIORITY_ANSWER = 0
+PRIORITY_ALERT = 1
+SPEECH_WAIT_TIMEOUT = 30  # seconds a caller waits for a prompt to be spoken
+
+class SpeechRequest:
+    """A queued utterance. wait() blocks until it has been spoken or dropped."""
+
+    def __init__(self, text, priority=PRIORITY_ANSWER, key=None):
+        self.text = text
+        self.priority = priority
+        self.key = key
+        self.cancelled = False
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+class SpeechQueue:
+    """Single TTS worker thread fed by a priority queue.
+
+    Agent answers are spoken before proactive alerts, a pending request with
+    the same key is updated in place rather than queued twice, and cancel()
+    drops everything queued and stops the current utterance (barge-in).
+    pyttsx3 engines are not thread-safe, so the engine is only touched by
+    the worker thread: cancel() marks the current request, and the worker
+    stops the engine from its word callback, which runs inside runAndWait().
+    If no engine can be created (e.g. eSpeak is missing), speech falls back
+    to printing and every request completes at once.
+    """
+
+    def __init__(self, engine_factory=None):
+        self.engine_factory = engine_factory or pyttsx3.init
+        self.running = False
+        self.available = True
+        self.thread = None
+        self._engine = None
+        self._current = None
+        self._heap = []
+        self._pending = {}  # key -> queued SpeechRequest
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+    def start(self):
+        with self._cond:
+            if self.running or not self.available:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self.speech_loop)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        self.cancel()
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def say(self, text, priority=PRIORITY_ANSWER, key=None):
+        """Queue text and return its SpeechRequest."""
+        with self._cond:
+            if not self.available:
+                print(f"Jarvis: {text}")
+                request = SpeechRequest(text, priority, key)
+                request.done.set()
+                return request
+            if key is not None and key in self._pending:
+                request = self._pending[key]
+                request.text = text  # Merge duplicates into the newest wording
+                return request
+            request = SpeechRequest(text, priority, key)
+            heapq.heappush(self._heap, (priority, next(self._counter), request))
+            if key is not None:
+                self._pending[key] = request
+            self._cond.notify()
+        self.start()
+        return request
+
+    def cancel(self):
+        """Drop all queued speech and interrupt the current utterance."""
+        with self._cond:
+            dropped = [request for _, _, request in self._heap]
+            self._heap.clear()
+            self._pending.clear()
+            current = self._current
+        for request in dropped:
+            request.cancelled = True
+            request.done.set()
+        if current is not None:
+            current.cancelled = True
+
+    def _on_word(self, name, location, length):
+        """Engine callback on the worker thread: stop a cancelled utterance."""
+        current = self._current
+        if current is not None and current.cancelled:
+            self._engine.stop()
+
+    def is_speaking(self):
+        return self._current is not None
+
+    def drain(self, timeout=None):
+        """Block until everything queued has been spoken."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._heap and self._current is None, timeout)
+
+    def pending(self):
+        with self._cond:
+            return [request.text for _, _, request in sorted(self._heap)]
+
+    def _disable(self, error):
+        """Worker could not start an engine: print queued speech and release its waiters."""
+        print(f"TTS unavailable, printing speech instead: {error}")
+        with self._cond:
+            self.running = False
+            self.available = False
+            dropped = [request for _, _, request in sorted(self._heap)]
+            self._heap.clear()
+            self._pending.clear()
+            self._cond.notify_all()
+        for request in dropped:
+            print(f"Jarvis: {request.text}")
+            request.done.set()
+
+    def speech_loop(self):
+        try:
+            self._engine = self.engine_factory()
+            self._engine.connect('started-word', self._on_word)
+        except Exception as e:
+            self._engine = None
+            self._disable(e)
+            return
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._heap or not self.running)
+                if not self.running:
+                    break
+                _, _, request = heapq.heappop(self._heap)
+                if request.key is not None:
+                    self._pending.pop(request.key, None)
+                self._current = request
+            try:
+                if not request.cancelled:
+                    self._engine.say(request.text)
+                    self._engine.runAndWait()
+            except Exception as e:
+                print(f"TTS failed: {e}")
+            finally:
+                with self._cond:
+                    self._current = None
+                    self._cond.notify_all()
+                request.done.set()
+
+# Global instance
+speech_queue = SpeechQueue()
+
+def speak(text, priority=PRIORITY_ANSWER, key=None):
+    """Queue text for speech without blocking.
+
+    Returns a SpeechRequest; call .wait() on it to block until it has been
+    spoken. Requests with the same key are merged while still queued.
+    """
+    return speech_queue.say(text, priority, key)
 
-def speak(text):
-    """Synthesize speech using pyttsx3."""
-    speak_pyttsx3(text)
\ No newline at end of file
+def interrupt_speech():
+    """Barge-in: stop talking and drop queued speech."""
+    speech_queue.cancel()